@@ -1,7 +1,15 @@
 import doll.data
+import doll.db
 import doll.input_parser
+import doll.lookup.endings
+import doll.lookup.storage
+import doll.lookup.verify
 import doll.parse_test
+import doll.profiling
+import doll.server
 import argparse
+from contextlib import ExitStack
+from doll.config import config
 
 description = """
 DDDDDDDDDDDDD                         LLLLLLLLLL        LLLLLLLLLL
@@ -35,25 +43,90 @@ This program comprises three parts:
 
 In addition, there is a parse_test script in the root directory,
 demonstrating a use of the package to replicate certain functionality
-of Words.
+of Words, and a server module, which serves its lookups to other
+programs over a socket.
 """
 
-if __name__ == '__main__':
 
+def main():
     parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawTextHelpFormatter)
     parser.add_argument("-f", "--force", action='store_true', help="Force a re-download of the words.zip file")
     parser.add_argument("-b", "--build", action='store_true', help="Build the database")
     parser.add_argument("-p", "--parse", action='store_true', help="Run the example parser")
+    parser.add_argument("-e", "--ending", help="List the forms ending with a suffix, such as bamus")
+    parser.add_argument("--verify", nargs='*', choices=list(doll.lookup.verify.ENGINES), metavar='ENGINE',
+                        help="Check that lookup engines find the same analyses as the reference query, "
+                             "by default all of them: " + ', '.join(doll.lookup.verify.ENGINES))
+    parser.add_argument("--verify-sample", type=int, help="Number of forms to verify, chosen at random")
+    parser.add_argument("--verify-strict-sample", type=int,
+                        help="Most forms to verify strict matching on, chosen at random, "
+                             "defaults to verify_strict_sample in the config")
+    parser.add_argument("--benchmark-storage", nargs='?', type=int, const=1000, metavar='WORDS',
+                        help="Compare the pages read by lookups with the storage as loaded and as optimised, "
+                             "for a sample of forms (1000 by default)")
+    parser.add_argument("-s", "--serve", action='store_true', help="Run the lookup service")
+    parser.add_argument("--in-memory", action='store_true',
+                        help="Copy the database into memory before parsing or serving, "
+                             "as with in_memory in the config")
+    parser.add_argument("--host", help="Host for the lookup service to listen on")
+    parser.add_argument("--port", type=int, help="Port for the lookup service to listen on")
+    parser.add_argument("--socket", help="Unix socket for the lookup service to listen on, instead of TCP")
+    parser.add_argument("--workers", type=int, help="Number of worker threads for the lookup service")
+    parser.add_argument("--profile", nargs='?', const='all', choices=['cpu', 'memory', 'all'],
+                        help="Profile the chosen actions with cProfile, tracemalloc or both (the default)")
+    parser.add_argument("--profile-dir", help="Directory for the profiles, defaults to profile_dir in the config")
+    parser.add_argument("--profile-top", type=int, help="Allocation sites listed in the memory report")
+    parser.add_argument("--profile-interval", type=float,
+                        help="Seconds between memory snapshots, for long builds")
 
     args = parser.parse_args()
 
+    def action(name):
+        """Profiles an action, if profiling was asked for"""
+        stack = ExitStack()
+        if args.profile:
+            stack.enter_context(doll.profiling.profiled(name,
+                                                        cpu=args.profile in ('cpu', 'all'),
+                                                        memory=args.profile in ('memory', 'all'),
+                                                        directory=args.profile_dir,
+                                                        top=args.profile_top,
+                                                        interval=args.profile_interval))
+        return stack
+
     if args.force:
         doll.data.download(create_dir=True)
     if args.build:
-        doll.input_parser.parse_all_inputs(commit_changes=True)
+        with action('build'):
+            doll.input_parser.parse_all_inputs(commit_changes=True)
+    if (args.parse or args.serve) and (args.in_memory or config['in_memory']):
+        doll.db.Connection.load_into_memory()
     if args.parse:
-        while True:
-            word = input('Enter a word to parse or type quit() to exit:\n=> ')
-            if word == 'quit()':
-                break
-            doll.parse_test.parse_word(word)
+        with action('parse'):
+            while True:
+                word = input('Enter a word to parse or type quit() to exit:\n=> ')
+                if word == 'quit()':
+                    break
+                doll.parse_test.parse_word(word)
+    if args.ending:
+        previous = None
+        for ending in doll.lookup.endings.forms_ending_with(args.ending):
+            if ending.form != previous:
+                print(ending.form)
+            previous = ending.form
+    if args.verify is not None:
+        with action('verify'):
+            mismatches, timings = doll.lookup.verify.verify(engines=args.verify or None, sample=args.verify_sample,
+                                                            strict_sample=args.verify_strict_sample)
+            doll.lookup.verify.print_report(mismatches, timings)
+    if args.benchmark_storage:
+        words = doll.lookup.verify.generated_forms(sample=args.benchmark_storage)
+        for name, (pages, seconds) in doll.lookup.storage.benchmark(words).items():
+            print('{0:<10} {1} pages read, {2:.3f}ms per word'.format(
+                name, pages if pages is not None else 'unknown', 1000 * seconds / len(words)))
+    if args.serve:
+        with action('serve'):
+            doll.server.serve(host=args.host, port=args.port, path=args.socket, workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,32 @@
 
 config = {
     'db_file': 'doll.db',
+    'analysis_cache': False,
+    'autocomplete_index_length': 4,
+    'autocomplete_limit': 10,
+    'bloom_file': 'doll.bloom',
+    'bloom_false_positive_rate': 0.01,
+    'cache_file': 'doll.cache',
+    'in_memory': False,
+    'in_memory_backup_pages': 4096,
+    'in_memory_max_bytes': 2 ** 30,
+    'ingest_chunk_size': 5000,
+    'ingest_queue_depth': 4,
+    'integer_type_keys': False,
+    'profile_dir': '.',
+    'profile_top': 25,
+    'serve_host': '127.0.0.1',
+    'serve_port': 8737,
+    'serve_workers': 4,
+    'serve_pipeline_depth': 64,
+    'serve_line_limit': 2 ** 24,
+    'spelling_max_distance': 2,
+    'spelling_prefix_length': 7,
+    'statistics_exact_limit': 100000,
+    'statistics_heavy_hitters': 1000,
+    'statistics_sketch_width': 65536,
+    'statistics_sketch_depth': 4,
+    'verify_strict_sample': 1000,
     'sqlalchemy.pool_recycle': '50',
     'sqlalchemy.echo': 'false'
 }
@@ -1,6 +1,10 @@
-from os.path import expanduser
-from sqlalchemy import engine_from_config
-from sqlalchemy.orm import sessionmaker
+import hashlib
+import sqlite3
+import time
+from os.path import expanduser, getsize, realpath
+from sqlalchemy import create_engine, engine_from_config, event
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import NullPool
 from ..config import config
 from .model import *
 
@@ -16,13 +20,103 @@ class Connection:
 
     config['sqlalchemy.url'] = 'sqlite:///' + expanduser("~/.doll") + '/' + config['db_file']
 
-    __engine = engine_from_config(config, echo=False)
+    # Parsing writes through the session on a thread of its own (see input_parser.pipeline), never
+    # at the same time as another thread uses it
+    __engine = engine_from_config(config, echo=False, connect_args={'check_same_thread': False})
 
     __Session = sessionmaker()
     __Session.configure(bind=__engine)
 
     session = __Session()
 
+    # Read-only sessions, one for each thread, for lookups from worker threads
+    __read_only_engine = create_engine('sqlite:///file:' + expanduser("~/.doll") + '/' + config['db_file'] +
+                                       '?mode=ro&uri=true', echo=False)
+
+    thread_session = scoped_session(sessionmaker(bind=__read_only_engine))
+
+    # The connection holding the in-memory copy of the database open, and the engine of the copy, once loaded
+    __memory = None
+    __memory_engine = None
+
     @staticmethod
     def create_all():
-        Base.metadata.create_all(Connection.__engine)
\ No newline at end of file
+        Base.metadata.create_all(Connection.__engine)
+
+    @staticmethod
+    def load_type_codes():
+        """Loads the ids of the type codes, for TypeCode columns, from the copy in memory once there is one"""
+        with (Connection.__memory_engine or Connection.__engine).connect() as connection:
+            TypeCode.load(connection)
+
+    @staticmethod
+    def load_into_memory(max_bytes: int = None, pages: int = None) -> bool:
+        """Copies the database into memory, and serves every session from the copy
+
+        The file is copied with sqlite's backup API into a shared-cache
+        in-memory database, which every thread's connection then reads,
+        so startup takes one sequential read of the file and each lookup
+        no reads of it at all. The copy is read-only, and the file is
+        left as it was.
+
+        Startup is bounded by max_bytes: a larger database is not copied,
+        and is read from disk as usual.
+
+        :param max_bytes: The largest database to copy, defaults to in_memory_max_bytes in the config
+        :param pages: Pages to copy in each step of the backup, or 0 for all in one step, defaults to
+                      in_memory_backup_pages in the config
+        :return: Whether the database is now in memory
+        """
+
+        if Connection.__memory is not None:
+            return True
+
+        path = expanduser("~/.doll") + '/' + config['db_file']
+        if max_bytes is None:
+            max_bytes = int(config['in_memory_max_bytes'])
+        if pages is None:
+            pages = int(config['in_memory_backup_pages'])
+
+        size = getsize(path)
+        if size > max_bytes:
+            print('Database is {0:,} bytes, more than {1:,}, reading it from disk'.format(size, max_bytes))
+            return False
+
+        print('Loading database into memory')
+        start = time.perf_counter()
+
+        # Named for the file, so copies of different databases in one process stay apart
+        uri = 'file:doll-memory-{0}?mode=memory&cache=shared'.format(
+            hashlib.sha1(realpath(path).encode()).hexdigest()[:16])
+        memory = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        source = sqlite3.connect('file:' + path + '?mode=ro', uri=True)
+        try:
+            source.backup(memory, pages=pages)
+        finally:
+            source.close()
+
+        # Each thread's session holds a connection of its own to the copy, which memory keeps alive
+        # between them; a connection may be closed from another thread once its own has finished
+        engine = create_engine('sqlite:///' + uri + '&uri=true', echo=False, poolclass=NullPool,
+                               connect_args={'check_same_thread': False})
+
+        # Changes to the copy would be lost, so refuse them
+        @event.listens_for(engine, 'connect')
+        def query_only(dbapi_connection, connection_record):
+            dbapi_connection.execute('PRAGMA query_only = ON')
+
+        # The copy has the same ids, but they are loaded again from it, as from any other database
+        TypeCode.clear()
+
+        Connection.__memory = memory
+        Connection.__memory_engine = engine
+        Connection.session.close()
+        Connection.session = sessionmaker(bind=engine)()
+        Connection.thread_session = scoped_session(sessionmaker(bind=engine))
+
+        print('Loaded {0:,} bytes in {1:.2f}s'.format(size, time.perf_counter() - start))
+
+        return True
+
+
+TypeCode.loader = Connection.load_type_codes
\ No newline at end of file
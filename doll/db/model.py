@@ -21,9 +21,11 @@ this means that inflections with the same gender and declension.
         
 """
 
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Unicode
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Unicode, Float, Index, select
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.ext.declarative import declarative_base, declared_attr
+from sqlalchemy.types import TypeDecorator
+from ..config import config
 
 __author__ = 'Matthew Badger'
 
@@ -60,6 +62,110 @@ class TypeBase(object):
     description = Column(String(300))
 
 
+"""Type Codes
+
+Other tables refer to a type by its code, such as 'NOM' for the
+nominative case. With integer_type_keys set in the config, they store
+the id of the type's row instead, in a TypeCode column, which still
+reads and writes the code. Every entry and record then holds small
+integers rather than strings, and joins to the type tables compare
+them. Changing the setting means rebuilding the database.
+
+"""
+
+
+# Stores the code of a type as the id of its row
+class TypeCode(TypeDecorator):
+    """An integer column holding the id of a type, read and written as the type's code"""
+
+    impl = Integer
+    cache_ok = True
+
+    # Ids by code, and codes by id, for each type table
+    ids = {}
+    codes = {}
+
+    # Loads the ids when they are first needed, set by doll.db
+    loader = None
+
+    def __init__(self, table: str):
+        """Creates the column type
+
+        :param table: The name of the type table, such as type_case
+        """
+
+        super().__init__()
+        self.table = table
+
+    @classmethod
+    def load(cls, connection):
+        """Loads the ids of the codes of every type table
+
+        :param connection: The connection or session to query
+        """
+
+        for type_class in TypeBase.__subclasses__():
+            table = type_class.__table__
+            rows = connection.execute(select(table.c.code, table.c.id)).all()
+            cls.ids[table.name] = {code: type_id for code, type_id in rows}
+            cls.codes[table.name] = {type_id: code for code, type_id in rows}
+
+    @classmethod
+    def clear(cls):
+        """Forgets the ids of the codes, when the database they were loaded from is replaced"""
+
+        cls.ids.clear()
+        cls.codes.clear()
+
+    def _mapping(self, mapping: dict) -> dict:
+        if self.table not in mapping and TypeCode.loader is not None:
+            TypeCode.loader()
+
+        return mapping.get(self.table, {})
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+
+        try:
+            return self._mapping(TypeCode.ids)[value]
+        except KeyError:
+            raise ValueError('{0!r} is not a code of {1}'.format(value, self.table)) from None
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+
+        try:
+            return self._mapping(TypeCode.codes)[value]
+        except KeyError:
+            raise ValueError('{0!r} is not an id of {1}'.format(value, self.table)) from None
+
+
+def type_code(table: str, name: str) -> Column:
+    """Creates a column referring to a type by its code
+
+    :param table: The name of the type table, such as type_case
+    :param name: The name of the foreign key
+    :return: The column, of integer ids if integer_type_keys is set in the config, otherwise of codes
+    """
+
+    if config['integer_type_keys']:
+        return Column(TypeCode(table), ForeignKey(table + '.id', name=name))
+
+    return Column(String(10), ForeignKey(table + '.code', name=name))
+
+
+def type_key(type_class):
+    """Finds the column of a type class that type_code columns refer to
+
+    :param type_class: The type class, such as WordFrequency
+    :return: Its id column if integer_type_keys is set in the config, otherwise its code column
+    """
+
+    return type_class.id if config['integer_type_keys'] else type_class.code
+
+
 class PartOfSpeech(TypeBase, Base):
     """Elements of speech such as a noun. Helper elements used in
     code have is_real False."""
@@ -69,11 +175,23 @@ class PartOfSpeech(TypeBase, Base):
 
 
 class WordAge(TypeBase, Base):
-    """Ages when the word is found"""
+    """Ages when the word is found, most preferred first by order,
+    with universal and classical words first"""
+
+    order = Column(Integer)
+
+    def __lt__(self, other):
+        return self.order < other.order
 
 
 class WordFrequency(TypeBase, Base):
-    """Frequency of occurrence in the corpus"""
+    """Frequency of occurrence in the corpus, most frequent first
+    by order, with unknown frequency in the middle"""
+
+    order = Column(Integer)
+
+    def __lt__(self, other):
+        return self.order < other.order
 
 
 class WordArea(TypeBase, Base):
@@ -205,12 +323,9 @@ class Record(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
 
     # Foreign Keys
-    part_of_speech_code = Column(String(10), ForeignKey('type_partofspeech.code',
-                                                        name='FK_inflection_record_part_of_speech_code'))
-    age_code = Column(String(10), ForeignKey('type_wordage.code',
-                                             name='FK_inflection_record_wordage_code'))
-    frequency_code = Column(String(10), ForeignKey('type_wordfrequency.code',
-                                                   name='FK_inflection_record_wordfrequency_code'))
+    part_of_speech_code = type_code('type_partofspeech', 'FK_inflection_record_part_of_speech_code')
+    age_code = type_code('type_wordage', 'FK_inflection_record_wordage_code')
+    frequency_code = type_code('type_wordfrequency', 'FK_inflection_record_wordfrequency_code')
 
     # Other columns
     stem_key = Column(Integer)
@@ -233,15 +348,11 @@ class NounRecord(Base):
     record_id = Column(Integer, ForeignKey('inflection_record.id',
                                            name='FK_inflection_noun_record_id'))
 
-    declension_code = Column(String(10), ForeignKey('type_declension.code',
-                                                    name='FK_inflection_noun_declension_code'))
+    declension_code = type_code('type_declension', 'FK_inflection_noun_declension_code')
     variant = Column(Integer)
-    case_code = Column(String(10), ForeignKey('type_case.code',
-                                              name='FK_inflection_noun_case_code'))
-    number_code = Column(String(10), ForeignKey('type_number.code',
-                                                name='FK_inflection_noun_number_code'))
-    gender_code = Column(String(10), ForeignKey('type_gender.code',
-                                                name='FK_inflection_noun_gender_code'))
+    case_code = type_code('type_case', 'FK_inflection_noun_case_code')
+    number_code = type_code('type_number', 'FK_inflection_noun_number_code')
+    gender_code = type_code('type_gender', 'FK_inflection_noun_gender_code')
 
     # Relationships
     record = relationship('Record', backref=backref('inflection_noun'))
@@ -259,15 +370,11 @@ class PronounRecord(Base):
     record_id = Column(Integer, ForeignKey('inflection_record.id',
                                            name='FK_inflection_pronoun_record_id'))
 
-    declension_code = Column(String(10), ForeignKey('type_declension.code',
-                                                    name='FK_inflection_pronoun_declension_code'))
+    declension_code = type_code('type_declension', 'FK_inflection_pronoun_declension_code')
     variant = Column(Integer)
-    case_code = Column(String(10), ForeignKey('type_case.code',
-                                              name='FK_inflection_pronoun_case_code'))
-    number_code = Column(String(10), ForeignKey('type_number.code',
-                                                name='FK_inflection_pronoun_number_code'))
-    gender_code = Column(String(10), ForeignKey('type_gender.code',
-                                                name='FK_inflection_pronoun_gender_code'))
+    case_code = type_code('type_case', 'FK_inflection_pronoun_case_code')
+    number_code = type_code('type_number', 'FK_inflection_pronoun_number_code')
+    gender_code = type_code('type_gender', 'FK_inflection_pronoun_gender_code')
 
     # Relationships
     record = relationship('Record', backref=backref('inflection_pronoun'))
@@ -286,17 +393,12 @@ class AdjectiveRecord(Base):
     record_id = Column(Integer, ForeignKey('inflection_record.id',
                                            name='FK_inflection_adjective_record_id'))
 
-    declension_code = Column(String(10), ForeignKey('type_declension.code',
-                                                    name='FK_inflection_adjective_declension_code'))
+    declension_code = type_code('type_declension', 'FK_inflection_adjective_declension_code')
     variant = Column(Integer)
-    case_code = Column(String(10), ForeignKey('type_case.code',
-                                              name='FK_inflection_adjective_case_code'))
-    number_code = Column(String(10), ForeignKey('type_number.code',
-                                                name='FK_inflection_adjective_number_code'))
-    gender_code = Column(String(10), ForeignKey('type_gender.code',
-                                                name='FK_inflection_adjective_gender_code'))
-    comparison_type_code = Column(String(10), ForeignKey('type_comparisontype.code',
-                                                         name='FK_inflection_adjective_comparisontype_code'))
+    case_code = type_code('type_case', 'FK_inflection_adjective_case_code')
+    number_code = type_code('type_number', 'FK_inflection_adjective_number_code')
+    gender_code = type_code('type_gender', 'FK_inflection_adjective_gender_code')
+    comparison_type_code = type_code('type_comparisontype', 'FK_inflection_adjective_comparisontype_code')
 
     # Relationships
     record = relationship('Record', backref=backref('inflection_adjective'))
@@ -316,17 +418,12 @@ class NumeralRecord(Base):
     record_id = Column(Integer, ForeignKey('inflection_record.id',
                                            name='FK_inflection_numeral_record_id'))
 
-    declension_code = Column(String(10), ForeignKey('type_declension.code',
-                                                    name='FK_inflection_numeral_declension_code'))
+    declension_code = type_code('type_declension', 'FK_inflection_numeral_declension_code')
     variant = Column(Integer)
-    case_code = Column(String(10), ForeignKey('type_case.code',
-                                              name='FK_inflection_numeral_case_code'))
-    number_code = Column(String(10), ForeignKey('type_number.code',
-                                                name='FK_inflection_numeral_number_code'))
-    gender_code = Column(String(10), ForeignKey('type_gender.code',
-                                                name='FK_inflection_numeral_gender_code'))
-    numeral_sort_code = Column(String(10), ForeignKey('type_numeralsort.code',
-                                                      name='FK_inflection_numeral_numeralsort_code'))
+    case_code = type_code('type_case', 'FK_inflection_numeral_case_code')
+    number_code = type_code('type_number', 'FK_inflection_numeral_number_code')
+    gender_code = type_code('type_gender', 'FK_inflection_numeral_gender_code')
+    numeral_sort_code = type_code('type_numeralsort', 'FK_inflection_numeral_numeralsort_code')
 
     # Relationships
     record = relationship('Record', backref=backref('inflection_numeral'))
@@ -346,20 +443,14 @@ class VerbRecord(Base):
     record_id = Column(Integer, ForeignKey('inflection_record.id',
                                            name='FK_inflection_verb_record_id'))
 
-    conjugation_code = Column(String(10), ForeignKey('type_conjugation.code',
-                                                     name='FK_inflection_verb_conjugation_code'))
+    conjugation_code = type_code('type_conjugation', 'FK_inflection_verb_conjugation_code')
     variant = Column(Integer)
 
-    tense_code = Column(String(10), ForeignKey('type_tense.code',
-                                               name='FK_inflection_verb_tense_code'))
-    voice_code = Column(String(10), ForeignKey('type_voice.code',
-                                               name='FK_inflection_verb_voice_code'))
-    mood_code = Column(String(10), ForeignKey('type_mood.code',
-                                              name='FK_inflection_verb_mood_code'))
-    person_code = Column(String(10), ForeignKey('type_person.code',
-                                                name='FK_inflection_verb_person_code'))
-    number_code = Column(String(10), ForeignKey('type_number.code',
-                                                name='FK_inflection_verb_number_code'))
+    tense_code = type_code('type_tense', 'FK_inflection_verb_tense_code')
+    voice_code = type_code('type_voice', 'FK_inflection_verb_voice_code')
+    mood_code = type_code('type_mood', 'FK_inflection_verb_mood_code')
+    person_code = type_code('type_person', 'FK_inflection_verb_person_code')
+    number_code = type_code('type_number', 'FK_inflection_verb_number_code')
 
     # Relationships
     record = relationship('Record', backref=backref('inflection_verb'))
@@ -380,21 +471,14 @@ class VerbParticipleRecord(Base):
     record_id = Column(Integer, ForeignKey('inflection_record.id',
                                            name='FK_inflection_verbparticiple_record_id'))
 
-    conjugation_code = Column(String(10), ForeignKey('type_conjugation.code',
-                                                     name='FK_inflection_verbparticiple_conjugation_code'))
+    conjugation_code = type_code('type_conjugation', 'FK_inflection_verbparticiple_conjugation_code')
     variant = Column(Integer)
-    case_code = Column(String(10), ForeignKey('type_case.code',
-                                              name='FK_inflection_verbparticiple_case_code'))
-    number_code = Column(String(10), ForeignKey('type_number.code',
-                                                name='FK_inflection_verbparticiple_number_code'))
-    gender_code = Column(String(10), ForeignKey('type_gender.code',
-                                                name='FK_inflection_verbparticiple_gender_code'))
-    tense_code = Column(String(10), ForeignKey('type_tense.code',
-                                               name='FK_inflection_verbparticiple_tense_code'))
-    voice_code = Column(String(10), ForeignKey('type_voice.code',
-                                               name='FK_inflection_verbparticiple_voice_code'))
-    mood_code = Column(String(10), ForeignKey('type_mood.code',
-                                              name='FK_inflection_verbparticiple_mood_code'))
+    case_code = type_code('type_case', 'FK_inflection_verbparticiple_case_code')
+    number_code = type_code('type_number', 'FK_inflection_verbparticiple_number_code')
+    gender_code = type_code('type_gender', 'FK_inflection_verbparticiple_gender_code')
+    tense_code = type_code('type_tense', 'FK_inflection_verbparticiple_tense_code')
+    voice_code = type_code('type_voice', 'FK_inflection_verbparticiple_voice_code')
+    mood_code = type_code('type_mood', 'FK_inflection_verbparticiple_mood_code')
 
     # Relationships
     record = relationship('Record', backref=backref('inflection_verbparticiple'))
@@ -413,8 +497,7 @@ class AdverbRecord(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     record_id = Column(Integer, ForeignKey('inflection_record.id',
                                            name='FK_inflection_adverb_record_id'))
-    comparison_type_code = Column(String(10), ForeignKey('type_comparisontype.code',
-                                                         name='FK_inflection_adverb_comparisontype_code'))
+    comparison_type_code = type_code('type_comparisontype', 'FK_inflection_adverb_comparisontype_code')
 
     # Relationships
     record = relationship('Record', backref=backref('inflection_adverb'))
@@ -428,8 +511,7 @@ class PrepositionRecord(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     record_id = Column(Integer, ForeignKey('inflection_record.id',
                                            name='FK_inflection_preposition_record_id'))
-    case_code = Column(String(10), ForeignKey('type_case.code',
-                                              name='FK_inflection_preposition_case_code'))
+    case_code = type_code('type_case', 'FK_inflection_preposition_case_code')
 
     # Relationships
     record = relationship('Record', backref=backref('inflection_preposition'))
@@ -468,15 +550,11 @@ class SupineRecord(Base):
     record_id = Column(Integer, ForeignKey('inflection_record.id',
                                            name='FK_inflection_supine_record_id'))
 
-    conjugation_code = Column(String(10), ForeignKey('type_conjugation.code',
-                                                     name='FK_inflection_supine_conjugation_code'))
+    conjugation_code = type_code('type_conjugation', 'FK_inflection_supine_conjugation_code')
     variant = Column(Integer)
-    case_code = Column(String(10), ForeignKey('type_case.code',
-                                              name='FK_inflection_supine_case_code'))
-    number_code = Column(String(10), ForeignKey('type_number.code',
-                                                name='FK_inflection_supine_number_code'))
-    gender_code = Column(String(10), ForeignKey('type_gender.code',
-                                                name='FK_inflection_supine_gender_code'))
+    case_code = type_code('type_case', 'FK_inflection_supine_case_code')
+    number_code = type_code('type_number', 'FK_inflection_supine_number_code')
+    gender_code = type_code('type_gender', 'FK_inflection_supine_gender_code')
 
     # Relationships
     record = relationship('Record', backref=backref('inflection_supine'))
@@ -499,21 +577,19 @@ class Entry(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
 
     # Foreign Keys
-    part_of_speech_code = Column(String(10), ForeignKey('type_partofspeech.code',
-                                                        name='FK_dictionary_entry_part_of_speech_code'))
-    age_code = Column(String(10), ForeignKey('type_wordage.code',
-                                             name='FK_dictionary_entry_wordage_code'))
-    area_code = Column(String(10), ForeignKey('type_wordarea.code',
-                                              name='FK_dictionary_entry_wordarea_code'))
-    location_code = Column(String(10), ForeignKey('type_wordlocation.code',
-                                                  name='FK_dictionary_entry_wordlocation_code'))
-    frequency_code = Column(String(10), ForeignKey('type_wordfrequency.code',
-                                                   name='FK_dictionary_entry_wordfrequency_code'))
-    source_code = Column(String(10), ForeignKey('type_wordsource.code',
-                                                name='FK_dictionary_entry_wordsource_code'))
+    part_of_speech_code = type_code('type_partofspeech', 'FK_dictionary_entry_part_of_speech_code')
+    age_code = type_code('type_wordage', 'FK_dictionary_entry_wordage_code')
+    area_code = type_code('type_wordarea', 'FK_dictionary_entry_wordarea_code')
+    location_code = type_code('type_wordlocation', 'FK_dictionary_entry_wordlocation_code')
+    frequency_code = type_code('type_wordfrequency', 'FK_dictionary_entry_wordfrequency_code')
+    source_code = type_code('type_wordsource', 'FK_dictionary_entry_wordsource_code')
 
     translation = Column(Unicode(4096, collation='BINARY'))
 
+    # Set at the end of the build, from the part of speech entry
+    inflection_class_id = Column(Integer, ForeignKey('lookup_inflection_class.id',
+                                                     name='FK_dictionary_entry_inflection_class_id'))
+
     # Relationships
     part_of_speech = relationship('PartOfSpeech', backref=backref('dictionary_entry'))
     age = relationship('WordAge', backref=backref('dictionary_entry'))
@@ -522,6 +598,8 @@ class Entry(Base):
     frequency = relationship('WordFrequency', backref=backref('dictionary_entry'))
     source = relationship('WordSource', backref=backref('dictionary_entry'))
 
+    inflection_class = relationship('InflectionClass', backref=backref('dictionary_entry'))
+
     stems = relationship('Stem', backref=backref('dictionary_stem'))
     translation_sets = relationship('TranslationSet', backref=backref('dictionary_translation_set'))
 
@@ -555,8 +633,7 @@ class TranslationSet(Base):
                                           name='FK_dictionary_translation_set_entry_id'))
     language_id = Column(Integer, ForeignKey('type_language.id',
                                              name='FK_dictionary_translation_set_language_id'))
-    area_code = Column(String(10), ForeignKey('type_wordarea.code',
-                                              name='FK_dictionary_translation_set_wordarea_code'))
+    area_code = type_code('type_wordarea', 'FK_dictionary_translation_set_wordarea_code')
 
     # Relationships
     entry = relationship('Entry', backref=backref('dictionary_translation_set'))
@@ -581,6 +658,21 @@ class Translation(Base):
     translation_set = relationship('TranslationSet', backref=backref('dictionary_translation'))
 
 
+# Token of a translation
+class TranslationToken(Base):
+    """A word in a translation, indexing the translations by word"""
+    __tablename__ = 'dictionary_translation_token'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    translation_id = Column(Integer, ForeignKey('dictionary_translation.id',
+                                                name='FK_dictionary_translation_token_translation_id'))
+    token = Column(Unicode(100), index=True)
+
+    # Relationships
+    translation = relationship('Translation', backref=backref('dictionary_translation_token'))
+
+
 # Noun Entry
 class NounEntry(Base):
     """Noun entry in the dictionary"""
@@ -591,13 +683,10 @@ class NounEntry(Base):
     entry_id = Column(Integer, ForeignKey('dictionary_entry.id',
                                           name='FK_dictionary_noun_entry_id'))
 
-    declension_code = Column(String(10), ForeignKey('type_declension.code',
-                                                    name='FK_dictionary_noun_declension_code'))
+    declension_code = type_code('type_declension', 'FK_dictionary_noun_declension_code')
     variant = Column(Integer)
-    gender_code = Column(String(10), ForeignKey('type_gender.code',
-                                                name='FK_dictionary_noun_gender_code'))
-    noun_kind_code = Column(String(10), ForeignKey('type_nounkind.code',
-                                                   name='FK_dictionary_noun_nounkind_code'))
+    gender_code = type_code('type_gender', 'FK_dictionary_noun_gender_code')
+    noun_kind_code = type_code('type_nounkind', 'FK_dictionary_noun_nounkind_code')
 
     # Relationships
     entry = relationship('Entry', backref=backref('dictionary_noun'))
@@ -616,11 +705,9 @@ class PronounEntry(Base):
     entry_id = Column(Integer, ForeignKey('dictionary_entry.id',
                                           name='FK_dictionary_pronoun_entry_id'))
 
-    declension_code = Column(String(10), ForeignKey('type_declension.code',
-                                                    name='FK_dictionary_pronoun_declension_code'))
+    declension_code = type_code('type_declension', 'FK_dictionary_pronoun_declension_code')
     variant = Column(Integer)
-    pronoun_kind_code = Column(String(10), ForeignKey('type_pronounkind.code',
-                                                      name='FK_dictionary_pronoun_pronounkind_code'))
+    pronoun_kind_code = type_code('type_pronounkind', 'FK_dictionary_pronoun_pronounkind_code')
 
     # Relationships
     entry = relationship('Entry', backref=backref('dictionary_pronoun'))
@@ -638,11 +725,9 @@ class PropackEntry(Base):
     entry_id = Column(Integer, ForeignKey('dictionary_entry.id',
                                           name='FK_dictionary_propack_entry_id'))
 
-    declension_code = Column(String(10), ForeignKey('type_declension.code',
-                                                    name='FK_dictionary_propack_declension_code'))
+    declension_code = type_code('type_declension', 'FK_dictionary_propack_declension_code')
     variant = Column(Integer)
-    pronoun_kind_code = Column(String(10), ForeignKey('type_pronounkind.code',
-                                                      name='FK_dictionary_propack_pronounkind_code'))
+    pronoun_kind_code = type_code('type_pronounkind', 'FK_dictionary_propack_pronounkind_code')
 
     # Relationships
     entry = relationship('Entry', backref=backref('dictionary_propack'))
@@ -660,11 +745,9 @@ class AdjectiveEntry(Base):
     entry_id = Column(Integer, ForeignKey('dictionary_entry.id',
                                           name='FK_dictionary_adjective_entry_id'))
 
-    declension_code = Column(String(10), ForeignKey('type_declension.code',
-                                                    name='FK_dictionary_adjective_declension_code'))
+    declension_code = type_code('type_declension', 'FK_dictionary_adjective_declension_code')
     variant = Column(Integer)
-    comparison_type_code = Column(String(10), ForeignKey('type_comparisontype.code',
-                                                         name='FK_dictionary_adjective_comparisontype_code'))
+    comparison_type_code = type_code('type_comparisontype', 'FK_dictionary_adjective_comparisontype_code')
 
     # Relationships
     entry = relationship('Entry', backref=backref('dictionary_adjective'))
@@ -682,11 +765,9 @@ class NumeralEntry(Base):
     entry_id = Column(Integer, ForeignKey('dictionary_entry.id',
                                           name='FK_dictionary_numeral_entry_id'))
 
-    declension_code = Column(String(10), ForeignKey('type_declension.code',
-                                                    name='FK_dictionary_numeral_declension_code'))
+    declension_code = type_code('type_declension', 'FK_dictionary_numeral_declension_code')
     variant = Column(Integer)
-    numeral_sort_code = Column(String(10), ForeignKey('type_numeralsort.code',
-                                                      name='FK_dictionary_numeral_numeralsort_code'))
+    numeral_sort_code = type_code('type_numeralsort', 'FK_dictionary_numeral_numeralsort_code')
     numeral_value_type = Column(Integer)
 
     # Relationships
@@ -705,8 +786,7 @@ class AdverbEntry(Base):
     entry_id = Column(Integer, ForeignKey('dictionary_entry.id',
                                           name='FK_dictionary_adverb_entry_id'))
 
-    comparison_type_code = Column(String(10), ForeignKey('type_comparisontype.code',
-                                                         name='FK_dictionary_adverb_comparisontype_code'))
+    comparison_type_code = type_code('type_comparisontype', 'FK_dictionary_adverb_comparisontype_code')
 
     # Relationships
     entry = relationship('Entry', backref=backref('dictionary_adverb'))
@@ -723,15 +803,12 @@ class VerbEntry(Base):
     entry_id = Column(Integer, ForeignKey('dictionary_entry.id',
                                           name='FK_dictionary_verb_entry_id'))
 
-    conjugation_code = Column(String(10), ForeignKey('type_conjugation.code',
-                                                     name='FK_dictionary_verb_conjugation_code'))
+    conjugation_code = type_code('type_conjugation', 'FK_dictionary_verb_conjugation_code')
 
-    realconjugation_code = Column(String(10), ForeignKey('type_realconjugation.code',
-                                                         name='FK_dictionary_verb_realconjugation_code'))
+    realconjugation_code = type_code('type_realconjugation', 'FK_dictionary_verb_realconjugation_code')
     variant = Column(Integer)
 
-    verb_kind_code = Column(String(10), ForeignKey('type_verbkind.code',
-                                                   name='FK_dictionary_verb_verbkind_code'))
+    verb_kind_code = type_code('type_verbkind', 'FK_dictionary_verb_verbkind_code')
 
     # Relationships
     entry = relationship('Entry', backref=backref('dictionary_verb'))
@@ -748,8 +825,7 @@ class PrepositionEntry(Base):
     entry_id = Column(Integer, ForeignKey('dictionary_entry.id',
                                           name='FK_dictionary_preposition_entry_id'))
 
-    case_code = Column(String(10), ForeignKey('type_case.code',
-                                              name='FK_dictionary_preposition_case_code'))
+    case_code = type_code('type_case', 'FK_dictionary_preposition_case_code')
 
     # Relationships
     entry = relationship('Entry', backref=backref('dictionary_preposition'))
@@ -782,3 +858,124 @@ class InterjectionEntry(Base):
 
     # Relationships
     entry = relationship('Entry', backref=backref('dictionary_interjection'))
+
+
+"""Lookup classes.
+
+These classes define tables derived from the dictionary and
+inflection tables once they have been populated, to make
+looking words up faster. They are built by the lookup
+package at the end of parse_all_inputs.
+
+"""
+
+
+# Inflection class
+class InflectionClass(Base):
+    """A class of dictionary entries which all take the same inflection
+    records, such as first declension feminine nouns"""
+    __tablename__ = 'lookup_inflection_class'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    part_of_speech_code = type_code('type_partofspeech', 'FK_lookup_inflection_class_part_of_speech_code')
+    key = Column(Unicode(100))  # The values of the entry columns the class is for
+
+    # Relationships
+    part_of_speech = relationship('PartOfSpeech', backref=backref('lookup_inflection_class'))
+
+
+# Compatibility of an inflection class with an inflection record
+class Compatibility(Base):
+    """An inflection record taken by the entries of an inflection class"""
+    __tablename__ = 'lookup_compatibility'
+
+    inflection_class_id = Column(Integer, ForeignKey('lookup_inflection_class.id',
+                                                     name='FK_lookup_compatibility_inflection_class_id'),
+                                 primary_key=True)
+    record_id = Column(Integer, ForeignKey('inflection_record.id',
+                                           name='FK_lookup_compatibility_record_id'),
+                       primary_key=True)
+
+    # Relationships
+    inflection_class = relationship('InflectionClass', backref=backref('lookup_compatibility'))
+    record = relationship('Record', backref=backref('lookup_compatibility'))
+
+
+# Surface form of a dictionary entry
+class Form(Base):
+    """An inflected form of a dictionary entry: a stem of the entry
+    joined to the ending of a compatible inflection record"""
+    __tablename__ = 'lookup_form'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    entry_id = Column(Integer, ForeignKey('dictionary_entry.id',
+                                          name='FK_lookup_form_entry_id'))
+    record_id = Column(Integer, ForeignKey('inflection_record.id',
+                                           name='FK_lookup_form_record_id'))
+    stem_id = Column(Integer, ForeignKey('dictionary_stem.id',
+                                         name='FK_lookup_form_stem_id'))
+
+    form = Column(Unicode(40, collation='BINARY'), index=True)
+    canonical_form = Column(Unicode(40, collation='BINARY'), index=True)  # Shared by orthographic variants
+    reversed_form = Column(Unicode(40, collation='BINARY'), index=True)  # For finding forms by their endings
+    score = Column(Float)  # Higher for the more likely analyses of the form, see doll.lookup.ranking
+
+    __table_args__ = (Index('ix_lookup_form_entry_id_record_id', 'entry_id', 'record_id'),)
+
+    # Relationships
+    entry = relationship('Entry', backref=backref('lookup_form'))
+    record = relationship('Record', backref=backref('lookup_form'))
+    stem = relationship('Stem', backref=backref('lookup_form'))
+
+
+# Deletion of a form prefix, for approximate matching
+class SpellingDelete(Base):
+    """A string made by deleting characters from the prefix of a form,
+    so that forms close to a word share a deletion with it"""
+    __tablename__ = 'lookup_spelling'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    delete_key = Column(Unicode(40, collation='BINARY'), index=True)
+    prefix = Column(Unicode(40, collation='BINARY'))
+
+
+# Frequency of a dictionary entry in the corpora read
+class EntryCount(Base):
+    """How often the tokens of the corpora read were analysed as an entry"""
+    __tablename__ = 'lookup_entry_count'
+
+    entry_id = Column(Integer, ForeignKey('dictionary_entry.id',
+                                          name='FK_lookup_entry_count_entry_id'),
+                      primary_key=True)
+
+    count = Column(Integer)
+    is_exact = Column(Boolean)  # False when the count is an estimate, which may be too high
+
+    # Relationships
+    entry = relationship('Entry', backref=backref('lookup_entry_count'))
+
+
+# Frequency of a word in the corpora read
+class FormCount(Base):
+    """How often a word appeared in the corpora read"""
+    __tablename__ = 'lookup_form_count'
+
+    form = Column(Unicode(40, collation='BINARY'), primary_key=True)
+
+    count = Column(Integer)
+    is_exact = Column(Boolean)  # False when the count is an estimate, which may be too high
+
+
+# Build of the database
+class Build(Base):
+    """A build of the database by parse_all_inputs, identified by a hash
+    of the database file as it was built, so that anything derived from
+    it can tell when it is rebuilt"""
+    __tablename__ = 'lookup_build'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    stamp = Column(String(64))
@@ -1,17 +1,33 @@
 import os
+from ..db import Connection
+from ..db.model import TypeCode
 from ..input_parser.add_database_types import create_type_contents
+from ..input_parser.deduplicate import deduplicate_entries, deduplicate_records
 from ..input_parser.parse_dictionary import parse_dict_file
 from ..input_parser.parse_inflections import parse_inflect_file
+from ..input_parser.pipeline import RowWriter
+from ..lookup.bloom import bloom_path, build_bloom_filter
+from ..lookup.cache import remove_cache, stamp_build
+from ..lookup.compatibility import build_compatibility
+from ..lookup.endings import build_reversed_forms
+from ..lookup.forms import build_forms
+from ..lookup.orthography import build_canonical_forms
+from ..lookup.ranking import build_ranking
+from ..lookup.spelling import build_spelling_index
+from ..lookup.storage import optimise_storage
 from ..config import config
 
 
-def parse_all_inputs(words_dir: str = os.path.expanduser('~/.doll/wordsall'), commit_changes: bool = False):
+def parse_all_inputs(words_dir: str = os.path.expanduser('~/.doll/wordsall'), commit_changes: bool = False,
+                     chunk_size: int = None):
     """Creates the database and parses all the inputs
 
     :param words_dir: Directory of wordsall
     :type words_dir: str
     :param commit_changes: Whether to commit changes to the database
     :type commit_changes: bool
+    :param chunk_size: Lines parsed between flushes of the session, defaults to ingest_chunk_size in the config
+    :type chunk_size: int
 
     :return None
     """
@@ -40,8 +56,52 @@ def parse_all_inputs(words_dir: str = os.path.expanduser('~/.doll/wordsall'), co
         else:
             os.remove(os.path.expanduser("~/.doll/") + config['db_file'])
 
+            # The filter of the old database would hide the new forms
+            if os.path.isfile(bloom_path()):
+                os.remove(bloom_path())
+
+            remove_cache()
+
+    # The ids of the types are loaded again from the new database
+    TypeCode.clear()
+
     create_type_contents()
 
-    parse_inflect_file(inflect_file=words_dir + 'INFLECTS.LAT', commit_changes=commit_changes)
+    # Both files are parsed while the writer's thread writes the rows parsed so far
+    with RowWriter(Connection.session) as writer:
+        parse_inflect_file(inflect_file=words_dir + 'INFLECTS.LAT', commit_changes=commit_changes,
+                           chunk_size=chunk_size, writer=writer)
+
+        parse_dict_file(dict_file=words_dir + 'DICTLINE.GEN', commit_changes=commit_changes,
+                        chunk_size=chunk_size, writer=writer)
+
+    if commit_changes:
+        print('Committing changes to database')
+        Connection.session.commit()
+
+    # Keep a single copy of entries and records Words repeats, such as the qu/cu pronouns
+    deduplicate_entries(commit_changes=commit_changes)
+
+    deduplicate_records(commit_changes=commit_changes)
+
+    # Build the lookup structures from the dictionary and inflections
+    build_compatibility(commit_changes=commit_changes)
+
+    build_forms(commit_changes=commit_changes)
+
+    build_ranking(commit_changes=commit_changes)
+
+    build_canonical_forms(commit_changes=commit_changes)
+
+    build_reversed_forms(commit_changes=commit_changes)
+
+    build_bloom_filter()
+
+    build_spelling_index(commit_changes=commit_changes)
+
+    # Lay out the relations the analysis query reads for reading, now that nothing more is loaded
+    optimise_storage(commit_changes=commit_changes)
 
-    parse_dict_file(dict_file=words_dir + 'DICTLINE.GEN', commit_changes=commit_changes)
+    # Stamp the build, so caches of the old database are discarded
+    if commit_changes:
+        stamp_build()
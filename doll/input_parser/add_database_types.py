@@ -5,6 +5,7 @@
 
 __author__ = 'Matthew Badger'
 
+from doll.config import config
 from doll.db import Connection
 from doll.db.model import *
 
@@ -33,34 +34,42 @@ def create_type_contents():
         PartOfSpeech(code='SUFFIX', name='Suffix', description='Suffix --  here artificial for code', is_real=False))
 
     Connection.session.add(
-        WordAge(code='X', name='Universal', description='In use throughout the ages/unknown -- the default'))
+        WordAge(code='X', name='Universal', description='In use throughout the ages/unknown -- the default',
+                order=1))
     Connection.session.add(
-        WordAge(code='A', name='Archaic', description='Very early forms, obsolete by classical times'))
+        WordAge(code='A', name='Archaic', description='Very early forms, obsolete by classical times', order=5))
     Connection.session.add(
-        WordAge(code='B', name='Early', description='Early Latin, pre-classical, used for effect/poetry'))
-    Connection.session.add(WordAge(code='C', name='Classical', description='Limited to classical (~150 BC - 200 AD)'))
-    Connection.session.add(WordAge(code='D', name='Late', description='Late, post-classical (3rd-5th centuries)'))
+        WordAge(code='B', name='Early', description='Early Latin, pre-classical, used for effect/poetry', order=3))
     Connection.session.add(
-        WordAge(code='E', name='Later', description='Latin not in use in Classical times (6-10), Christian'))
-    Connection.session.add(WordAge(code='F', name='Medieval', description='Medieval (11th-15th centuries)'))
+        WordAge(code='C', name='Classical', description='Limited to classical (~150 BC - 200 AD)', order=1))
     Connection.session.add(
-        WordAge(code='G', name='Scholar', description='Latin post 15th - Scholarly/Scientific   (16-18)'))
+        WordAge(code='D', name='Late', description='Late, post-classical (3rd-5th centuries)', order=2))
     Connection.session.add(
-        WordAge(code='H', name='Modern', description='Coined recently, words for new things (19-20)'))
+        WordAge(code='E', name='Later', description='Latin not in use in Classical times (6-10), Christian', order=4))
+    Connection.session.add(WordAge(code='F', name='Medieval', description='Medieval (11th-15th centuries)', order=6))
+    Connection.session.add(
+        WordAge(code='G', name='Scholar', description='Latin post 15th - Scholarly/Scientific   (16-18)', order=7))
+    Connection.session.add(
+        WordAge(code='H', name='Modern', description='Coined recently, words for new things (19-20)', order=8))
 
-    Connection.session.add(WordFrequency(code='X', name='Universal', description='Unknown or unspecified'))
+    Connection.session.add(WordFrequency(code='X', name='Universal', description='Unknown or unspecified', order=5))
+    Connection.session.add(
+        WordFrequency(code='A', name='Very frequent',
+                      description='Very frequent, in all Elementary Latin books', order=1))
+    Connection.session.add(WordFrequency(code='B', name='Frequent', description='Frequent, in top 10 percent', order=2))
     Connection.session.add(
-        WordFrequency(code='A', name='Very frequent', description='Very frequent, in all Elementary Latin books'))
-    Connection.session.add(WordFrequency(code='B', name='Frequent', description='Frequent, in top 10 percent'))
-    Connection.session.add(WordFrequency(code='C', name='Common', description='For Dictionary, in top 10,000 words'))
-    Connection.session.add(WordFrequency(code='D', name='Lesser', description='For Dictionary, in top 20,000 words'))
-    Connection.session.add(WordFrequency(code='E', name='Uncommon', description='2 or 3 citations'))
+        WordFrequency(code='C', name='Common', description='For Dictionary, in top 10,000 words', order=3))
     Connection.session.add(
-        WordFrequency(code='F', name='Very rare', description='Having only single citation in OLD or L+S'))
-    Connection.session.add(WordFrequency(code='I', name='Inscription', description='Only citation is inscription'))
-    Connection.session.add(WordFrequency(code='M', name='Graffiti', description='Presently not much used'))
+        WordFrequency(code='D', name='Lesser', description='For Dictionary, in top 20,000 words', order=4))
+    Connection.session.add(WordFrequency(code='E', name='Uncommon', description='2 or 3 citations', order=6))
     Connection.session.add(
-        WordFrequency(code='N', name='Pliny', description='Things that appear (almost) only in Pliny Natural History'))
+        WordFrequency(code='F', name='Very rare', description='Having only single citation in OLD or L+S', order=7))
+    Connection.session.add(
+        WordFrequency(code='I', name='Inscription', description='Only citation is inscription', order=8))
+    Connection.session.add(WordFrequency(code='M', name='Graffiti', description='Presently not much used', order=9))
+    Connection.session.add(
+        WordFrequency(code='N', name='Pliny',
+                      description='Things that appear (almost) only in Pliny Natural History', order=10))
 
     Connection.session.add(WordArea(code='X', name='All', description='All or none'))
     Connection.session.add(
@@ -274,3 +283,7 @@ def create_type_contents():
     Connection.create_all()
 
     Connection.session.commit()
+
+    # The ids of any earlier database's types no longer apply
+    if config['integer_type_keys']:
+        Connection.load_type_codes()
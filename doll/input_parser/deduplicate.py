@@ -0,0 +1,150 @@
+"""Removes duplicate dictionary entries and inflection records.
+
+   Words keeps several copies of some entries and records for its
+   own computational convenience, notably the qu/cu pronouns, and
+   each copy would otherwise give the same analysis again. Entries
+   which are identical in their part of speech, stems, translation
+   and part of speech columns, and records identical in their part of
+   speech, stem key, ending, age and part of speech columns, are
+   reduced to a single copy, the most frequent, once at build time.
+   Duplicates are then never fetched when a word is analysed.
+
+   The kind of a pronoun is not compared: Words lists the qu/cu
+   pronouns once for each kind, with the same stems and translation,
+   and no rule reads the kind, so the copies give the same analyses.
+   The copy kept has its own kind, and the others' are lost. The kinds
+   of other parts of speech, such as nouns, are kept apart.
+
+"""
+
+from collections import defaultdict
+from doll.db import Connection
+from doll.db.model import *
+from doll.lookup.compatibility import ENTRY_CLASSES, RULES
+
+# Rows to delete at once, to stay within sqlite's limit on parameters
+_chunk_size = 500
+
+# Columns of entry classes which classify their meaning without changing their analyses
+NON_DISTINGUISHING_COLUMNS = {PronounEntry: ('pronoun_kind_code',)}
+
+
+def _specific_columns(model) -> list:
+    """Finds the part of speech columns of an entry or record class which distinguish its duplicates
+
+    :param model: The entry or record class
+    :return: A list of columns
+    """
+
+    return [c for c in model.__table__.columns
+            if c.name not in ('id', 'entry_id', 'record_id') + NON_DISTINGUISHING_COLUMNS.get(model, ())]
+
+
+def _duplicates(rows) -> list:
+    """Finds the duplicates among rows, keeping the first row of each key
+
+    :param rows: Tuples of (key, id), in order of preference
+    :return: A list of the ids of the duplicates
+    """
+
+    kept, duplicates = set(), []
+
+    for key, row_id in rows:
+        if key in kept:
+            duplicates.append(row_id)
+        else:
+            kept.add(key)
+
+    return duplicates
+
+
+def _delete(session, column, ids: list):
+    """Deletes the rows of a table whose column is one of ids
+
+    :param session: The session to write through
+    :param column: The column of the table
+    :param ids: The ids to delete
+    """
+
+    for start in range(0, len(ids), _chunk_size):
+        session.execute(column.table.delete().where(column.in_(ids[start:start + _chunk_size])))
+
+
+def deduplicate_entries(session=None, commit_changes: bool = False) -> int:
+    """Removes dictionary entries identical to another but for their NON_DISTINGUISHING_COLUMNS,
+    with their stems and translations
+
+    :param session: The session to write through, by default the shared Connection session
+    :param commit_changes: Whether to commit changes to the database
+    :return: The number of entries removed
+    """
+
+    session = session or Connection.session
+
+    print('Removing duplicate entries')
+
+    duplicates = []
+    for entry_class in ENTRY_CLASSES:
+        stems = defaultdict(list)
+        for entry_id, stem_number, stem_word in session.query(Stem.entry_id, Stem.stem_number, Stem.stem_word) \
+                .join(entry_class, entry_class.entry_id == Stem.entry_id) \
+                .order_by(Stem.entry_id, Stem.stem_number):
+            stems[entry_id].append((stem_number, stem_word))
+
+        entries = session.query(Entry.id, Entry.part_of_speech_code, Entry.translation,
+                                *_specific_columns(entry_class)) \
+            .join(entry_class, entry_class.entry_id == Entry.id) \
+            .join(WordFrequency, type_key(WordFrequency) == Entry.frequency_code) \
+            .order_by(WordFrequency.order, Entry.id)
+
+        duplicates.extend(_duplicates(((tuple(stems[entry_id]), *key), entry_id) for entry_id, *key in entries))
+
+    if duplicates:
+        translation_ids = [translation_id for (translation_id,) in session.query(Translation.id)
+                           .join(TranslationSet, TranslationSet.id == Translation.translation_set_id)
+                           .filter(TranslationSet.entry_id.in_(duplicates))]
+
+        _delete(session, TranslationToken.translation_id, translation_ids)
+        _delete(session, Translation.id, translation_ids)
+        _delete(session, TranslationSet.entry_id, duplicates)
+        _delete(session, Stem.entry_id, duplicates)
+        for entry_class in ENTRY_CLASSES:
+            _delete(session, entry_class.entry_id, duplicates)
+        _delete(session, Entry.id, duplicates)
+
+    if commit_changes:
+        session.commit()
+
+    return len(duplicates)
+
+
+def deduplicate_records(session=None, commit_changes: bool = False) -> int:
+    """Removes inflection records identical to another, including in their age, which ranking scores
+
+    :param session: The session to write through, by default the shared Connection session
+    :param commit_changes: Whether to commit changes to the database
+    :return: The number of records removed
+    """
+
+    session = session or Connection.session
+
+    print('Removing duplicate inflection records')
+
+    duplicates = []
+    for entry_class, record_class, rules in RULES.values():
+        records = session.query(Record.id, Record.part_of_speech_code, Record.stem_key, Record.ending,
+                                Record.age_code, *_specific_columns(record_class)) \
+            .join(record_class, record_class.record_id == Record.id) \
+            .join(WordFrequency, type_key(WordFrequency) == Record.frequency_code) \
+            .order_by(WordFrequency.order, Record.id)
+
+        record_duplicates = _duplicates((tuple(key), record_id) for record_id, *key in records)
+        _delete(session, record_class.record_id, record_duplicates)
+        duplicates.extend(record_duplicates)
+
+    _delete(session, Record.id, duplicates)
+
+    if commit_changes:
+        session.commit()
+
+    return len(duplicates)
@@ -1,41 +1,65 @@
+from doll.config import config
 from doll.db import Connection
 from doll.db.model import *
+from doll.input_parser.pipeline import RowWriter
+from doll.input_parser.read_input import read_input
+from itertools import count
+from sqlalchemy import func
 import re
-from tqdm import tqdm
+import struct
 
 
 class Parser:
-    _regex = re.compile('\s([A-Z]):')
+    _token_regex = re.compile(r'[^\W\d_]+')
 
     def __init__(self, session):
         self.session = session
-        self._word_areas = {word_area.code: word_area for word_area in session.query(WordArea).all()}
+        self._word_areas = {code for (code,) in session.query(WordArea.code)}
+        self._translation_set_ids = count((session.query(func.max(TranslationSet.id)).scalar() or 0) + 1)
+        self._translation_ids = count((session.query(func.max(Translation.id)).scalar() or 0) + 1)
 
-    def parse_translation(self, language, entry, translation):
-        """Parses the translation line and creates the Translation and TranslationSet objects
+    def parse_translation(self, language_id, entry_id, area_code, translation):
+        """Parses the translation line into rows for its TranslationSets and
+        Translations, and the tokens of each Translation
 
-        :param language
-        :param entry
+        Translation sets are separated by semicolons, and take the area of
+        the entry unless they start with an area code of their own, as in
+        'L: slave'. Translations within a set are separated by commas.
+
+        :param language_id
+        :param entry_id
+        :param area_code: The area code of the entry
         :param translation
+        :return: A generator of (table, row) pairs
         """
 
-        for ts in [ts for ts in map(str.strip, translation.split(';')) if len(ts) > 0]:
+        for ts in map(str.strip, translation.split(';')):
+            if len(ts) == 0:
+                continue
+
+            # Check if the translation set has its own area
+            set_area_code = area_code
+            if ts[1:2] == ':' and ts[:1] in self._word_areas:
+                set_area_code, ts = ts[:1], ts[2:]
 
-            # Check if the translation set includes an area
-            area_regex = __class__._regex.match(ts)
-            if area_regex is not None:
-                area = self._word_areas[area_regex.group(0)]
-                translation_set = TranslationSet(entry=entry,
-                                                 area=area,
-                                                 language=language)
-            else:
-                translation_set = TranslationSet(entry=entry,
-                                                 language=language)
+            translation_set_id = next(self._translation_set_ids)
+            yield TranslationSet.__table__, {'id': translation_set_id,
+                                             'entry_id': entry_id,
+                                             'language_id': language_id,
+                                             'area_code': set_area_code}
 
-            self.session.add(translation_set)
+            for t in map(str.strip, ts.split(',')):
+                if len(t) == 0:
+                    continue
 
-            for t in [t for t in map(str.strip, ts.split(',')) if len(t) > 0]:
-                self.session.add(Translation(translation_set=translation_set, translation=t))
+                translation_id = next(self._translation_ids)
+                yield Translation.__table__, {'id': translation_id,
+                                              'translation_set_id': translation_set_id,
+                                              'translation': t}
+
+                for token in sorted(set(__class__._token_regex.findall(t.lower()))):
+                    yield TranslationToken.__table__, {'translation_id': translation_id,
+                                                       'token': token}
 
     @staticmethod
     def verb_real_conjugation(present_stem: str, conjugation_code: str, variant: int) -> int:
@@ -61,7 +85,132 @@ class Parser:
             return cc + 1
 
 
-def parse_dict_file(dict_file: str, commit_changes: bool = False):
+# Decoding of DICTLINE.GEN lines.
+#
+# Each line is a fixed-width record, so the layout below is compiled
+# once into a struct which unpacks every field of a line in one call.
+# The part of speech data is then turned into a row for the table of
+# that part of speech by a row builder, found by the part of speech
+# code in _entry_builders.
+
+# Fields of a DICTLINE.GEN line, as (name, start, end) byte offsets
+DICTLINE_LAYOUT = (
+    ('stem_1', 0, 18),
+    ('stem_2', 19, 37),
+    ('stem_3', 38, 56),
+    ('stem_4', 57, 75),
+    ('part_of_speech_code', 76, 82),
+    ('part_of_speech_data', 83, 99),
+    ('age_code', 100, 101),
+    ('area_code', 102, 103),
+    ('location_code', 104, 105),
+    ('frequency_code', 106, 107),
+    ('source_code', 108, 109)
+)
+
+# The translation runs from here to the end of the line
+TRANSLATION_START = 110
+
+
+def compile_layout(layout) -> struct.Struct:
+    """Compiles a fixed-width layout into a struct, skipping the bytes between fields
+
+    :param layout: Tuple of (name, start, end) fields, in order
+    :return: The struct, whose unpack_from gives the fields as bytes
+    """
+
+    fmt, position = '', 0
+
+    for name, start, end in layout:
+        if start > position:
+            fmt += '{0}x'.format(start - position)
+        fmt += '{0}s'.format(end - start)
+        position = end
+
+    return struct.Struct(fmt)
+
+
+def _entry_builder(model, *columns):
+    """Creates a row builder for a part of speech, which maps the part
+    of speech data of a line, in order, to the given columns of its table
+
+    :param model: The dictionary entry class for the part of speech
+    :param columns: The columns the part of speech data fills
+    :return: The row builder
+    """
+
+    table = model.__table__
+
+    def build(entry_id, data, stems):
+        row = dict(zip(columns, data))
+        row['entry_id'] = entry_id
+        if 'variant' in row:
+            row['variant'] = int(row['variant'])
+        return table, row
+
+    return build
+
+
+_verb_entry = _entry_builder(VerbEntry, 'conjugation_code', 'variant', 'verb_kind_code')
+
+
+def _verb_builder(entry_id, data, stems):
+    """Row builder for verbs, which also need their real conjugation"""
+    table, row = _verb_entry(entry_id, data, stems)
+    row['realconjugation_code'] = Parser.verb_real_conjugation(stems[0]['stem_word'],
+                                                               row['conjugation_code'],
+                                                               row['variant'])
+    return table, row
+
+# Row builders for each part of speech; other parts of speech have no specific entry
+_entry_builders = {
+    'N': _entry_builder(NounEntry, 'declension_code', 'variant', 'gender_code', 'noun_kind_code'),
+    'PRON': _entry_builder(PronounEntry, 'declension_code', 'variant', 'pronoun_kind_code'),
+    'PACK': _entry_builder(PropackEntry, 'declension_code', 'variant', 'pronoun_kind_code'),
+    'ADJ': _entry_builder(AdjectiveEntry, 'declension_code', 'variant', 'comparison_type_code'),
+    'NUM': _entry_builder(NumeralEntry, 'declension_code', 'variant', 'numeral_sort_code', 'numeral_value_type'),
+    'ADV': _entry_builder(AdverbEntry, 'comparison_type_code'),
+    'V': _verb_builder,
+    'PREP': _entry_builder(PrepositionEntry, 'case_code'),
+    'CONJ': _entry_builder(ConjunctionEntry),
+    'INTERJ': _entry_builder(InterjectionEntry)
+}
+
+
+def _write_rows(session, rows):
+    """Bulk inserts the rows collected for each table
+
+    :param session: The session to write through
+    :param rows: Dictionary of table to a list of rows
+    """
+
+    for table, table_rows in rows.items():
+        if table_rows:
+            session.execute(table.insert(), table_rows)
+
+
+def _new_rows() -> dict:
+    """Creates the lists of rows waiting to be written, by table; entries
+    first, as everything else refers to them"""
+
+    return {Entry.__table__: [], Stem.__table__: [],
+            TranslationSet.__table__: [], Translation.__table__: [], TranslationToken.__table__: []}
+
+
+def _prepare(session) -> tuple:
+    """Reads what parsing needs from the database
+
+    :param session: The session to query
+    :return: The Parser, the id of the English language, and the next free entry id
+    """
+
+    parser = Parser(session=session)
+    language = session.query(Language).filter(Language.code == 'E').first()
+
+    return parser, language.id, (session.query(func.max(Entry.id)).scalar() or 0) + 1
+
+
+def parse_dict_file(dict_file: str, commit_changes: bool = False, chunk_size: int = None, writer=None):
     """Parses a given dictionary file.
 
     The DICTLINE.GEN file is arranged in rows as follows:
@@ -75,123 +224,104 @@ def parse_dict_file(dict_file: str, commit_changes: bool = False):
         - Frequency
         - Source
 
-    :param dict_file: The path of the DICTLINE.GEN file
+    Lines are decoded to rows with the struct compiled from
+    DICTLINE_LAYOUT, along with the rows for their translations.
+    Every chunk_size lines the rows are handed to a RowWriter, which
+    bulk inserts them while the next are parsed, so memory stays flat
+    however large the file. The whole file is still parsed in the one
+    transaction, committed (or not) at the end.
+
+    :param dict_file: The path of the DICTLINE.GEN file, or '-' to read it from stdin
     :param commit_changes: Whether to save changes to the database
+    :param chunk_size: Lines to parse between writes, defaults to ingest_chunk_size in the config
+    :param writer: A RowWriter shared with other parsers, whose owner closes it and commits;
+                   by default the parser has one of its own
     :return: void
     """
-    
+
     session = Connection.session
 
-    parser = Parser(session=session)
+    chunk_size = chunk_size or int(config['ingest_chunk_size'])
 
-    language = session.query(Language).filter(Language.code == 'E').first()
+    own_writer = writer is None
+    writer = writer or RowWriter(session)
+
+    parser, language_id, first_entry_id = writer.call(_prepare)
+
+    dictline = compile_layout(DICTLINE_LAYOUT)
+    encoding = 'windows_1252'
+
+    rows = _new_rows()
+    entry_ids = count(first_entry_id)
 
     print('Parsing dictionary file')
 
-    # Open the dictionary file and loop over its lines
-    with open(dict_file, encoding='windows_1252') as f:
-        # Start by counting the lines in the file
-        line_count = sum(1 for line in f)
-        f.seek(0)
-
-        for line in tqdm(f, total=line_count):
-
-            # Create the list of stems, ignoring those that are empty or zzz
-            stems = [Stem(stem_number=i, stem_word=s, stem_simple_word=s)
-                     for i, s in enumerate([line[i:i + 18].strip() for i in range(0, 58, 19)], 1)
-                     if len(s) > 0 and s != 'zzz']
-
-            part_of_speech_code, part_of_speech_data = line[76:82].strip(), [p.strip()
-                                                                             for p in line[83:99].split()]
-
-            # Split 100:101, ..., 108:109
-            age_code, area_code, location_code, frequency_code, source_code = [line[i]
-                                                                               for i in range(100, 109, 2)]
-            translation = line[110:].strip()
-
-            # Create the basic entry, i.e. everything except the part of speech data
-            entry = Entry(part_of_speech_code=part_of_speech_code,
-                          age_code=age_code,
-                          area_code=area_code,
-                          location_code=location_code,
-                          frequency_code=frequency_code,
-                          source_code=source_code,
-                          translation=translation,
-                          stems=stems)
-
-            parser.parse_translation(language=language,
-                                     entry=entry,
-                                     translation=translation)
-
-            # Create the specific entry given the part of speech
-            if entry.part_of_speech_code == 'N':
-                noun_entry = NounEntry(declension_code=part_of_speech_data[0],
-                                       variant=int(part_of_speech_data[1]),
-                                       gender_code=part_of_speech_data[2],
-                                       noun_kind_code=part_of_speech_data[3],
-                                       entry=entry)
-                session.add(noun_entry)
-            elif entry.part_of_speech_code == 'PRON':
-                pronoun_entry = PronounEntry(declension_code=part_of_speech_data[0],
-                                             variant=int(part_of_speech_data[1]),
-                                             pronoun_kind_code=part_of_speech_data[2],
-                                             entry=entry)
-                session.add(pronoun_entry)
-            elif entry.part_of_speech_code == 'PACK':
-                propack_entry = PropackEntry(declension_code=part_of_speech_data[0],
-                                             variant=int(part_of_speech_data[1]),
-                                             pronoun_kind_code=part_of_speech_data[2],
-                                             entry=entry)
-                session.add(propack_entry)
-            elif entry.part_of_speech_code == 'ADJ':
-                adjective_entry = AdjectiveEntry(declension_code=part_of_speech_data[0],
-                                                 variant=int(part_of_speech_data[1]),
-                                                 comparison_type_code=part_of_speech_data[2],
-                                                 entry=entry)
-                session.add(adjective_entry)
-            elif entry.part_of_speech_code == 'NUM':
-                numeral_entry = NumeralEntry(declension_code=part_of_speech_data[0],
-                                             variant=int(part_of_speech_data[1]),
-                                             numeral_sort_code=part_of_speech_data[2],
-                                             numeral_value_type=part_of_speech_data[3],
-                                             entry=entry)
-                session.add(numeral_entry)
-            elif entry.part_of_speech_code == 'ADV':
-                adverb_entry = AdverbEntry(comparison_type_code=part_of_speech_data[0],
-                                           entry=entry)
-                session.add(adverb_entry)
-            elif entry.part_of_speech_code == 'V':
-                verb_entry = VerbEntry(conjugation_code=part_of_speech_data[0],
-                                       variant=int(part_of_speech_data[1]),
-                                       verb_kind_code=part_of_speech_data[2],
-                                       entry=entry)
-                verb_entry.realconjugation_code = Parser.verb_real_conjugation(stems[0].stem_word,
-                                                                               verb_entry.conjugation_code,
-                                                                               verb_entry.variant)
-                session.add(verb_entry)
-            elif entry.part_of_speech_code == 'PREP':
-                preposition_entry = PrepositionEntry(case_code=part_of_speech_data[0],
-                                                     entry=entry)
-                session.add(preposition_entry)
-            elif entry.part_of_speech_code == 'CONJ':
-                conjunction_entry = ConjunctionEntry(entry=entry)
-                session.add(conjunction_entry)
-            elif entry.part_of_speech_code == 'INTERJ':
-                interjection_entry = InterjectionEntry(entry=entry)
-                session.add(interjection_entry)
-
-        # If we don't want to commit changes, just list the output
-        if not commit_changes:
-            session.query(NounEntry).all()
-            session.query(PronounEntry).all()
-            session.query(PropackEntry).all()
-            session.query(AdjectiveEntry).all()
-            session.query(NumeralEntry).all()
-            session.query(AdverbEntry).all()
-            session.query(VerbEntry).all()
-            session.query(PrepositionEntry).all()
-            session.query(ConjunctionEntry).all()
-            session.query(InterjectionEntry).all()
-        else:
-            print('Committing changes to database')
-            session.commit()
\ No newline at end of file
+    # Loop over the lines of the dictionary file in a single pass
+    for line_number, line in enumerate(read_input(dict_file, encoding=None), 1):
+
+        if len(line) < dictline.size:
+            line = line.ljust(dictline.size)
+
+        (*stem_words, part_of_speech_code, part_of_speech_data,
+         age_code, area_code, location_code, frequency_code, source_code) = [
+            field.strip().decode(encoding) for field in dictline.unpack_from(line)]
+
+        translation = line[TRANSLATION_START:].strip().decode(encoding)
+
+        entry_id = next(entry_ids)
+
+        # Create the list of stems, ignoring those that are empty or zzz
+        stems = [{'entry_id': entry_id, 'stem_number': i, 'stem_word': s, 'stem_simple_word': s}
+                 for i, s in enumerate(stem_words, 1)
+                 if len(s) > 0 and s != 'zzz']
+
+        # Create the basic entry, i.e. everything except the part of speech data
+        rows[Entry.__table__].append({'id': entry_id,
+                                      'part_of_speech_code': part_of_speech_code,
+                                      'age_code': age_code,
+                                      'area_code': area_code,
+                                      'location_code': location_code,
+                                      'frequency_code': frequency_code,
+                                      'source_code': source_code,
+                                      'translation': translation})
+        rows[Stem.__table__].extend(stems)
+
+        for table, row in parser.parse_translation(language_id=language_id,
+                                                   entry_id=entry_id,
+                                                   area_code=area_code,
+                                                   translation=translation):
+            rows[table].append(row)
+
+        # Create the specific entry given the part of speech
+        builder = _entry_builders.get(part_of_speech_code)
+        if builder is not None:
+            table, row = builder(entry_id, part_of_speech_data.split(), stems)
+            rows.setdefault(table, []).append(row)
+
+        # Hand the chunk to the writer
+        if line_number % chunk_size == 0:
+            writer.put(_write_rows, rows)
+            rows = _new_rows()
+
+    writer.put(_write_rows, rows)
+
+    if not own_writer:
+        return
+
+    writer.close()
+
+    # If we don't want to commit changes, just list the output
+    if not commit_changes:
+        session.query(NounEntry).all()
+        session.query(PronounEntry).all()
+        session.query(PropackEntry).all()
+        session.query(AdjectiveEntry).all()
+        session.query(NumeralEntry).all()
+        session.query(AdverbEntry).all()
+        session.query(VerbEntry).all()
+        session.query(PrepositionEntry).all()
+        session.query(ConjunctionEntry).all()
+        session.query(InterjectionEntry).all()
+    else:
+        print('Committing changes to database')
+        session.commit()
@@ -1,6 +1,10 @@
+from doll.config import config
 from doll.db import Connection
 from doll.db.model import *
-from tqdm import tqdm
+from doll.input_parser.pipeline import RowWriter
+from doll.input_parser.read_input import read_input
+from itertools import count
+from sqlalchemy import func
 
 """Parses the inflections input file.
 
@@ -8,212 +12,148 @@ from tqdm import tqdm
    its contents to the database. Type tables must
    be populated before this is run.
 
+   Each line of INFLECTS.LAT is the part of speech code, the
+   columns of that part of speech, then the columns common
+   to every record: stem key, ending length, the ending itself
+   (absent when its length is 0), age and frequency, then
+   optionally '--' and notes. The part of speech columns are
+   declared in INFLECTION_SCHEMA, which is compiled once into
+   a decoder per part of speech.
+
 """
 
+# Record class and its columns, in order, for each part of speech
+INFLECTION_SCHEMA = {
+    'N': (NounRecord, ('declension_code', 'variant', 'case_code', 'number_code', 'gender_code')),
+    'PRON': (PronounRecord, ('declension_code', 'variant', 'case_code', 'number_code', 'gender_code')),
+    'ADJ': (AdjectiveRecord, ('declension_code', 'variant', 'case_code', 'number_code', 'gender_code',
+                              'comparison_type_code')),
+    'NUM': (NumeralRecord, ('declension_code', 'variant', 'case_code', 'number_code', 'gender_code',
+                            'numeral_sort_code')),
+    'V': (VerbRecord, ('conjugation_code', 'variant', 'tense_code', 'voice_code', 'mood_code', 'person_code',
+                       'number_code')),
+    'VPAR': (VerbParticipleRecord, ('conjugation_code', 'variant', 'case_code', 'number_code', 'gender_code',
+                                    'tense_code', 'voice_code', 'mood_code')),
+    'SUPINE': (SupineRecord, ('conjugation_code', 'variant', 'case_code', 'number_code', 'gender_code')),
+    'ADV': (AdverbRecord, ('comparison_type_code',)),
+    'PREP': (PrepositionRecord, ('case_code',)),
+    'CONJ': (ConjunctionRecord, ()),
+    'INTERJ': (InterjectionRecord, ())
+}
+
+# Columns of the rows emitted for the inflection_record table
+RECORD_COLUMNS = ('id', 'part_of_speech_code', 'stem_key', 'ending', 'age_code', 'frequency_code', 'notes')
+
+
+def compile_schema(model, columns):
+    """Compiles the columns of a part of speech into a decoder for its lines
+
+    :param model: The record class for the part of speech
+    :param columns: The part of speech columns, in the order they appear in a line
+    :return: The decoder, which takes the split line and a record id, and
+             returns a row for inflection_record and a row for the record class
+    """
+
+    width = len(columns)
+    variant = columns.index('variant') + 1 if 'variant' in columns else None
+
+    def decode(line_split, record_id):
+        fields = line_split[1:width + 1]
+        if variant is not None:
+            fields[variant - 1] = int(line_split[variant])
+
+        # An ending length of 0 means there is no ending in the line
+        i = width + 1
+        if line_split[i + 1] == '0':
+            ending, j = '', i + 2
+        else:
+            ending, j = line_split[i + 2], i + 3
+
+        return ((record_id, line_split[0], int(line_split[i]), ending,
+                 line_split[j], line_split[j + 1], ' '.join(line_split[j + 3:])),
+                (record_id, *fields))
+
+    return decode
+
+
+# Decoder and the row layout of its record class, for each part of speech
+_decoders = {part_of_speech_code: (compile_schema(model, columns), model.__table__, ('record_id',) + columns)
+             for part_of_speech_code, (model, columns) in INFLECTION_SCHEMA.items()}
+
+
+def _write_rows(session, rows):
+    """Bulk inserts the row tuples collected for each table
+
+    :param session: The session to write through
+    :param rows: Dictionary of table to its columns and a list of rows
+    """
+
+    for table, (columns, table_rows) in rows.items():
+        if table_rows:
+            session.execute(table.insert(), [dict(zip(columns, row)) for row in table_rows])
+
+
+def _new_rows() -> dict:
+    """Creates the lists of rows waiting to be written, by table; records
+    first, as the others refer to them"""
+
+    rows = {Record.__table__: (RECORD_COLUMNS, [])}
+    rows.update((table, (columns, [])) for decoder, table, columns in _decoders.values())
+
+    return rows
+
+
+def _next_record_id(session) -> int:
+    return (session.query(func.max(Record.id)).scalar() or 0) + 1
+
+
+def parse_inflect_file(inflect_file, commit_changes=False, chunk_size=None, writer=None):
+    """Parses the inflections file
+
+    Each chunk_size lines are handed to a RowWriter, which writes them
+    while the next are parsed.
+
+    :param inflect_file: The path of the INFLECTS.LAT file, or '-' to read it from stdin
+    :param commit_changes: Whether to save changes to the database
+    :param chunk_size: Lines to parse between writes, defaults to ingest_chunk_size in the config
+    :param writer: A RowWriter shared with other parsers, whose owner closes it and commits;
+                   by default the parser has one of its own
+    :return: void
+    """
 
-def parse_inflect_file(inflect_file, commit_changes=False):
     session = Connection.session
 
-    # Dictionary to define the start of the line
-    line_start = {
-        'N': 6,
-        'PRON': 6,
-        'ADJ': 7,
-        'NUM': 7,
-        'ADV': 2,
-        'V': 8,
-        'VPAR': 9,
-        'SUPINE': 6,
-        'PREP': 2,
-        'CONJ': 1,
-        'INTERJ': 1
-    }
+    # Lines to parse between writes to the database, to keep memory flat
+    chunk_size = chunk_size or int(config['ingest_chunk_size'])
+
+    own_writer = writer is None
+    writer = writer or RowWriter(session)
+
+    rows = _new_rows()
+    record_ids = count(writer.call(_next_record_id))
 
     print('Parsing inflections file')
 
-    # Open the inflections file and loop over its lines
-    with open(inflect_file, encoding='windows_1252') as f:
-        # Start by counting the lines in the file
-        line_count = sum(1 for line in f)
-        f.seek(0)
-
-        for line in tqdm(f, total=line_count):
-            line_split = line.split()
-            if len(line_split) > 0 and line_split[0][0] != '-':
-                i = line_start[line_split[0]]
-                # Check if we have an empty record
-                if len(line_split[i + 2]) == 1 and line_split[i + 2] == line_split[i + 2].upper():
-                    i -= 1
-                    ending = ''
-                else:
-                    ending = line_split[i + 2]
-                if line_split[0] == 'N':
-                    noun = NounRecord(
-                        declension_code=line_split[1],
-                        variant=line_split[2],
-                        case_code=line_split[3],
-                        number_code=line_split[4],
-                        gender_code=line_split[5],
-                        record=Record(
-                            part_of_speech_code=line_split[0],
-                            stem_key=line_split[i],
-                            ending=ending,
-                            age_code=line_split[i + 3],
-                            frequency_code=line_split[i + 4],
-                            notes=" ".join(line_split[i + 6:])
-                        ))
-                    session.add(noun)
-                elif line_split[0] == 'ADJ':
-                    adjective = AdjectiveRecord(
-                        declension_code=line_split[1],
-                        variant=line_split[2],
-                        case_code=line_split[3],
-                        number_code=line_split[4],
-                        gender_code=line_split[5],
-                        comparison_type_code=line_split[6],
-                        record=Record(
-                            part_of_speech_code=line_split[0],
-                            stem_key=line_split[i],
-                            ending=ending,
-                            age_code=line_split[i + 3],
-                            frequency_code=line_split[i + 4],
-                            notes=" ".join(line_split[i + 6:])
-                        ))
-                    session.add(adjective)
-                elif line_split[0] == 'PRON':
-                    pronoun = PronounRecord(
-                        declension_code=line_split[1],
-                        variant=line_split[2],
-                        case_code=line_split[3],
-                        number_code=line_split[4],
-                        gender_code=line_split[5],
-                        record=Record(
-                            part_of_speech_code=line_split[0],
-                            stem_key=line_split[i],
-                            ending=ending,
-                            age_code=line_split[i + 3],
-                            frequency_code=line_split[i + 4],
-                            notes=" ".join(line_split[i + 6:])
-                        ))
-                    session.add(pronoun)
-                elif line_split[0] == 'NUM':
-                    numeral = NumeralRecord(
-                        declension_code=line_split[1],
-                        variant=line_split[2],
-                        case_code=line_split[3],
-                        number_code=line_split[4],
-                        gender_code=line_split[5],
-                        numeral_sort_code=line_split[6],
-                        record=Record(
-                            part_of_speech_code=line_split[0],
-                            stem_key=line_split[i],
-                            ending=ending,
-                            age_code=line_split[i + 3],
-                            frequency_code=line_split[i + 4],
-                            notes=" ".join(line_split[i + 6:])
-                        ))
-                    session.add(numeral)
-                elif line_split[0] == 'V':
-                    verb = VerbRecord(
-                        conjugation_code=line_split[1],
-                        variant=line_split[2],
-                        tense_code=line_split[3],
-                        voice_code=line_split[4],
-                        mood_code=line_split[5],
-                        person_code=line_split[6],
-                        number_code=line_split[7],
-                        record=Record(
-                            part_of_speech_code=line_split[0],
-                            stem_key=line_split[i],
-                            ending=ending,
-                            age_code=line_split[i + 3],
-                            frequency_code=line_split[i + 4],
-                            notes=" ".join(line_split[i + 6:])
-                        ))
-                    session.add(verb)
-                elif line_split[0] == 'VPAR':
-                    verbparticiple = VerbParticipleRecord(
-                        conjugation_code=line_split[1],
-                        variant=line_split[2],
-                        case_code=line_split[3],
-                        number_code=line_split[4],
-                        gender_code=line_split[5],
-                        tense_code=line_split[6],
-                        voice_code=line_split[7],
-                        mood_code=line_split[8],
-                        record=Record(
-                            part_of_speech_code=line_split[0],
-                            stem_key=line_split[i],
-                            ending=ending,
-                            age_code=line_split[i + 3],
-                            frequency_code=line_split[i + 4],
-                            notes=" ".join(line_split[i + 6:])
-                        ))
-                    session.add(verbparticiple)
-                elif line_split[0] == 'SUPINE':
-                    supine = SupineRecord(
-                        conjugation_code=line_split[1],
-                        variant=line_split[2],
-                        case_code=line_split[3],
-                        number_code=line_split[4],
-                        gender_code=line_split[5],
-                        record=Record(
-                            part_of_speech_code=line_split[0],
-                            stem_key=line_split[i],
-                            ending=ending,
-                            age_code=line_split[i + 3],
-                            frequency_code=line_split[i + 4],
-                            notes=" ".join(line_split[i + 6:])
-                        ))
-                    session.add(supine)
-
-                # None of the remaining types have an ending, so we don't need to check
-                elif line_split[0] == 'ADV':
-                    adverb = AdverbRecord(
-                        comparison_type_code=line_split[1],
-                        record=Record(
-                            part_of_speech_code=line_split[0],
-                            stem_key=line_split[i],
-                            ending='',
-                            age_code=line_split[i + 2],
-                            frequency_code=line_split[i + 3],
-                            notes=" ".join(line_split[i + 5:])
-                        ))
-                    session.add(adverb)
-                elif line_split[0] == 'PREP':
-                    preposition = PrepositionRecord(
-                        case_code=line_split[1],
-                        record=Record(
-                            part_of_speech_code=line_split[0],
-                            stem_key=line_split[i],
-                            ending='',
-                            age_code=line_split[i + 2],
-                            frequency_code=line_split[i + 3],
-                            notes=" ".join(line_split[i + 5:])
-                        ))
-                    session.add(preposition)
-                elif line_split[0] == 'CONJ':
-                    conjunction = ConjunctionRecord(
-                        record=Record(
-                            part_of_speech_code=line_split[0],
-                            stem_key=line_split[i],
-                            ending='',
-                            age_code=line_split[i + 2],
-                            frequency_code=line_split[i + 3],
-                            notes=" ".join(line_split[i + 5:])
-                        ))
-                    session.add(conjunction)
-                elif line_split[0] == 'INTERJ':
-                    interjection = InterjectionRecord(
-                        record=Record(
-                            part_of_speech_code=line_split[0],
-                            stem_key=line_split[i],
-                            ending='',
-                            age_code=line_split[i + 2],
-                            frequency_code=line_split[i + 3],
-                            notes=" ".join(line_split[i + 5:])
-                        ))
-                    session.add(interjection)
+    # Loop over the lines of the inflections file in a single pass
+    for line_number, line in enumerate(read_input(inflect_file), 1):
+        line_split = line.split()
+        if len(line_split) > 0 and line_split[0][0] != '-':
+            decoder, table, columns = _decoders[line_split[0]]
+            record, specific_record = decoder(line_split, next(record_ids))
+            rows[Record.__table__][1].append(record)
+            rows[table][1].append(specific_record)
+
+        # Hand the chunk to the writer
+        if line_number % chunk_size == 0:
+            writer.put(_write_rows, rows)
+            rows = _new_rows()
+
+    writer.put(_write_rows, rows)
+
+    if not own_writer:
+        return
+
+    writer.close()
 
     if commit_changes:
         session.commit()
@@ -228,4 +168,4 @@ def parse_inflect_file(inflect_file, commit_changes=False):
         session.query(PrepositionRecord).all()
         session.query(ConjunctionRecord).all()
         session.query(InterjectionRecord).all()
-        session.query(SupineRecord).all()
\ No newline at end of file
+        session.query(SupineRecord).all()
@@ -0,0 +1,118 @@
+"""Writes parsed rows to the database on a thread of its own.
+
+   Parsing a line is Python work, while writing rows is mostly sqlite's,
+   which releases the interpreter while it runs. So rather than
+   alternate the two, the parsers hand each chunk of rows to a
+   RowWriter, whose thread writes it while the next chunk is parsed.
+   The writer's queue holds only ingest_queue_depth chunks, and a
+   parser that gets that far ahead waits, so memory stays flat.
+
+   The writer's thread is the only one to use the session while it
+   runs, so anything else the parsers need from the session, such as
+   the next free id, is asked of the writer with call. Afterwards the
+   thread which started the writer goes on with the same connection,
+   which sqlite only allows when it is opened with check_same_thread
+   off, as the Connection engine is.
+
+"""
+
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from doll.config import config
+
+_log = logging.getLogger(__name__)
+
+
+# Writes chunks of rows through a session, on its own thread
+class RowWriter:
+    """A thread writing chunks of rows, in the order they are put"""
+
+    def __init__(self, session, depth: int = None):
+        """Starts the writer
+
+        :param session: The session to write through, which only the writer may use until it is closed
+        :param depth: Chunks which may wait to be written, defaults to ingest_queue_depth in the config
+        """
+
+        self.session = session
+        self._queue = queue.Queue(maxsize=depth or int(config['ingest_queue_depth']))
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='doll-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+
+            function, args, future = task
+
+            # Once a write has failed, skip the rest, but keep draining the queue so nobody waits forever
+            if self._error is not None:
+                if future is not None:
+                    future.set_exception(self._error)
+                continue
+
+            try:
+                result = function(self.session, *args)
+            except BaseException as e:
+                self._error = e
+                if future is not None:
+                    future.set_exception(e)
+            else:
+                if future is not None:
+                    future.set_result(result)
+
+    def _check(self):
+        if self._error is not None:
+            raise self._error
+
+    def put(self, write, rows):
+        """Queues rows to be written, waiting while the queue is full
+
+        :param write: The function to write them with, called with the session and rows
+        :param rows: The rows, which the caller must not change afterwards
+        """
+
+        self._check()
+        self._queue.put((write, (rows,), None))
+
+    def call(self, function, *args):
+        """Calls a function with the session on the writer's thread, after the rows already put
+
+        :param function: The function, called with the session and args
+        :param args: Further arguments to the function
+        :return: What the function returned
+        """
+
+        self._check()
+
+        future = Future()
+        self._queue.put((function, args, future))
+
+        return future.result()
+
+    def close(self):
+        """Waits for every row to be written, and stops the writer"""
+
+        self._queue.put(None)
+        self._thread.join()
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+            return
+
+        # The error that stopped the with block is the one raised; the writer's is only logged
+        try:
+            self.close()
+        except BaseException as e:
+            if e is not exc_val:
+                _log.error('Writing rows failed as well', exc_info=e)
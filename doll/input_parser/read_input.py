@@ -0,0 +1,52 @@
+"""Reads the Words input files.
+
+   Input files are read in a single streaming pass. Progress is
+   reported against the size of the file in bytes rather than a line
+   count, so there is no need to read the file twice, and sources
+   that cannot seek, such as pipes, can be parsed too.
+
+"""
+
+import os
+import stat
+import sys
+from tqdm import tqdm
+
+
+def input_size(f) -> int:
+    """Finds the size in bytes of an open input file, if it has one
+
+    :param f: The open file
+    :return: The size of the file, or None if it is not a regular file
+    """
+
+    try:
+        file_stat = os.fstat(f.fileno())
+    except (AttributeError, OSError, ValueError):
+        return None
+
+    return file_stat.st_size if stat.S_ISREG(file_stat.st_mode) else None
+
+
+def read_input(input_file: str, encoding: str = 'windows_1252'):
+    """Yields the decoded lines of an input file, reporting progress as it goes
+
+    :param input_file: The path of the file, or '-' to read from stdin
+    :param encoding: The encoding of the file; the Words files are windows_1252.
+                     If None the lines are left as bytes
+    :return: A generator of lines
+    """
+
+    if input_file == '-':
+        f = sys.stdin.buffer
+    else:
+        f = open(input_file, 'rb')
+
+    try:
+        with tqdm(total=input_size(f), unit='B', unit_scale=True) as progress:
+            for line in f:
+                progress.update(len(line))
+                yield line if encoding is None else line.decode(encoding)
+    finally:
+        if f is not sys.stdin.buffer:
+            f.close()
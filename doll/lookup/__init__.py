@@ -0,0 +1,7 @@
+"""Lookup structures.
+
+   This package builds structures derived from the dictionary
+   and inflection tables, once they have been populated by the
+   input parser, and uses them to look words up quickly.
+
+"""
@@ -0,0 +1,136 @@
+"""Autocompletion of words as they are typed.
+
+   Every distinct form is held in memory in a sorted list, with the
+   best score of its analyses (see doll.lookup.ranking), so the forms
+   starting with a prefix are a contiguous range found by bisection.
+   Short prefixes match so many forms that ranking the range on each
+   keystroke would be too slow, so the best completions of every prefix
+   up to autocomplete_index_length characters are found once, when the
+   completer is loaded; longer prefixes match few enough forms to rank
+   as they are typed.
+
+   Lemmas, the first form of each entry's paradigm, such as amo or
+   puella, are marked, and come before other forms of equal score.
+
+"""
+
+import heapq
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+from doll.config import config
+from doll.db import Connection
+from doll.db.model import *
+from doll.lookup.cache import on_new_build
+from sqlalchemy import and_, func
+
+# A completion of a prefix, whether it is the lemma of an entry, and its score
+Completion = namedtuple('Completion', ['form', 'is_lemma', 'score'])
+
+# The completer used by complete, and the lock it is loaded under
+_completer = None
+_lock = threading.Lock()
+
+
+# Sorted forms, for finding those with a prefix
+class Completer:
+    """The forms of the dictionary, for completing prefixes"""
+
+    def __init__(self, session=None, limit: int = None, index_length: int = None):
+        """Loads every form, and the best completions of short prefixes
+
+        :param session: The session to query, by default the shared Connection session
+        :param limit: The most completions to keep for each short prefix, defaults to
+                      autocomplete_limit in the config
+        :param index_length: The longest prefix to find completions for in advance, defaults to
+                             autocomplete_index_length in the config
+        """
+
+        session = session or Connection.session
+
+        self.limit = limit or int(config['autocomplete_limit'])
+        self.index_length = index_length or int(config['autocomplete_index_length'])
+
+        # The first record of each entry's paradigm gives its lemma
+        first_records = session.query(Form.entry_id, func.min(Form.record_id).label('record_id')) \
+            .group_by(Form.entry_id).subquery()
+        lemmas = {form for (form,) in session.query(Form.form)
+                  .join(first_records, and_(first_records.c.entry_id == Form.entry_id,
+                                            first_records.c.record_id == Form.record_id))}
+
+        self.forms, self._ranks = [], []
+        for form, score in session.query(Form.form, func.max(Form.score)).group_by(Form.form).order_by(Form.form):
+            self.forms.append(form)
+            self._ranks.append((score if score is not None else float('-inf'), form in lemmas))
+
+        # Best completions of short prefixes, found by adding each form to its prefixes, best first
+        self._index = {}
+        for position in sorted(range(len(self.forms)), key=self._key):
+            form = self.forms[position]
+            for length in range(1, min(len(form), self.index_length) + 1):
+                completions = self._index.setdefault(form[:length], [])
+                if len(completions) < self.limit:
+                    completions.append(position)
+
+    def _key(self, position: int) -> tuple:
+        score, is_lemma = self._ranks[position]
+
+        return -score, not is_lemma, self.forms[position]
+
+    def _completion(self, position: int) -> Completion:
+        score, is_lemma = self._ranks[position]
+
+        return Completion(self.forms[position], is_lemma, score if score != float('-inf') else None)
+
+    def complete(self, prefix: str, limit: int = None) -> list:
+        """Finds the best forms starting with a prefix
+
+        :param prefix: The prefix, as typed
+        :param limit: The most completions to return, defaults to autocomplete_limit in the config
+        :return: A list of Completions, the highest scores first
+        """
+
+        limit = limit or self.limit
+
+        if not prefix:
+            return []
+
+        if len(prefix) <= self.index_length and limit <= self.limit:
+            return [self._completion(position) for position in self._index.get(prefix, [])[:limit]]
+
+        start = bisect_left(self.forms, prefix)
+        end = bisect_left(self.forms, prefix + '￿', start)
+
+        return [self._completion(position) for position in heapq.nsmallest(limit, range(start, end), key=self._key)]
+
+
+@on_new_build
+def reset_completer():
+    """Drops the completer, so it is loaded again from the database's new build"""
+
+    global _completer
+
+    with _lock:
+        _completer = None
+
+
+def complete(prefix: str, limit: int = None, session=None) -> list:
+    """Finds the best forms starting with a prefix, loading the completer on first use
+
+    :param prefix: The prefix, as typed
+    :param limit: The most completions to return, defaults to autocomplete_limit in the config
+    :param session: The session to load the completer with, by default the shared Connection session
+    :return: A list of Completions, the highest scores first
+    """
+
+    global _completer
+
+    # The completer may be dropped by reset_completer while this runs
+    completer = _completer
+    if completer is None:
+        with _lock:
+            if _completer is None:
+                _completer = Completer(session=session)
+            completer = _completer
+
+    return completer.complete(prefix, limit=limit)
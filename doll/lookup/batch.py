@@ -0,0 +1,173 @@
+"""Batch lookup of many words at once, with NumPy.
+
+   Looking words up one at a time pays for a query, or at least for a
+   Python dictionary lookup, on every token. FormIndex instead loads
+   the lookup_form table into arrays: the 64-bit hashes of the forms,
+   sorted, with the range of each form's rows in parallel arrays of
+   entry and record ids. A batch of tokens is hashed and resolved
+   against the sorted hashes with np.searchsorted, so lemmatising a
+   corpus runs at array speed, and only the hits are expanded into
+   Analysis tuples, a few hundred distinct forms to a query.
+
+   NumPy is optional, and only needed to use this module.
+
+"""
+
+from doll.db import Connection
+from doll.db.model import *
+from doll.parse_test import analyse_forms
+import hashlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# The number of distinct forms expanded into analyses by each query, within sqlite's limit on parameters
+_forms_per_query = 500
+
+
+def _hash(word: str) -> int:
+    """Hashes a word to 64 bits, the same in every process
+
+    :param word: The word
+    :return: The hash, as a signed integer
+    """
+
+    return int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+# Hashes of the forms in memory, sorted, and the entries and records of each form
+class FormIndex:
+    """An in-memory index of every form, for resolving many tokens at once
+
+    Forms are hashed with a blake2b digest, as the Bloom filter hashes
+    them, so a word has the same hash in every process.
+    """
+
+    def __init__(self, session=None):
+        """Loads the index from the lookup_form table
+
+        :param session: The session to query, by default the shared Connection session
+        """
+
+        if np is None:
+            raise ImportError('FormIndex requires numpy, which is not installed')
+
+        session = session or Connection.session
+
+        forms, starts, entry_ids, record_ids = [], [], [], []
+        for row, (form, entry_id, record_id) in enumerate(session.query(Form.form, Form.entry_id, Form.record_id)
+                                                          .order_by(Form.form, Form.id)):
+            if not forms or forms[-1] != form:
+                forms.append(form)
+                starts.append(row)
+            entry_ids.append(entry_id)
+            record_ids.append(record_id)
+
+        starts.append(len(entry_ids))
+
+        hashes = np.fromiter(map(_hash, forms), dtype=np.int64, count=len(forms))
+        order = np.argsort(hashes, kind='stable')
+        bounds = np.asarray(starts, dtype=np.int64)
+
+        self._hashes = hashes[order]
+        self._forms = np.asarray(forms, dtype=object)[order]
+        self._starts = bounds[:-1][order]
+        self._ends = bounds[1:][order]
+        self.entry_ids = np.asarray(entry_ids, dtype=np.int64)
+        self.record_ids = np.asarray(record_ids, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._forms)
+
+    def positions(self, tokens):
+        """Finds the position of each token in the index
+
+        :param tokens: A sequence of words
+        :return: An array with the index position of each token's form, or -1 where it has none
+        """
+
+        tokens = list(tokens)
+        hashes = np.fromiter(map(_hash, tokens), dtype=np.int64, count=len(tokens))
+
+        if not len(self._hashes):
+            return np.full(len(tokens), -1, dtype=np.int64)
+
+        positions = np.searchsorted(self._hashes, hashes)
+        positions[positions == len(self._hashes)] = 0
+        positions[self._hashes[positions] != hashes] = -1
+
+        # Check the word of each distinct hash that matched, against a collision with another word
+        hits = np.flatnonzero(positions >= 0)
+        unique_hashes, first, inverse = np.unique(hashes[hits], return_index=True, return_inverse=True)
+        matched = positions[hits[first]]
+        for i, token_index in enumerate(hits[first]):
+            if self._forms[matched[i]] != tokens[token_index]:
+                matched[i] = self._find(tokens[token_index], matched[i])
+        positions[hits] = matched[inverse]
+
+        return positions
+
+    def _find(self, token: str, position: int) -> int:
+        """Finds a word among the forms sharing its hash
+
+        :param token: The word
+        :param position: The first position with the word's hash
+        :return: The position of the word, or -1 if it is not a form
+        """
+
+        token_hash = self._hashes[position]
+        while position < len(self._hashes) and self._hashes[position] == token_hash:
+            if self._forms[position] == token:
+                return position
+            position += 1
+
+        return -1
+
+    def resolve(self, tokens) -> tuple:
+        """Finds the entry and record of every analysis of every token
+
+        :param tokens: A sequence of words
+        :return: Arrays of the token index, entry id and record id of each analysis, in token order
+        """
+
+        positions = self.positions(tokens)
+
+        # An empty index has no rows to gather from, even for tokens that missed
+        if not len(self):
+            nothing = np.zeros(0, dtype=np.int64)
+            return nothing, nothing, nothing
+
+        hits = positions >= 0
+
+        starts = np.where(hits, self._starts[positions], 0)
+        lengths = np.where(hits, self._ends[positions] - starts, 0)
+
+        token_indices = np.repeat(np.arange(len(positions)), lengths)
+        rows = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+
+        return token_indices, self.entry_ids[rows], self.record_ids[rows]
+
+    def analyses(self, tokens, session=None) -> list:
+        """Finds the analyses of every token, expanding each form once in the batch
+
+        The distinct forms of the batch are expanded together, with one
+        query for every few hundred of them. They are kept for this call
+        only, so memory is bounded by the batch rather than growing with
+        every form seen.
+
+        :param tokens: A sequence of words
+        :param session: The session to query, by default the shared Connection session
+        :return: A list with the list of Analysis tuples of each token
+        """
+
+        positions = self.positions(tokens)
+
+        forms = sorted(set(self._forms[positions[positions >= 0]]))
+        expanded = {}
+        for start in range(0, len(forms), _forms_per_query):
+            expanded.update(analyse_forms(forms[start:start + _forms_per_query], session=session))
+
+        return [expanded.get(self._forms[position], []) if position >= 0 else [] for position in positions]
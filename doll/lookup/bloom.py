@@ -0,0 +1,186 @@
+"""Bloom filter over the forms.
+
+   Real texts are full of tokens which cannot be Latin forms: numbers,
+   punctuation, Greek, English, editorial sigla. Each would otherwise
+   cost a full analysis query which returns nothing. The filter holds
+   two keys for every form, one for each way a word is matched:
+
+   - its canonical spelling, which a non-strict match, being the form
+     itself, and any orthographic variant of the form share
+   - the canonical spelling of its remove_accents spelling, which a
+     strict match shares, even when the word has capitals, digits or
+     punctuation that remove_accents drops
+
+   A word whose key for its mode is not in the filter certainly has
+   no analyses, and is answered without touching the database.
+
+   The filter is built with the database, to the false positive rate
+   bloom_false_positive_rate in the config, and saved next to it as
+   bloom_file.
+
+"""
+
+import hashlib
+import math
+import os
+import struct
+from doll.config import config
+from doll.db import Connection
+from doll.db.model import *
+from doll.lookup.orthography import canonical, remove_accents
+
+# Magic number, number of hashes and number of bits, at the start of the file
+_header = struct.Struct('<4sIQ')
+_magic = b'DLBF'
+
+# The filter loaded by might_be_form, or False if there is none
+_loaded = None
+
+
+def bloom_path() -> str:
+    """Finds the path of the filter file, next to the database
+
+    :return: The path
+    """
+
+    return os.path.expanduser('~/.doll/') + config['bloom_file']
+
+
+# A set of words which may report false positives, but never false negatives
+class BloomFilter:
+    """A Bloom filter of words
+
+    Each word sets hash_count bits, found by double hashing a blake2b
+    digest of the word, so the same bits are found in every process.
+    """
+
+    def __init__(self, bit_count: int, hash_count: int, bits: bytearray = None):
+        self.bit_count = bit_count
+        self.hash_count = hash_count
+        self.bits = bits if bits is not None else bytearray((bit_count + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, false_positive_rate: float):
+        """Creates an empty filter, sized for a number of words
+
+        :param capacity: The number of words the filter will hold
+        :param false_positive_rate: The chance a word not added is reported as present
+        :return: The filter
+        """
+
+        capacity = max(capacity, 1)
+        bit_count = max(math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2), 8)
+        hash_count = max(round(bit_count / capacity * math.log(2)), 1)
+
+        return cls(bit_count, hash_count)
+
+    @staticmethod
+    def _hashes(word: str) -> tuple:
+        digest = hashlib.blake2b(word.encode('utf-8'), digest_size=16).digest()
+
+        return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+    def add(self, word: str):
+        first, second = self._hashes(word)
+
+        for i in range(self.hash_count):
+            position = (first + i * second) % self.bit_count
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, word: str) -> bool:
+        first, second = self._hashes(word)
+        bits, bit_count = self.bits, self.bit_count
+
+        # Most words which are absent are ruled out by the first bit or two
+        for i in range(self.hash_count):
+            position = (first + i * second) % bit_count
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+
+        return True
+
+    def save(self, path: str):
+        """Writes the filter to a file
+
+        :param path: The path of the file
+        """
+
+        with open(path, 'wb') as f:
+            f.write(_header.pack(_magic, self.hash_count, self.bit_count))
+            f.write(self.bits)
+
+    @classmethod
+    def load(cls, path: str):
+        """Reads a filter from a file
+
+        :param path: The path of the file
+        :return: The filter
+        """
+
+        with open(path, 'rb') as f:
+            magic, hash_count, bit_count = _header.unpack(f.read(_header.size))
+            if magic != _magic:
+                raise ValueError('{0} is not a Bloom filter file'.format(path))
+
+            return cls(bit_count, hash_count, bytearray(f.read()))
+
+
+def strict_key(word: str) -> str:
+    """Finds the key of a word in the filter when it is matched strictly
+
+    :param word: The word
+    :return: The canonical spelling of the word's remove_accents spelling
+    """
+
+    return canonical(remove_accents(word))
+
+
+def build_bloom_filter(session=None, path: str = None, false_positive_rate: float = None) -> BloomFilter:
+    """Builds the filter from the keys of the forms for each way of matching them, and saves it
+
+    lookup_form must already have its canonical forms.
+
+    :param session: The session to query, by default the shared Connection session
+    :param path: The path to save the filter to, by default bloom_file next to the database
+    :param false_positive_rate: The false positive rate, by default bloom_false_positive_rate in the config
+    :return: The filter
+    """
+
+    global _loaded
+
+    session = session or Connection.session
+
+    print('Building Bloom filter')
+
+    # For almost every form the two keys are the same
+    keys = set()
+    for form, canonical_form in session.query(Form.form, Form.canonical_form).distinct():
+        keys.add(canonical_form)
+        keys.add(strict_key(form))
+
+    bloom = BloomFilter.for_capacity(len(keys), false_positive_rate or float(config['bloom_false_positive_rate']))
+    for key in keys:
+        bloom.add(key)
+
+    bloom.save(path or bloom_path())
+    _loaded = None
+
+    return bloom
+
+
+def might_be_form(word: str, strict: bool = False) -> bool:
+    """Checks the filter for a word, loading it on first use
+
+    :param word: The word
+    :param strict: Whether the word is matched strictly
+    :return: False if the word certainly has no analyses, True if it may have,
+             or if there is no filter
+    """
+
+    global _loaded
+
+    if _loaded is None:
+        _loaded = BloomFilter.load(bloom_path()) if os.path.isfile(bloom_path()) else False
+
+    # A strict match may also fall back to the word's orthographic variants, found by its canonical spelling
+    return _loaded is False or canonical(word) in _loaded or (strict and strict_key(word) in _loaded)
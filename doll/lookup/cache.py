@@ -0,0 +1,215 @@
+"""Persistent cache of analyses.
+
+   Every new process would otherwise analyse the same common words
+   again. With analysis_cache set in the config, analyse_word keeps the
+   analyses it finds in a small SQLite file next to the database,
+   cache_file, keyed by the match mode, whether variant spellings were
+   tried, and the normalised word, so short-lived jobs start warm.
+
+   Each build of the database is stamped with a hash of its contents,
+   and the cache with the stamp of the build it was filled from. A
+   cache of any other build is emptied when it is opened, and
+   parse_all_inputs removes the cache along with the old database.
+   Anything that changes what lookups return once the database is
+   built, such as ranking it again, stamps it again. Stamping also
+   empties the caches this process holds in memory, registered with
+   on_new_build, so they are loaded again from the new build.
+
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from doll.config import config
+from doll.db import Connection
+from doll.db.model import *
+from sqlalchemy.exc import OperationalError
+
+# The cache used by analysis_cache, False if there is no stamped build, and the lock it is opened under
+_cache = None
+_lock = threading.Lock()
+
+# Functions emptying the caches held in memory, called when the database is stamped
+_resets = []
+
+
+def cache_path() -> str:
+    """Finds the path of the cache file, next to the database
+
+    :return: The path
+    """
+
+    return os.path.expanduser('~/.doll/') + config['cache_file']
+
+
+def remove_cache(path: str = None):
+    """Removes the cache file, with its write-ahead log
+
+    :param path: The path of the cache, by default cache_file next to the database
+    """
+
+    path = path or cache_path()
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.isfile(path + suffix):
+            os.remove(path + suffix)
+
+
+def on_new_build(reset):
+    """Registers a function emptying a cache held in memory, to call when the database is stamped
+
+    :param reset: The function, which takes no arguments
+    :return: The function, so this can decorate it
+    """
+
+    _resets.append(reset)
+
+    return reset
+
+
+def reset_caches():
+    """Empties the caches held in memory, so they are loaded again from the database's latest build"""
+
+    global _cache
+
+    with _lock:
+        cache, _cache = _cache, None
+
+    # Close the old cache's connection, and with it the write-ahead log; threads still
+    # holding the cache then find nothing in it, and keep nothing
+    if cache:
+        cache.close()
+
+    for reset in _resets:
+        reset()
+
+
+def stamp_build(session=None):
+    """Stamps the database with a hash of its file, once it has been built or changed and committed,
+    and empties the caches held in memory
+
+    :param session: The session to write through, by default the shared Connection session
+    :return: The stamp
+    """
+
+    session = session or Connection.session
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(os.path.expanduser('~/.doll/') + config['db_file'], 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+
+    stamp = digest.hexdigest()
+    session.add(Build(stamp=stamp))
+    session.commit()
+
+    reset_caches()
+
+    return stamp
+
+
+def build_stamp(session=None) -> str:
+    """Finds the stamp of the database's latest build
+
+    :param session: The session to query, by default the shared Connection session
+    :return: The stamp, or None if the database was never stamped
+    """
+
+    session = session or Connection.session
+
+    try:
+        return session.query(Build.stamp).order_by(Build.id.desc()).limit(1).scalar()
+    except OperationalError:
+        # A database built before builds were stamped
+        session.rollback()
+        return None
+
+
+# Analyses of words, serialised, kept from one process to the next
+class AnalysisCache:
+    """A cache of analyses in an SQLite file, for a single build of the database
+
+    Safe to share between threads, and between processes. Once closed,
+    it holds nothing, and keeps nothing.
+    """
+
+    def __init__(self, stamp: str, path: str = None):
+        """Opens the cache, emptying it if it was filled from another build
+
+        :param stamp: The stamp of the database's build
+        :param path: The path of the cache, by default cache_file next to the database
+        """
+
+        self.stamp = stamp
+        self._lock = threading.Lock()
+        self._closed = False
+        self._connection = sqlite3.connect(path or cache_path(), check_same_thread=False, isolation_level=None)
+
+        with self._lock:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS stamp (stamp TEXT)')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS analysis (key TEXT PRIMARY KEY, value TEXT)')
+
+            if self._connection.execute('SELECT stamp FROM stamp').fetchone() != (stamp,):
+                self._connection.execute('BEGIN IMMEDIATE')
+                self._connection.execute('DELETE FROM analysis')
+                self._connection.execute('DELETE FROM stamp')
+                self._connection.execute('INSERT INTO stamp VALUES (?)', (stamp,))
+                self._connection.execute('COMMIT')
+
+    def get(self, key: str):
+        """Finds cached analyses
+
+        :param key: The key of the word
+        :return: The list of analyses, as dictionaries, or None if they are not cached
+        """
+
+        with self._lock:
+            if self._closed:
+                return None
+            row = self._connection.execute('SELECT value FROM analysis WHERE key = ?', (key,)).fetchone()
+
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, key: str, analyses: list):
+        """Caches analyses
+
+        :param key: The key of the word
+        :param analyses: The list of analyses, as dictionaries
+        """
+
+        with self._lock:
+            if self._closed:
+                return
+            self._connection.execute('INSERT OR REPLACE INTO analysis VALUES (?, ?)', (key, json.dumps(analyses)))
+
+    def close(self):
+        """Closes the connection to the cache file"""
+
+        with self._lock:
+            self._closed = True
+            self._connection.close()
+
+
+def analysis_cache(session=None):
+    """Opens the cache for the database's build, on first use
+
+    :param session: The session to find the build with, by default the shared Connection session
+    :return: The AnalysisCache, or None if the database was never stamped
+    """
+
+    global _cache
+
+    # The cache may be dropped by reset_caches while this runs
+    cache = _cache
+    if cache is None:
+        with _lock:
+            if _cache is None:
+                stamp = build_stamp(session)
+                _cache = AnalysisCache(stamp) if stamp is not None else False
+            cache = _cache
+
+    return cache or None
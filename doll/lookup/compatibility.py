@@ -0,0 +1,178 @@
+"""Compatibility of dictionary entries with inflection records.
+
+   Which inflection records a dictionary entry takes is decided by
+   the rules below, declared once for each part of speech. Entries
+   whose rule columns have the same values form an inflection class,
+   and build_compatibility evaluates the rules for every class once, at
+   build time, into the lookup_compatibility table of the records
+   each class permits. Each entry is given its class, so lookups join
+   entries to their records on integers alone. CLAUSES has the same
+   matchers as SQL, so the rules can also be evaluated in a query, as
+   doll.lookup.verify does to check the table against them.
+
+"""
+
+from itertools import count
+from doll.db import Connection
+from doll.db.model import *
+from sqlalchemy import and_, bindparam, func, or_, true
+
+
+def equal(record_value, entry_value) -> bool:
+    """The record and entry values are the same"""
+    return record_value == entry_value
+
+
+def variant(record_value, entry_value) -> bool:
+    """The variants are the same, or the record applies to every variant"""
+    return record_value == entry_value or record_value == 0
+
+
+def conjugation(record_value, entry_value) -> bool:
+    """The conjugations are the same, or the record applies to every conjugation"""
+    return record_value == entry_value or record_value == '0'
+
+
+def gender(record_value, entry_value) -> bool:
+    """The genders are the same, the record is common to masculine and
+    feminine entries, or the record applies to every gender"""
+    return record_value == entry_value or (record_value == 'C' and entry_value in ('F', 'M')) or record_value == 'X'
+
+
+def entry_any(record_value, entry_value) -> bool:
+    """The values are the same, or the entry takes every value"""
+    return record_value == entry_value or entry_value == 'X'
+
+
+# Each matcher as an SQL condition on the record and entry columns
+CLAUSES = {
+    equal: lambda record_column, entry_column: record_column == entry_column,
+    variant: lambda record_column, entry_column: or_(record_column == entry_column, record_column == 0),
+    conjugation: lambda record_column, entry_column: or_(record_column == entry_column, record_column == '0'),
+    gender: lambda record_column, entry_column: or_(record_column == entry_column,
+                                                    and_(record_column == 'C', entry_column.in_(('F', 'M'))),
+                                                    record_column == 'X'),
+    entry_any: lambda record_column, entry_column: or_(record_column == entry_column, entry_column == 'X')
+}
+
+
+# For each part of speech of the inflection records, the dictionary entry class it
+# inflects, its inflection record class, and how each column of the record must match
+# the column of the same name in the entry. Verb participles and supines are
+# inflections of verb entries. Verb records of conjugation 0, such as the endings of
+# the perfect system, apply to verbs of every conjugation.
+RULES = {
+    'N': (NounEntry, NounRecord, {'declension_code': equal, 'variant': variant, 'gender_code': gender}),
+    'V': (VerbEntry, VerbRecord, {'conjugation_code': conjugation, 'variant': variant}),
+    'VPAR': (VerbEntry, VerbParticipleRecord, {'conjugation_code': conjugation, 'variant': variant}),
+    'SUPINE': (VerbEntry, SupineRecord, {'conjugation_code': conjugation, 'variant': variant}),
+    'PRON': (PronounEntry, PronounRecord, {'declension_code': equal, 'variant': variant}),
+    'ADJ': (AdjectiveEntry, AdjectiveRecord, {'declension_code': equal, 'variant': variant,
+                                              'comparison_type_code': equal}),
+    'NUM': (NumeralEntry, NumeralRecord, {'declension_code': equal, 'variant': variant,
+                                          'numeral_sort_code': entry_any}),
+    'ADV': (AdverbEntry, AdverbRecord, {'comparison_type_code': entry_any}),
+    'PREP': (PrepositionEntry, PrepositionRecord, {'case_code': equal}),
+    'CONJ': (ConjunctionEntry, ConjunctionRecord, {}),
+    'INTERJ': (InterjectionEntry, InterjectionRecord, {})
+}
+
+
+def rule_condition(part_of_speech_code: str):
+    """Creates the SQL condition of the rules of a part of speech, on its entry and record classes
+
+    :param part_of_speech_code: The part of speech of the inflection records
+    :return: The condition
+    """
+
+    entry_class, record_class, rules = RULES[part_of_speech_code]
+
+    return and_(true(), *[CLAUSES[match](getattr(record_class, c), getattr(entry_class, c))
+                          for c, match in rules.items()])
+
+
+def _entry_classes() -> dict:
+    """Finds, for each dictionary entry class, its part of speech, the
+    columns deciding its inflection class, and the rules that apply to it"""
+
+    entry_classes = {}
+
+    for part_of_speech_code, (entry_class, record_class, rules) in RULES.items():
+        entry_pos, columns, entry_rules = entry_classes.setdefault(entry_class, (part_of_speech_code, [], []))
+        columns.extend(c for c in rules if c not in columns)
+        entry_rules.append((record_class, rules))
+
+    return entry_classes
+
+
+# Part of speech code, inflection class columns, and (record class, rules), by dictionary entry class
+ENTRY_CLASSES = _entry_classes()
+
+
+def record_classes(part_of_speech_code: str) -> list:
+    """Finds the inflection record classes of an inflection class
+
+    :param part_of_speech_code: The part of speech of the inflection class
+    :return: A list of inflection record classes
+    """
+
+    return [record_class for entry_pos, columns, entry_rules in ENTRY_CLASSES.values()
+            if entry_pos == part_of_speech_code
+            for record_class, rules in entry_rules]
+
+
+def build_compatibility(session=None, commit_changes: bool = False):
+    """Evaluates the rules into the lookup_inflection_class and lookup_compatibility
+    tables, and sets the inflection class of every dictionary entry
+
+    :param session: The session to write through, by default the shared Connection session
+    :param commit_changes: Whether to commit changes to the database
+    :return: None
+    """
+
+    session = session or Connection.session
+
+    print('Building inflection compatibility')
+
+    class_ids = count((session.query(func.max(InflectionClass.id)).scalar() or 0) + 1)
+
+    for entry_class, (part_of_speech_code, columns, entry_rules) in ENTRY_CLASSES.items():
+        entry_columns = [getattr(entry_class, c) for c in columns]
+
+        # The records of each record class, with the values of their rule columns
+        records = [(rules, session.query(record_class.record_id,
+                                         *[getattr(record_class, c) for c in rules]).all())
+                   for record_class, rules in entry_rules]
+
+        # Entries with no rule columns are all in the one class
+        class_keys = session.query(*entry_columns).distinct() if entry_columns else [()]
+
+        inflection_classes, compatibility, keys = [], [], {}
+        for key in class_keys:
+            class_id = keys[tuple(key)] = next(class_ids)
+            inflection_classes.append({'id': class_id,
+                                       'part_of_speech_code': part_of_speech_code,
+                                       'key': ' '.join(map(str, key))})
+
+            entry_values = dict(zip(columns, key))
+            for rules, rule_records in records:
+                compatibility.extend({'inflection_class_id': class_id, 'record_id': record_id}
+                                     for record_id, *values in rule_records
+                                     if all(match(value, entry_values[c])
+                                            for (c, match), value in zip(rules.items(), values)))
+
+        if inflection_classes:
+            session.execute(InflectionClass.__table__.insert(), inflection_classes)
+        if compatibility:
+            session.execute(Compatibility.__table__.insert(), compatibility)
+
+        entries = [{'entry_id': entry_id, 'class_id': keys[tuple(key)]}
+                   for entry_id, *key in session.query(entry_class.entry_id, *entry_columns)]
+        if entries:
+            session.execute(Entry.__table__.update()
+                            .where(Entry.__table__.c.id == bindparam('entry_id'))
+                            .values(inflection_class_id=bindparam('class_id')),
+                            entries)
+
+    if commit_changes:
+        session.commit()
@@ -0,0 +1,312 @@
+"""Frequency statistics of corpora.
+
+   Counts how often each word, and each dictionary entry it may be an
+   analysis of, appears in the texts read, for ranking analyses and
+   sizing caches. A corpus may have many more distinct words than we
+   want to hold in memory, so each counter keeps exact counts for the
+   first statistics_exact_limit keys only. Keys after those are counted
+   in a count-min sketch, whose estimates may be too high but never too
+   low, and the statistics_heavy_hitters most frequent of them are
+   tracked by name.
+
+   Counters from several processes, each reading part of a corpus, can
+   be merged, as long as their sketches are the same size, and are
+   saved to the lookup_entry_count and lookup_form_count tables, adding
+   to the counts already there. Keys known only to the sketch are not
+   saved.
+
+"""
+
+import hashlib
+from array import array
+from doll.config import config
+from doll.db import Connection
+from doll.db.model import *
+from doll.parse_test import ParseOption, analyse_word
+from sqlalchemy import and_
+from sqlalchemy.dialects.sqlite import insert
+
+# Rows to write at once
+_chunk_size = 500
+
+
+# Approximate counts of any number of keys, in fixed memory
+class CountMinSketch:
+    """A count-min sketch
+
+    Each key is counted in one cell of each of depth rows, chosen by
+    double hashing a blake2b digest of the key, so that sketches made
+    in different processes can be merged. Its estimate is the smallest
+    of those cells.
+    """
+
+    def __init__(self, width: int, depth: int):
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.rows = [array('q', bytes(8 * width)) for i in range(depth)]
+
+    def _cells(self, key):
+        digest = hashlib.blake2b(str(key).encode('utf-8'), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+        return [(first + i * second) % self.width for i in range(self.depth)]
+
+    def add(self, key, count: int = 1) -> int:
+        """Counts a key
+
+        :param key: The key
+        :param count: The number of times to count it
+        :return: The key's new estimate
+        """
+
+        self.total += count
+        estimate = None
+
+        for row, cell in zip(self.rows, self._cells(key)):
+            row[cell] += count
+            estimate = row[cell] if estimate is None else min(estimate, row[cell])
+
+        return estimate
+
+    def estimate(self, key) -> int:
+        if not self.total:
+            return 0
+
+        return min(row[cell] for row, cell in zip(self.rows, self._cells(key)))
+
+    def merge(self, other):
+        """Adds the counts of another sketch of the same size to this one
+
+        :param other: The other sketch
+        """
+
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError('Cannot merge a {0}x{1} sketch into a {2}x{3} sketch'
+                             .format(other.width, other.depth, self.width, self.depth))
+
+        self.total += other.total
+        for row, other_row in zip(self.rows, other.rows):
+            for cell, count in enumerate(other_row):
+                if count:
+                    row[cell] += count
+
+
+# Counts of keys, exact for as many as we can hold and estimated beyond
+class FrequencyCounter:
+    """Counts keys exactly, up to a limit on the number of keys, then in a count-min sketch"""
+
+    def __init__(self, limit: int = None, width: int = None, depth: int = None, heavy_hitters: int = None):
+        """Creates an empty counter
+
+        :param limit: Keys to count exactly, defaults to statistics_exact_limit in the config
+        :param width: Cells in each row of the sketch, defaults to statistics_sketch_width in the config
+        :param depth: Rows of the sketch, defaults to statistics_sketch_depth in the config
+        :param heavy_hitters: Sketched keys to track by name, defaults to statistics_heavy_hitters in the config
+        """
+
+        self.limit = limit or int(config['statistics_exact_limit'])
+        self.heavy_hitters = heavy_hitters or int(config['statistics_heavy_hitters'])
+        self.sketch = CountMinSketch(width or int(config['statistics_sketch_width']),
+                                     depth or int(config['statistics_sketch_depth']))
+        self.total = 0
+
+        self.exact = {}
+        self.inexact = set()  # Keys of exact whose counts include estimates, from merging
+        self.heavy = {}  # Estimates of the most frequent sketched keys
+        self._floor = 0  # An estimate no greater than the least in heavy
+
+    def __len__(self):
+        return len(self.exact) + len(self.heavy)
+
+    def add(self, key, count: int = 1):
+        """Counts a key, exactly if it already is or there is room, otherwise in the sketch
+
+        :param key: The key
+        :param count: The number of times to count it
+        """
+
+        self.total += count
+
+        if key in self.exact:
+            self.exact[key] += count
+        elif len(self.exact) < self.limit and not self.sketch.total:
+            self.exact[key] = count
+        else:
+            self._consider(key, self.sketch.add(key, count))
+
+    def _consider(self, key, estimate: int):
+        """Tracks a sketched key by name, if it is among the most frequent
+
+        :param key: The key
+        :param estimate: Its estimate
+        """
+
+        if key in self.heavy or len(self.heavy) < self.heavy_hitters:
+            self.heavy[key] = estimate
+        elif estimate > self._floor:
+            least = min(self.heavy, key=self.heavy.get)
+            if estimate > self.heavy[least]:
+                del self.heavy[least]
+                self.heavy[key] = estimate
+            self._floor = min(self.heavy.values())
+
+    def count(self, key) -> tuple:
+        """Finds the count of a key
+
+        :param key: The key
+        :return: The count, and whether it is exact
+        """
+
+        if key in self.exact:
+            return self.exact[key], key not in self.inexact
+
+        return self.sketch.estimate(key), False
+
+    def items(self):
+        """Iterates over the keys counted exactly and the heavy hitters
+
+        :return: A generator of (key, count, whether the count is exact)
+        """
+
+        for key, count in self.exact.items():
+            yield key, count, key not in self.inexact
+        for key, estimate in self.heavy.items():
+            yield key, estimate, False
+
+    def most_common(self, n: int = None) -> list:
+        """Finds the most frequent keys
+
+        :param n: The number of keys, or None for all we know by name
+        :return: A list of (key, count, whether the count is exact), most frequent first
+        """
+
+        return sorted(self.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def merge(self, other):
+        """Adds the counts of another counter to this one
+
+        :param other: The other counter, whose sketch must be the same size
+        """
+
+        # Our exact keys may have been sketched by the other counter
+        if other.sketch.total:
+            for key in self.exact:
+                if key not in other.exact:
+                    estimate = other.sketch.estimate(key)
+                    if estimate:
+                        self.exact[key] += estimate
+                        self.inexact.add(key)
+
+        # Keys new to us may only be counted exactly if we have never sketched them
+        overflowed = self.sketch.total > 0
+        for key, count in other.exact.items():
+            if key in self.exact:
+                self.exact[key] += count
+            elif not overflowed and len(self.exact) < self.limit:
+                self.exact[key] = count
+            else:
+                self.sketch.add(key, count)
+            if key in other.inexact:
+                self.inexact.add(key)
+
+        self.sketch.merge(other.sketch)
+        self.total += other.total
+
+        candidates = (set(self.heavy) | set(other.heavy) | set(other.exact)) - set(self.exact)
+        self.heavy, self._floor = {}, 0
+        for key in candidates:
+            self._consider(key, self.sketch.estimate(key))
+
+
+# Counts of the words of a corpus and of the entries they are analyses of
+class CorpusStatistics:
+    """Frequency counts of the forms and entries in a corpus
+
+    A word with several analyses counts once towards each of the
+    distinct entries it may be, as we cannot tell which is meant.
+    """
+
+    def __init__(self, **kwargs):
+        """Creates empty statistics
+
+        :param kwargs: Passed to each FrequencyCounter
+        """
+
+        self.forms = FrequencyCounter(**kwargs)
+        self.entries = FrequencyCounter(**kwargs)
+
+        # Entries of the words seen, so each word is only analysed once
+        self._entry_ids = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_entry_ids'] = {}
+
+        return state
+
+    def add(self, word: str, entry_ids):
+        """Counts a word, and each entry it may be an analysis of
+
+        :param word: The word
+        :param entry_ids: The distinct ids of the entries of its analyses
+        """
+
+        self.forms.add(word)
+        for entry_id in entry_ids:
+            self.entries.add(entry_id)
+
+    def collect(self, tokens, current_mode: ParseOption = ParseOption.non_strict, session=None):
+        """Analyses and counts every token of a corpus
+
+        :param tokens: The words of the corpus
+        :param current_mode: Whether to match strictly
+        :param session: The session to query, by default the shared Connection session
+        """
+
+        session = session or Connection.session
+
+        for token in tokens:
+            entry_ids = self._entry_ids.get(token)
+            if entry_ids is None:
+                if len(self._entry_ids) >= self.forms.limit:
+                    self._entry_ids.clear()
+                entry_ids = self._entry_ids[token] = {a.entry_id for a in analyse_word(token, current_mode,
+                                                                                       session=session)}
+
+            self.add(token, entry_ids)
+
+    def merge(self, other):
+        """Adds the counts of other statistics, such as those of another worker process
+
+        :param other: The other statistics
+        """
+
+        self.forms.merge(other.forms)
+        self.entries.merge(other.entries)
+
+    def save(self, session=None, commit_changes: bool = False):
+        """Adds the counts known by name to the lookup_entry_count and lookup_form_count tables
+
+        :param session: The session to write through, by default the shared Connection session
+        :param commit_changes: Whether to commit changes to the database
+        """
+
+        session = session or Connection.session
+
+        for model, key_column, counter in ((EntryCount, 'entry_id', self.entries),
+                                           (FormCount, 'form', self.forms)):
+            rows = [{key_column: key, 'count': count, 'is_exact': is_exact}
+                    for key, count, is_exact in counter.items()]
+
+            statement = insert(model.__table__)
+            statement = statement.on_conflict_do_update(
+                index_elements=[key_column],
+                set_={'count': model.__table__.c.count + statement.excluded.count,
+                      'is_exact': and_(model.__table__.c.is_exact, statement.excluded.is_exact)})
+
+            for start in range(0, len(rows), _chunk_size):
+                session.execute(statement, rows[start:start + _chunk_size])
+
+        if commit_changes:
+            session.commit()
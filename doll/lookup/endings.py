@@ -0,0 +1,89 @@
+"""Search for forms by their endings.
+
+   Finding every form ending in -bamus, or every rhyme of a word, would
+   otherwise mean joining every stem to every ending. Each form is
+   stored reversed as well, with an index, so the forms ending with a
+   suffix are those whose reversed forms start with the reversed
+   suffix: a range of the index.
+
+"""
+
+from collections import namedtuple
+from doll.db import Connection
+from doll.db.model import *
+from sqlalchemy import and_, func
+
+# A form with a given ending, and an entry and inflection record it is a form of
+Ending = namedtuple('Ending', ['form', 'entry_id', 'record_id'])
+
+
+def reverse(word: str) -> str:
+    return word[::-1]
+
+
+def build_reversed_forms(session=None, commit_changes: bool = False):
+    """Sets the reversed spelling of every form in the lookup_form table
+
+    :param session: The session to write through, by default the shared Connection session
+    :param commit_changes: Whether to commit changes to the database
+    :return: None
+    """
+
+    session = session or Connection.session
+
+    print('Indexing endings')
+
+    session.connection().connection.create_function('reverse', 1, reverse)
+    session.execute(Form.__table__.update().values(reversed_form=func.reverse(Form.form)))
+
+    if commit_changes:
+        session.commit()
+
+
+def _ending_with(suffix: str, session):
+    """Creates the query for the forms ending with a suffix, as a range of the reversed forms' index
+
+    :param suffix: The suffix
+    :param session: The session to query
+    :return: The query, whose rows are Endings
+    """
+
+    reversed_suffix = reverse(suffix)
+
+    return session.query(Form.form, Form.entry_id, Form.record_id) \
+        .filter(and_(Form.reversed_form >= reversed_suffix, Form.reversed_form < reversed_suffix + '￿'))
+
+
+def forms_ending_with(suffix: str, limit: int = None, session=None) -> list:
+    """Finds the forms ending with a suffix
+
+    :param suffix: The suffix, such as bamus
+    :param limit: The most forms to return, or None for all
+    :param session: The session to query, by default the shared Connection session
+    :return: A list of Endings, in order of their reversed spelling, so those that rhyme longest are together
+    """
+
+    session = session or Connection.session
+
+    return [Ending(*row) for row in _ending_with(suffix, session)
+            .order_by(Form.reversed_form, Form.entry_id, Form.record_id)
+            .limit(limit)]
+
+
+def rhymes(word: str, length: int = 3, limit: int = None, session=None) -> list:
+    """Finds the forms sharing the last letters of a word
+
+    :param word: The word
+    :param length: The number of letters which must match
+    :param limit: The most forms to return, or None for all
+    :param session: The session to query, by default the shared Connection session
+    :return: A list of Endings, other than those of the word itself
+    """
+
+    session = session or Connection.session
+
+    # The word is left out before the limit is applied, so as not to take up its places
+    return [Ending(*row) for row in _ending_with(word[-length:], session)
+            .filter(Form.form != word)
+            .order_by(Form.reversed_form, Form.entry_id, Form.record_id)
+            .limit(limit)]
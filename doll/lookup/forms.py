@@ -0,0 +1,40 @@
+"""Generates the inflected forms of the dictionary.
+
+   Every stem of a dictionary entry, joined to the ending of each
+   inflection record compatible with the entry, is a form that
+   parse_test recognises. build_forms writes them all to the
+   lookup_form table, from which other lookup structures are built.
+
+"""
+
+from doll.db import Connection
+from doll.db.model import *
+from sqlalchemy import and_
+
+
+def build_forms(session=None, commit_changes: bool = False):
+    """Writes every form of every dictionary entry to the lookup_form table
+
+    lookup_compatibility must already have been built.
+
+    :param session: The session to write through, by default the shared Connection session
+    :param commit_changes: Whether to commit changes to the database
+    :return: None
+    """
+
+    session = session or Connection.session
+
+    print('Generating forms')
+
+    forms = session.query(Stem.stem_word + Record.ending, Stem.entry_id, Record.id, Stem.id) \
+        .select_from(Stem) \
+        .join(Entry, Entry.id == Stem.entry_id) \
+        .join(Compatibility, Compatibility.inflection_class_id == Entry.inflection_class_id) \
+        .join(Record, and_(Record.id == Compatibility.record_id,
+                           Record.stem_key == Stem.stem_number))
+
+    session.execute(Form.__table__.insert().from_select(['form', 'entry_id', 'record_id', 'stem_id'],
+                                                        forms.statement))
+
+    if commit_changes:
+        session.commit()
@@ -0,0 +1,79 @@
+"""Orthographic variants.
+
+   Medieval and Renaissance texts spell many words differently from
+   the classical spellings in the dictionary: j for i, v for u, e for
+   ae, ci for ti before a vowel, and so on. Rather than retrying a
+   word with each substitution in turn, every form is given a canonical
+   spelling at build time, in which all of these variants coincide, so
+   a word in any of its spellings is found with a single probe on the
+   canonical spelling.
+
+"""
+
+import re
+import string
+import unicodedata
+from doll.db import Connection
+from doll.db.model import *
+from sqlalchemy import func
+
+# Letters which are variant spellings of another letter
+_letters = str.maketrans('jv', 'iu')
+
+# ti before a vowel, often spelt ci in medieval texts
+_ti = re.compile('ti(?=[aeiou])')
+
+
+def canonical(word: str) -> str:
+    """Finds the canonical spelling of a word, which it shares with its orthographic variants
+
+    :param word: The word
+    :return: The word in lower case, without accents, with j as i, v as u, ae as e, and ti before a vowel as ci
+    """
+
+    word = ''.join(c for c in unicodedata.normalize('NFKD', word.lower()) if not unicodedata.combining(c))
+
+    return _ti.sub('ci', word.translate(_letters).replace('ae', 'e'))
+
+
+def remove_accents(word: str) -> str:
+    """Finds the spelling of a word that strict matching compares
+
+    :param word: The word
+    :return: The ASCII letters of the word, without accents, in lower case
+    """
+
+    return ''.join(x for x in unicodedata.normalize('NFKD', word) if x in string.ascii_letters).lower()
+
+
+def build_canonical_forms(session=None, commit_changes: bool = False):
+    """Sets the canonical spelling of every form in the lookup_form table
+
+    :param session: The session to write through, by default the shared Connection session
+    :param commit_changes: Whether to commit changes to the database
+    :return: None
+    """
+
+    session = session or Connection.session
+
+    print('Indexing orthographic variants')
+
+    # Let sqlite call canonical directly, rather than round-tripping every form
+    session.connection().connection.create_function('canonical', 1, canonical)
+    session.execute(Form.__table__.update().values(canonical_form=func.canonical(Form.form)))
+
+    if commit_changes:
+        session.commit()
+
+
+def variant_forms(word: str, session=None) -> list:
+    """Finds the forms which are orthographic variants of a word
+
+    :param word: The word
+    :param session: The session to query, by default the shared Connection session
+    :return: A list of forms, as spelt in the dictionary
+    """
+
+    session = session or Connection.session
+
+    return [form for (form,) in session.query(Form.form).filter(Form.canonical_form == canonical(word)).distinct()]
@@ -0,0 +1,106 @@
+"""Generates paradigms: the full declension or conjugation of an entry.
+
+   Which inflection records an entry has depends only on its
+   inflection class (its part of speech and the columns its rules
+   match, such as declension, variant and gender), so the records for
+   each class are read once from lookup_compatibility and cached as a
+   template. The paradigm of an entry is then its template applied to
+   its stems.
+
+"""
+
+from collections import defaultdict, namedtuple
+from doll.db import Connection
+from doll.db.model import *
+from doll.lookup.cache import on_new_build
+from doll.lookup.compatibility import record_classes
+
+# A form in a paradigm, with the inflection record's columns, such as case_code, as inflection
+ParadigmForm = namedtuple('ParadigmForm', ['form', 'record_id', 'stem_number', 'inflection'])
+
+# Templates by inflection class, of (stem key, ending, record id, inflection)
+_templates = {}
+
+# Entries to query at once
+_chunk_size = 500
+
+
+@on_new_build
+def reset_templates():
+    """Drops the templates, so they are read again from the database's new build"""
+
+    _templates.clear()
+
+
+def _template(inflection_class_id: int, session) -> tuple:
+    """Finds and caches the template of an inflection class
+
+    :param inflection_class_id: The id of the inflection class
+    :param session: The session to query
+    :return: The template
+    """
+
+    part_of_speech_code = session.query(InflectionClass.part_of_speech_code) \
+        .filter(InflectionClass.id == inflection_class_id).scalar()
+
+    template = []
+    for record_class in record_classes(part_of_speech_code):
+        columns = [c.name for c in record_class.__table__.columns if c.name not in ('id', 'record_id')]
+        template.extend((stem_key, ending, record_id, {c: getattr(record, c) for c in columns})
+                        for stem_key, ending, record_id, record in
+                        session.query(Record.stem_key, Record.ending, Record.id, record_class)
+                        .select_from(Compatibility)
+                        .join(Record, Record.id == Compatibility.record_id)
+                        .join(record_class, record_class.record_id == Record.id)
+                        .filter(Compatibility.inflection_class_id == inflection_class_id))
+
+    template = _templates[inflection_class_id] = tuple(sorted(template, key=lambda t: t[2]))
+
+    return template
+
+
+def generate_paradigms(entry_ids, session=None):
+    """Generates the paradigms of many entries
+
+    :param entry_ids: The ids of the entries
+    :param session: The session to query, by default the shared Connection session
+    :return: A generator of (entry id, list of ParadigmForms)
+    """
+
+    session = session or Connection.session
+    entry_ids = list(entry_ids)
+
+    for start in range(0, len(entry_ids), _chunk_size):
+        chunk = entry_ids[start:start + _chunk_size]
+
+        stems = defaultdict(dict)
+        for entry_id, stem_number, stem_word in session.query(Stem.entry_id, Stem.stem_number, Stem.stem_word) \
+                .filter(Stem.entry_id.in_(chunk)):
+            stems[entry_id][stem_number] = stem_word
+
+        inflection_classes = dict(session.query(Entry.id, Entry.inflection_class_id).filter(Entry.id.in_(chunk)))
+
+        for entry_id in chunk:
+            entry_stems = stems[entry_id]
+            inflection_class_id = inflection_classes.get(entry_id)
+
+            if inflection_class_id is None:
+                yield entry_id, []
+                continue
+
+            template = _templates.get(inflection_class_id) or _template(inflection_class_id, session)
+            yield entry_id, [ParadigmForm(entry_stems[stem_key] + ending, record_id, stem_key, inflection)
+                             for stem_key, ending, record_id, inflection in template
+                             if stem_key in entry_stems]
+
+
+def generate_paradigm(entry_id: int, session=None) -> list:
+    """Generates the paradigm of an entry
+
+    :param entry_id: The id of the entry
+    :param session: The session to query, by default the shared Connection session
+    :return: A list of ParadigmForms
+    """
+
+    for entry_id, paradigm in generate_paradigms([entry_id], session=session):
+        return paradigm
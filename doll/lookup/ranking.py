@@ -0,0 +1,81 @@
+"""Ranking of the analyses of a word.
+
+   A word often has several analyses, and callers who want only the
+   most likely should not have to fetch and sort them all. Each form is
+   given a score at build time, from the frequency of its entry and its
+   inflection record, the age of the record, and, once a corpus has
+   been counted with doll.lookup.corpus, how often the entry appeared
+   in it. Analyses are returned highest score first, so the best is
+   simply the first.
+
+"""
+
+import math
+from doll.db import Connection
+from doll.db.model import *
+from doll.lookup.cache import stamp_build
+from sqlalchemy import bindparam
+from sqlalchemy.orm import aliased
+
+# Rows to update at once
+_chunk_size = 5000
+
+
+def score(entry_frequency_order: int, record_frequency_order: int, record_age_order: int,
+          corpus_count: int = None) -> float:
+    """Scores an analysis, higher for the more likely
+
+    Each step down the entry's frequency order costs as much as an
+    e-fold fall in its corpus count; the record's frequency and age
+    only separate analyses of otherwise equal entries.
+
+    :param entry_frequency_order: The WordFrequency order of the entry
+    :param record_frequency_order: The WordFrequency order of the inflection record
+    :param record_age_order: The WordAge order of the inflection record
+    :param corpus_count: How often the entry appeared in the corpora counted, if any were
+    :return: The score
+    """
+
+    return math.log1p(corpus_count or 0) - entry_frequency_order - record_frequency_order / 10 \
+        - record_age_order / 100
+
+
+def build_ranking(session=None, commit_changes: bool = False):
+    """Scores every form in the lookup_form table
+
+    Run again after saving corpus statistics, to rank by them. The
+    order of analyses changes with the scores, so once they are
+    committed the database is stamped as a new build, and caches of
+    the old order are emptied.
+
+    :param session: The session to write through, by default the shared Connection session
+    :param commit_changes: Whether to commit changes to the database
+    :return: None
+    """
+
+    session = session or Connection.session
+
+    print('Ranking analyses')
+
+    entry_frequency = aliased(WordFrequency)
+    record_frequency = aliased(WordFrequency)
+
+    forms = session.query(Form.id, entry_frequency.order, record_frequency.order, WordAge.order, EntryCount.count) \
+        .join(Entry, Entry.id == Form.entry_id) \
+        .join(Record, Record.id == Form.record_id) \
+        .join(entry_frequency, type_key(entry_frequency) == Entry.frequency_code) \
+        .join(record_frequency, type_key(record_frequency) == Record.frequency_code) \
+        .join(WordAge, type_key(WordAge) == Record.age_code) \
+        .outerjoin(EntryCount, EntryCount.entry_id == Form.entry_id)
+
+    scores = [{'form_id': form_id, 'score': score(*orders)} for form_id, *orders in forms]
+
+    statement = Form.__table__.update() \
+        .where(Form.__table__.c.id == bindparam('form_id')) \
+        .values(score=bindparam('score'))
+    for start in range(0, len(scores), _chunk_size):
+        session.execute(statement, scores[start:start + _chunk_size])
+
+    if commit_changes:
+        session.commit()
+        stamp_build(session)
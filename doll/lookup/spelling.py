@@ -0,0 +1,147 @@
+"""Approximate matching of words to forms.
+
+   Uses a symmetric delete index: every string made by deleting up to
+   spelling_max_distance characters from a form is stored, pointing back
+   at the form. Two strings within that edit distance of one another
+   always share a deletion, so the candidates for a misspelt word are
+   found by generating the word's own deletions and looking them up,
+   rather than measuring its distance to every form.
+
+   To keep the index small only the first spelling_prefix_length
+   characters of each form are indexed; candidates are the forms
+   starting with a matching prefix, which are then checked in full.
+
+"""
+
+from collections import namedtuple
+from doll.config import config
+from doll.db import Connection
+from doll.db.model import *
+from sqlalchemy import and_, func, or_
+
+# A suggested form for a word, and its edit distance from the word
+Suggestion = namedtuple('Suggestion', ['form', 'distance'])
+
+
+def deletes(word: str, max_distance: int) -> set:
+    """Finds the strings made by deleting up to max_distance characters from a word
+
+    :param word: The word
+    :param max_distance: The most characters to delete
+    :return: The set of strings, including the word itself
+    """
+
+    result = edge = {word}
+
+    for distance in range(max_distance):
+        edge = {w[:i] + w[i + 1:] for w in edge for i in range(len(w))}
+        result = result | edge
+
+    return result
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Calculates the edit distance between two strings, counting insertions,
+    deletions, substitutions and transpositions of adjacent characters
+
+    :param a: The first string
+    :param b: The second string
+    :param max_distance: The distance above which we don't care about the exact value
+    :return: The distance, or max_distance + 1 if it is greater than max_distance
+    """
+
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    before_previous, previous = None, list(range(len(b) + 1))
+
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(previous[j] + 1,
+                             current[j - 1] + 1,
+                             previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before_previous[j - 2] + 1)
+
+        if min(current) > max_distance:
+            return max_distance + 1
+
+        before_previous, previous = previous, current
+
+    return previous[-1]
+
+
+def build_spelling_index(session=None, commit_changes: bool = False):
+    """Writes the deletions of the prefixes of every form to the lookup_spelling table
+
+    lookup_form must already have been built.
+
+    :param session: The session to write through, by default the shared Connection session
+    :param commit_changes: Whether to commit changes to the database
+    :return: None
+    """
+
+    session = session or Connection.session
+
+    max_distance = int(config['spelling_max_distance'])
+    prefix_length = int(config['spelling_prefix_length'])
+    chunk_size = int(config['ingest_chunk_size'])
+
+    print('Building spelling index')
+
+    rows = []
+    for (prefix,) in session.query(func.substr(Form.form, 1, prefix_length)).distinct():
+        rows.extend({'delete_key': delete_key, 'prefix': prefix} for delete_key in deletes(prefix, max_distance))
+
+        if len(rows) >= chunk_size:
+            session.execute(SpellingDelete.__table__.insert(), rows)
+            rows.clear()
+
+    if rows:
+        session.execute(SpellingDelete.__table__.insert(), rows)
+
+    if commit_changes:
+        session.commit()
+
+
+def suggest(word: str, max_distance: int = None, session=None) -> list:
+    """Finds the forms within an edit distance of a word
+
+    :param word: The word, which is presumably misspelt
+    :param max_distance: The greatest edit distance, at most spelling_max_distance in the config
+    :param session: The session to query, by default the shared Connection session
+    :return: A list of Suggestions, nearest first, then those of the most frequent entries
+    """
+
+    session = session or Connection.session
+
+    index_distance = int(config['spelling_max_distance'])
+    max_distance = min(max_distance or index_distance, index_distance)
+    prefix_length = int(config['spelling_prefix_length'])
+
+    prefixes = [prefix for (prefix,) in session.query(SpellingDelete.prefix)
+                .filter(SpellingDelete.delete_key.in_(deletes(word[:prefix_length], max_distance)))
+                .distinct()]
+
+    if not prefixes:
+        return []
+
+    # Short prefixes are whole forms; others match every form that starts with them
+    conditions = [Form.form.in_([prefix for prefix in prefixes if len(prefix) < prefix_length])]
+    conditions.extend(and_(Form.form >= prefix, Form.form < prefix + '￿')
+                      for prefix in prefixes if len(prefix) == prefix_length)
+
+    candidates = session.query(Form.form, func.min(WordFrequency.order)) \
+        .join(Entry, Entry.id == Form.entry_id) \
+        .join(WordFrequency, type_key(WordFrequency) == Entry.frequency_code) \
+        .filter(or_(*conditions)) \
+        .group_by(Form.form)
+
+    suggestions = []
+    for form, frequency_order in candidates:
+        distance = edit_distance(word, form, max_distance)
+        if distance <= max_distance:
+            suggestions.append((distance, frequency_order, form))
+
+    return [Suggestion(form, distance) for distance, frequency_order, form in sorted(suggestions)]
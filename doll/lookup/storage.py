@@ -0,0 +1,214 @@
+"""Physical storage of the relations analyses are looked up in.
+
+   The tables are created for loading: rows in rowid order, and few
+   indexes to maintain while they are inserted. Once everything is
+   loaded, optimise_storage lays out the relations the analysis query
+   reads for reading instead:
+
+   - covering indexes holding every column the query needs from the
+     stems, from each inflection record table, by record id, and from
+     the forms, so it reads index pages alone rather than following
+     each match to its table row; the inflection record tables would
+     otherwise get an automatic index built on every query
+   - WITHOUT ROWID tables, clustered on their primary keys, for the
+     relations with natural keys, so the key is stored once rather than
+     in both the table and its index
+   - ANALYZE, so the planner knows to use them
+
+   benchmark measures the pages the query reads from the database
+   file, against a copy of the database with its storage as loaded.
+
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from doll.db import Connection
+from doll.db.model import *
+from doll.lookup.compatibility import RULES
+from doll.parse_test import DESCRIPTION_COLUMNS, ENTRY_DESCRIPTION_COLUMNS, ParseOption, analysis_query
+from sqlalchemy import MetaData, create_engine, select, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.sql import column as sql_column, table as sql_table
+from sqlalchemy.orm import sessionmaker
+
+# Tables clustered on their primary keys
+WITHOUT_ROWID = [Compatibility, FormCount]
+
+
+def _covering_indexes() -> list:
+    """Finds the covering indexes of the analysis query
+
+    :return: A list of (index name, table name, column names)
+    """
+
+    indexes = [('ix_dictionary_stem_covering', Stem.__tablename__, ['stem_word', 'stem_number', 'entry_id', 'id']),
+               ('ix_lookup_form_covering', Form.__tablename__, ['entry_id', 'record_id', 'stem_id', 'score'])]
+
+    for record_class in dict.fromkeys(record_class for entry_class, record_class, rules in RULES.values()):
+        indexes.append(('ix_{0}_covering'.format(record_class.__tablename__), record_class.__tablename__,
+                        ['record_id'] + [c for c in DESCRIPTION_COLUMNS
+                                         if hasattr(record_class, c) and c not in ENTRY_DESCRIPTION_COLUMNS]))
+
+    return indexes
+
+
+# Name, table name and columns of each covering index
+COVERING_INDEXES = _covering_indexes()
+
+
+def _rebuild(session, table, with_rowid: bool):
+    """Rebuilds a table with or without its rowid, if it is not already
+
+    The table is created again from its definition in the model, with its
+    rows copied over column by column, and its indexes.
+
+    :param session: The session to write through
+    :param table: The table
+    :param with_rowid: Whether the table should have a rowid
+    """
+
+    sql, = session.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                           {'name': table.name}).one()
+    if sql.rstrip().upper().endswith('WITHOUT ROWID') != with_rowid:
+        return
+
+    # A copy of the model, so the table's own definition is left as it is
+    metadata = MetaData()
+    for model_table in Base.metadata.sorted_tables:
+        model_table.to_metadata(metadata)
+
+    rebuilt = metadata.tables[table.name]
+    rebuilt.dialect_kwargs['sqlite_with_rowid'] = with_rowid
+
+    columns = [c.name for c in rebuilt.columns]
+    loaded = sql_table(table.name + '_rebuild', *[sql_column(c) for c in columns])
+
+    session.execute(text('ALTER TABLE {0} RENAME TO {0}_rebuild'.format(table.name)))
+    session.execute(CreateTable(rebuilt))
+    session.execute(rebuilt.insert().from_select(columns, select(*loaded.columns)))
+    session.execute(text('DROP TABLE {0}_rebuild'.format(table.name)))
+    for index in rebuilt.indexes:
+        session.execute(CreateIndex(index))
+
+
+def optimise_storage(session=None, commit_changes: bool = False):
+    """Clusters the tables with natural keys, and adds the covering indexes of the analysis query
+
+    :param session: The session to write through, by default the shared Connection session
+    :param commit_changes: Whether to commit changes to the database
+    :return: None
+    """
+
+    session = session or Connection.session
+
+    print('Optimising storage')
+
+    for model in WITHOUT_ROWID:
+        _rebuild(session, model.__table__, with_rowid=False)
+
+    for name, table_name, columns in COVERING_INDEXES:
+        session.execute(text('CREATE INDEX IF NOT EXISTS {0} ON {1} ({2})'.format(name, table_name,
+                                                                                  ', '.join(columns))))
+
+    session.execute(text('ANALYZE'))
+
+    if commit_changes:
+        session.commit()
+
+
+def restore_storage(session=None, commit_changes: bool = False):
+    """Undoes optimise_storage, leaving the tables as they were loaded
+
+    :param session: The session to write through, by default the shared Connection session
+    :param commit_changes: Whether to commit changes to the database
+    :return: None
+    """
+
+    session = session or Connection.session
+
+    for name, table_name, columns in COVERING_INDEXES:
+        session.execute(text('DROP INDEX IF EXISTS {0}'.format(name)))
+
+    for model in WITHOUT_ROWID:
+        _rebuild(session, model.__table__, with_rowid=True)
+
+    session.execute(text('ANALYZE'))
+
+    if commit_changes:
+        session.commit()
+
+
+def _bytes_read() -> int:
+    """Finds the bytes this process has read from files, cached or not, or None if the system does not say"""
+
+    try:
+        with open('/proc/self/io') as io:
+            for line in io:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+
+    return None
+
+
+def page_reads(words: list, session=None) -> tuple:
+    """Analyses words, starting each with sqlite's page cache empty
+
+    :param words: The words to analyse
+    :param session: The session to query, by default the shared Connection session
+    :return: The pages read from the database file, or None where the system cannot count
+             them, and the seconds taken
+    """
+
+    session = session or Connection.session
+
+    page_size = session.execute(text('PRAGMA page_size')).scalar()
+    pages, seconds = 0, 0.0
+
+    for word in words:
+        session.execute(text('PRAGMA shrink_memory'))
+
+        before, start = _bytes_read(), time.perf_counter()
+        analysis_query(word, ParseOption.non_strict, session=session).all()
+        seconds += time.perf_counter() - start
+        after = _bytes_read()
+
+        pages = None if before is None or pages is None else pages + (after - before) // page_size
+
+    return pages, seconds
+
+
+def benchmark(words: list, session=None) -> dict:
+    """Compares the page reads of the analysis query with the storage as loaded and as optimised
+
+    :param words: The words to analyse
+    :param session: The session whose database to benchmark, by default the shared Connection session
+    :return: A dictionary of 'loaded' and 'optimised' to the pages read and seconds taken
+    """
+
+    session = session or Connection.session
+
+    path = session.get_bind().url.database
+    directory = tempfile.mkdtemp(prefix='doll-storage-')
+
+    try:
+        copies = {}
+        for name, optimise in (('loaded', restore_storage), ('optimised', optimise_storage)):
+            copy = os.path.join(directory, name + '.db')
+            shutil.copyfile(path, copy)
+
+            engine = create_engine('sqlite:///' + copy)
+            copy_session = sessionmaker(bind=engine)()
+            try:
+                optimise(session=copy_session, commit_changes=True)
+                copies[name] = page_reads(words, session=copy_session)
+            finally:
+                copy_session.close()
+                engine.dispose()
+
+        return copies
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,330 @@
+"""Differential verification of the lookup engines.
+
+   Every faster way of finding the analyses of a word must find exactly
+   what the rules of doll.lookup.compatibility allow. The reference
+   joins the stems of each part of speech's entries to its inflection
+   records directly, on the conditions of CLAUSES, as the lookups did
+   before any table was derived at build time, and matches the word
+   against the stem and ending just as they did. verify runs words
+   through the reference and each candidate engine, compares the
+   (entry, record) pairs each finds for every word, and times them all.
+
+   The words are every form the rules generate, words made from them
+   which should mostly have no analyses (with a letter added, or one
+   taken away) and tokens that are not Latin at all, along with any
+   other words given. Strict matching is checked too, with the forms
+   respelt as it should still find them: in capitals, with punctuation
+   or a digit, or with macrons. The strict reference compares every
+   stem and ending without accents, too slow to check every form of
+   the dictionary, so strict matching is checked on a sample of the
+   forms, of verify_strict_sample in the config by default.
+
+   The candidate engines are:
+
+   - analyse_word, which adds the Bloom filter to analysis_query, and
+     its joins through the lookup_compatibility table
+   - forms, which queries the lookup_form table directly
+   - batch, FormIndex from doll.lookup.batch, if NumPy is installed
+   - cache, analyse_word with an analysis cache in a temporary file,
+     asked for each word twice so the second answer comes from the cache
+
+   forms and batch only match non-strictly, and are only checked so.
+
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import time
+import unicodedata
+from collections import namedtuple
+from doll.config import config
+from doll.db import Connection
+from doll.db.model import *
+from doll.lookup.batch import FormIndex, np
+from doll.lookup.cache import AnalysisCache
+from doll.lookup.compatibility import RULES, rule_condition
+from doll.lookup.orthography import remove_accents
+from doll.parse_test import ParseOption, analyse_word, unaccent
+from sqlalchemy import and_, func
+
+# Words to query the lookup_form table for at once
+_chunk_size = 500
+
+# Tokens that are not Latin at all, which no engine should find analyses of
+NON_LATIN = ['', ' ', '1066', 'xyzzy', 'the', 'qqq', '--', "'s", 'www.example.com', '\u00df', '\u03bb\u03cc\u03b3\u03bf\u03c2']
+
+# A word for which an engine found different analyses to the reference in a mode, as (entry id, record id) pairs
+Mismatch = namedtuple('Mismatch', ['engine', 'mode', 'word', 'missing', 'extra'])
+
+# The time an engine took to load, and to look up every word in a mode
+Timing = namedtuple('Timing', ['engine', 'mode', 'setup', 'lookup', 'words'])
+
+
+def _rule_query(part_of_speech_code: str, session, *columns):
+    """Creates the query joining the stems of a part of speech's entries to the records its rules allow
+
+    :param part_of_speech_code: The part of speech of the inflection records
+    :param session: The session to query
+    :param columns: The columns to select
+    :return: The query
+    """
+
+    entry_class, record_class, rules = RULES[part_of_speech_code]
+
+    return session.query(*columns) \
+        .select_from(Stem) \
+        .join(Entry, Entry.id == Stem.entry_id) \
+        .join(entry_class, entry_class.entry_id == Entry.id) \
+        .join(Record, and_(Record.part_of_speech_code == part_of_speech_code,
+                           Record.stem_key == Stem.stem_number)) \
+        .join(record_class, record_class.record_id == Record.id) \
+        .filter(rule_condition(part_of_speech_code))
+
+
+def _reference(session):
+    def lookup(words, mode):
+        if mode == ParseOption.strict:
+            session.connection().connection.create_function('unaccent', 1, remove_accents)
+
+        found = []
+        for word in words:
+            if mode == ParseOption.non_strict:
+                word_condition = and_(func.substr(word, 1, func.length(Stem.stem_word)) == Stem.stem_word,
+                                      Stem.stem_word + Record.ending == word)
+            else:
+                word_condition = unaccent(Stem.stem_word) + unaccent(Record.ending) == unaccent(word)
+
+            queries = [_rule_query(part_of_speech_code, session, Entry.id, Record.id).filter(word_condition)
+                       for part_of_speech_code in RULES]
+            found.append(set(queries[0].union_all(*queries[1:])))
+
+        return found
+
+    return lookup
+
+
+def _analyse_word(session):
+    def lookup(words, mode):
+        return [{(a.entry_id, a.record_id) for a in analyse_word(word, mode, session=session, variants=False)}
+                for word in words]
+
+    return lookup
+
+
+def _forms(session):
+    def lookup(words, mode):
+        found = {}
+        for start in range(0, len(words), _chunk_size):
+            for form, entry_id, record_id in session.query(Form.form, Form.entry_id, Form.record_id) \
+                    .filter(Form.form.in_(words[start:start + _chunk_size])):
+                found.setdefault(form, set()).add((entry_id, record_id))
+
+        return [found.get(word, set()) for word in words]
+
+    return lookup
+
+
+def _batch(session):
+    index = FormIndex(session=session)
+
+    def lookup(words, mode):
+        found = [set() for word in words]
+        for token_index, entry_id, record_id in zip(*index.resolve(words)):
+            found[token_index].add((int(entry_id), int(record_id)))
+
+        return found
+
+    return lookup
+
+
+def _cache(session):
+    def lookup(words, mode):
+        directory = tempfile.mkdtemp(prefix='doll-verify-')
+        cache = AnalysisCache('verify', path=os.path.join(directory, 'verify.cache'))
+
+        try:
+            # The first time fills the cache
+            for word in words:
+                analyse_word(word, mode, session=session, variants=False, cache=cache)
+
+            return [{(a.entry_id, a.record_id) for a in analyse_word(word, mode, session=session, variants=False,
+                                                                       cache=cache)}
+                    for word in words]
+        finally:
+            cache.close()
+            shutil.rmtree(directory, ignore_errors=True)
+
+    return lookup
+
+
+# Loaders of each candidate engine, which return a function finding the analyses of a list
+# of words in a mode, and the modes the engine can match in
+ENGINES = {
+    'analyse_word': (_analyse_word, (ParseOption.non_strict, ParseOption.strict)),
+    'forms': (_forms, (ParseOption.non_strict,)),
+    'batch': (_batch, (ParseOption.non_strict,)),
+    'cache': (_cache, (ParseOption.non_strict, ParseOption.strict))
+}
+
+
+def generated_forms(session=None, sample: int = None, seed: int = 0) -> list:
+    """Finds the distinct forms the rules generate, joining stems to the endings they allow
+
+    :param session: The session to query, by default the shared Connection session
+    :param sample: The number of forms to choose at random, or None for all
+    :param seed: The seed of the random choice, so a sample can be repeated
+    :return: A sorted list of forms
+    """
+
+    session = session or Connection.session
+
+    queries = [_rule_query(part_of_speech_code, session, (Stem.stem_word + Record.ending).label('form'))
+               for part_of_speech_code in RULES]
+    forms = sorted(form for (form,) in queries[0].union(*queries[1:]))
+
+    if sample is not None and sample < len(forms):
+        forms = sorted(random.Random(seed).sample(forms, sample))
+
+    return forms
+
+
+def unmatched_words(forms: list, seed: int = 0) -> list:
+    """Makes a word from each form which should mostly have no analyses, with a letter added,
+    or the first or last taken away, along with tokens that are not Latin at all
+
+    :param forms: The forms
+    :param seed: The seed of the random changes, so they can be repeated
+    :return: A sorted list of words
+    """
+
+    rng = random.Random(seed)
+    changes = [lambda form: form + rng.choice('qxz'),
+               lambda form: form[1:],
+               lambda form: form[:-1],
+               lambda form: form[:len(form) // 2] + rng.choice('qxz') + form[len(form) // 2:]]
+
+    return sorted(set(NON_LATIN) | {rng.choice(changes)(form) for form in forms})
+
+
+def strict_spellings(forms: list, seed: int = 0) -> list:
+    """Respells each form as strict matching should still find it: in capitals, capitalised,
+    with punctuation or a digit, or with a macron on its first vowel
+
+    :param forms: The forms
+    :param seed: The seed of the choice of spelling, so it can be repeated
+    :return: A sorted list of words
+    """
+
+    rng = random.Random(seed)
+    changes = [str.upper,
+               str.capitalize,
+               lambda form: '(' + form + '),',
+               lambda form: form[:1] + '-' + form[1:],
+               lambda form: form + '1',
+               lambda form: unicodedata.normalize('NFC', ''.join(c + '\u0304' if c in 'aeiou' else c
+                                                                 for c in form))]
+
+    return sorted({rng.choice(changes)(form) for form in forms})
+
+
+def _run(name: str, lookup, setup: float, mode: ParseOption, words: list) -> tuple:
+    start = time.perf_counter()
+    found = lookup(words, mode)
+
+    return found, Timing(name, mode, setup, time.perf_counter() - start, len(words))
+
+
+def verify(engines: list = None, words: list = None, sample: int = None, session=None, modes: list = None,
+           strict_sample: int = None) -> tuple:
+    """Compares the analyses found by candidate engines with the reference
+
+    :param engines: Names of the engines in ENGINES to check, by default all those available
+    :param words: Further words to check, such as the tokens of a corpus
+    :param sample: The number of generated forms to check, chosen at random, or None for all
+    :param session: The session to query, by default the shared Connection session
+    :param modes: The ParseOptions to check, by default both
+    :param strict_sample: The most of the forms to check strictly, chosen at random, defaults to
+                          verify_strict_sample in the config
+    :return: A list of Mismatches, and a list of Timings with the reference's first in each mode
+    """
+
+    session = session or Connection.session
+    modes = modes or [ParseOption.non_strict, ParseOption.strict]
+    if strict_sample is None:
+        strict_sample = int(config['verify_strict_sample'])
+
+    if engines is None:
+        engines = [name for name in ENGINES if name != 'batch' or np is not None]
+
+    unknown = [name for name in engines if name not in ENGINES]
+    if unknown:
+        raise ValueError('Unknown engines: {0}'.format(', '.join(unknown)))
+
+    forms = generated_forms(session, sample=sample)
+    strict_forms = sorted(random.Random(0).sample(forms, strict_sample)) if strict_sample < len(forms) else forms
+
+    # The words checked in each mode
+    checked = {
+        ParseOption.non_strict: sorted(set(forms) | set(unmatched_words(forms)) | set(words or [])),
+        ParseOption.strict: sorted(set(strict_forms) | set(unmatched_words(strict_forms)) |
+                                   set(strict_spellings(strict_forms)) | set(words or []))
+    }
+
+    # Each engine is loaded once, for every mode it is checked in
+    lookups, setups = {}, {}
+    for name, loader in [('reference', _reference)] + [(name, ENGINES[name][0]) for name in engines]:
+        start = time.perf_counter()
+        lookups[name] = loader(session)
+        setups[name] = time.perf_counter() - start
+
+    mismatches, timings = [], []
+    for mode in modes:
+        mode_words = checked[mode]
+
+        print('Verifying {0} words against the reference, {1}'.format(len(mode_words), mode.name))
+
+        expected, timing = _run('reference', lookups['reference'], setups['reference'], mode, mode_words)
+        timings.append(timing)
+
+        for name in engines:
+            if mode not in ENGINES[name][1]:
+                continue
+
+            print('Checking {0}'.format(name))
+
+            found, timing = _run(name, lookups[name], setups[name], mode, mode_words)
+            timings.append(timing)
+
+            mismatches.extend(Mismatch(name, mode, word, sorted(reference - candidate), sorted(candidate - reference))
+                              for word, reference, candidate in zip(mode_words, expected, found)
+                              if reference != candidate)
+
+    return mismatches, timings
+
+
+def print_report(mismatches: list, timings: list, top: int = 20):
+    """Prints the timings of the engines, and their mismatches
+
+    :param mismatches: The Mismatches found by verify
+    :param timings: The Timings of verify
+    :param top: The most mismatches to print for each engine
+    """
+
+    for timing in timings:
+        print('{0:<14} {1:<10} setup {2:8.3f}s  lookup {3:8.3f}s  {4:9.1f}us/word  {5} mismatches'
+              .format(timing.engine, timing.mode.name, timing.setup, timing.lookup,
+                      1e6 * timing.lookup / timing.words if timing.words else 0,
+                      sum(1 for mismatch in mismatches
+                          if (mismatch.engine, mismatch.mode) == (timing.engine, timing.mode))))
+
+    for timing in timings:
+        engine_mismatches = [mismatch for mismatch in mismatches
+                             if (mismatch.engine, mismatch.mode) == (timing.engine, timing.mode)]
+        for mismatch in engine_mismatches[:top]:
+            print('{0} ({1}): {2} missing {3}, extra {4}'.format(mismatch.engine, mismatch.mode.name, mismatch.word,
+                                                                mismatch.missing, mismatch.extra))
+        if len(engine_mismatches) > top:
+            print('{0} ({1}): ... and {2} more'.format(timing.engine, timing.mode.name,
+                                                       len(engine_mismatches) - top))
@@ -1,17 +1,22 @@
-from sqlalchemy import func, or_, and_
+from sqlalchemy import and_, null, type_coerce
 from doll.db import *
+from doll.config import config
+from doll.lookup.bloom import might_be_form
+from doll.lookup.cache import analysis_cache
+from doll.lookup.compatibility import RULES
+from doll.lookup.orthography import remove_accents, variant_forms
+from doll.lookup.spelling import suggest
+from collections import namedtuple
 from enum import Enum
 import argparse
-import unicodedata
-import string
+import math
+import threading
 from sqlalchemy.sql.functions import ReturnTypeFromArgs
 
 
 class unaccent(ReturnTypeFromArgs):
     pass
 
-session = Connection.session
-
 
 class ParseOption(Enum):
     strict = 1,
@@ -21,99 +26,253 @@ class ParseOption(Enum):
 current_mode = ParseOption.non_strict
 
 
-def remove_accents(data):
-    return ''.join(x for x in unicodedata.normalize('NFKD', data) if x in string.ascii_letters).lower()
+# An analysis of a word, as an inflection of a dictionary entry
+Analysis = namedtuple('Analysis', ['word', 'entry_id', 'record_id', 'part_of_speech_code',
+                                   'description', 'translation', 'score'])
 
 
-def parse_word(word: str, current_mode: ParseOption = current_mode):
-    # Possible entries are those where the stem joined to its appropriate endings
-    # create our input word.
+# Columns of the inflection records that describe an analysis; parts of
+# speech without one of them select null in its place
+DESCRIPTION_COLUMNS = {
+    'declension_code': Declension,
+    'conjugation_code': Conjugation,
+    'case_code': Case,
+    'number_code': Number,
+    'gender_code': Gender,
+    'tense_code': Tense,
+    'voice_code': Voice,
+    'mood_code': Mood,
+    'person_code': Person,
+    'comparison_type_code': ComparisonType,
+    'numeral_sort_code': NumeralSort
+}
+
+# Description columns taken from the dictionary entry rather than the inflection record,
+# whose value may be 0 for a record of every conjugation, such as the perfect endings
+ENTRY_DESCRIPTION_COLUMNS = ('declension_code', 'conjugation_code')
+
+# The type of each description column, so the union decodes it whichever select comes first
+_description_types = {column: next(getattr(record_class, column).type for entry_class, record_class, rules
+                                   in RULES.values() if hasattr(record_class, column))
+                      for column in DESCRIPTION_COLUMNS}
+
+# Descriptions of the analyses of each part of speech, from the names of the description columns
+DESCRIPTIONS = {
+    'N': '{declension_code} Declension, {case_code} {number_code}',
+    'PRON': '{declension_code} Declension, {case_code} {number_code}',
+    'ADJ': '{declension_code} Declension, {case_code} {number_code} ({comparison_type_code})',
+    'NUM': '{declension_code} Declension, {case_code} {number_code} {gender_code} ({numeral_sort_code})',
+    'V': '{conjugation_code} Conjugation, {person_code} Person {number_code}',
+    'VPAR': '{conjugation_code} Conjugation, {case_code} {number_code} {gender_code} '
+            '{tense_code} {voice_code} {mood_code}',
+    'SUPINE': '{conjugation_code} Conjugation, Supine, {case_code} {number_code}',
+    'ADV': 'Adverb ({comparison_type_code})',
+    'PREP': 'Preposition with {case_code}',
+    'CONJ': 'Conjunction',
+    'INTERJ': 'Interjection'
+}
+
+# Names of the codes of each description column, loaded on first use, and the lock they are loaded under
+_names = {}
+_names_lock = threading.Lock()
+
+
+def _description(part_of_speech_code: str, codes: dict, session) -> str:
+    """Describes an analysis, using the names of its codes
+
+    :param part_of_speech_code: The part of speech of the inflection record
+    :param codes: The description columns of the inflection record
+    :param session: The session to load names with
+    :return: The description
+    """
+
+    global _names
+
+    # Other threads see the names only once they are all loaded
+    names = _names
+    if not names:
+        with _names_lock:
+            names = _names
+            if not names:
+                names = {column: {str(code): name for code, name in session.query(type_class.code, type_class.name)}
+                         for column, type_class in DESCRIPTION_COLUMNS.items()}
+                _names = names
+
+    return DESCRIPTIONS[part_of_speech_code].format(
+        **{column: names[column].get(str(code), code) for column, code in codes.items()})
+
+
+def analysis_query(word: str, current_mode: ParseOption = current_mode, session=None, limit: int = None):
+    """Creates the query for every analysis of a word, for every part of speech
 
+    Each part of speech has its own select, joining the stems to the
+    inflection records compatible with their entries through the
+    lookup_compatibility table; these are combined with UNION ALL so a
+    word is analysed in a single query. The analyses are ordered by the
+    scores of their forms, the most likely first.
+
+    :param word: The word to analyse
+    :param current_mode: Whether to match strictly
+    :param session: The session to query, by default the shared Connection session
+    :param limit: The most analyses to return, or None for all
+    :return: The query, whose rows are the stem, ending, entry id, record id, part of
+             speech code, translation and score, followed by the DESCRIPTION_COLUMNS
+    """
+
+    session = session or Connection.session
+
+    # Possible entries are those where the stem joined to its appropriate endings
+    # create our input word. The stem is one of the word's prefixes, which
+    # the stems' index can be searched for (see doll.lookup.storage). The empty
+    # prefix is meant, matching an empty stem as comparing the word's substr
+    # did, though the dictionary parser keeps no empty stems.
     if current_mode == ParseOption.non_strict:
-        possible_entries = [(e, r, s) for e, r, s in session.query(Entry, Record, Stem)
-            .filter(and_(Record.part_of_speech_code == Entry.part_of_speech_code,
-                         Record.stem_key == Stem.stem_number))
-            .filter(Stem.entry_id == Entry.id)
-            .filter(func.substr(word, 1, func.length(Stem.stem_word)) == Stem.stem_word)
-            .filter(Stem.stem_word + Record.ending == word)]
+        word_condition = and_(Stem.stem_word.in_([word[:length] for length in range(len(word) + 1)]),
+                              Stem.stem_word + Record.ending == word)
     else:
-        possible_entries = [(e, r, s) for e, r, s in session.query(Entry, Record, Stem)
-            .filter(and_(Record.part_of_speech_code == Entry.part_of_speech_code,
-                         Record.stem_key == Stem.stem_number))
-            .filter(Stem.entry_id == Entry.id)
-            .filter(func.substr(word, 1, func.length(Stem.stem_word)) == Stem.stem_word)
-            .filter(unaccent(Stem.stem_word) + unaccent(Record.ending) == unaccent(word))]
-
-    # It would be preferable to get a list of possible records based on
-    # the possible entries, then filter further by word type, however
-    # it is quicker simply to deal with each entry as a whole.
-    for (entry, record, stem) in possible_entries:
-        if entry.part_of_speech_code == 'N':
-            for noun_record in session.query(NounRecord) \
-                    .join(NounEntry, and_(NounRecord.declension_code == NounEntry.declension_code,
-                                          or_(NounRecord.variant == NounEntry.variant,
-                                              NounRecord.variant == 0),
-                                          or_(NounRecord.gender_code == NounEntry.gender_code,
-                                              and_(NounRecord.gender_code == 'C',
-                                                   NounEntry.gender_code.in_(('F', 'M'))),
-                                              NounRecord.gender_code == 'X'))) \
-                    .filter(NounRecord.record_id == record.id) \
-                    .filter(Record.stem_key == stem.stem_number) \
-                    .filter(NounEntry.entry_id == entry.id) \
-                    .all():
-                print('{0} - {1} Declension, {2} {3} - {4}'.format(
-                    stem.stem_word + '.' + noun_record.record.ending,
-                    noun_record.declension.name,
-                    noun_record.case.name,
-                    noun_record.number.name,
-                    entry.translation))
-        elif entry.part_of_speech_code == 'V':
-            for verb_record in session.query(VerbRecord) \
-                    .join(VerbEntry, and_(VerbRecord.conjugation_code == VerbEntry.conjugation_code,
-                                          or_(VerbRecord.variant == VerbEntry.variant,
-                                              VerbEntry.variant == 0))) \
-                    .filter(VerbRecord.record_id == record.id) \
-                    .filter(Record.stem_key == stem.stem_number) \
-                    .filter(VerbEntry.entry_id == entry.id) \
-                    .all():
-                print('{0} - {1} Conjugation, {2} Person {3} - {4}'.format(
-                    stem.stem_word + '.' + verb_record.record.ending,
-                    verb_record.conjugation.name,
-                    verb_record.person.name,
-                    verb_record.number.name,
-                    entry.translation))
-        elif entry.part_of_speech_code == 'PRON':
-            for pronoun_record in session.query(PronounRecord) \
-                    .join(PronounEntry, and_(PronounRecord.declension_code == PronounEntry.declension_code,
-                                             or_(PronounRecord.variant == PronounEntry.variant,
-                                                 PronounRecord.variant == 0))) \
-                    .filter(PronounRecord.record_id == record.id) \
-                    .filter(Record.stem_key == stem.stem_number) \
-                    .filter(PronounEntry.entry_id == entry.id) \
-                    .all():
-                print('{0} - {1} Declension, {2} {3} - {4}'.format(
-                    stem.stem_word + '.' + pronoun_record.record.ending,
-                    pronoun_record.declension.name,
-                    pronoun_record.case.name,
-                    pronoun_record.number.name,
-                    entry.translation))
-        elif entry.part_of_speech_code == 'ADJ':
-            for adjective_record in session.query(AdjectiveRecord) \
-                    .join(AdjectiveEntry, and_(AdjectiveRecord.declension_code == AdjectiveEntry.declension_code,
-                                               or_(AdjectiveRecord.variant == AdjectiveEntry.variant,
-                                                   AdjectiveRecord.variant == 0),
-                                               AdjectiveRecord.comparison_type_code == AdjectiveEntry.comparison_type_code)) \
-                    .filter(AdjectiveRecord.record_id == record.id) \
-                    .filter(Record.stem_key == stem.stem_number) \
-                    .filter(AdjectiveEntry.entry_id == entry.id) \
-                    .all():
-                print('{0} - {1} Declension, {2} {3} ({4}) - {5}'.format(
-                    stem.stem_word + '.' + adjective_record.record.ending,
-                    adjective_record.declension.name,
-                    adjective_record.case.name,
-                    adjective_record.number.name,
-                    adjective_record.comparison_type.name,
-                    entry.translation))
+        session.connection().connection.create_function('unaccent', 1, remove_accents)
+        word_condition = unaccent(Stem.stem_word) + unaccent(Record.ending) == unaccent(word)
+
+    return _analysis_union(session, word_condition).order_by(Form.score.desc(), Entry.id, Record.id).limit(limit)
+
+
+def _analysis_union(session, condition, leading_columns: tuple = (), forms_only: bool = False):
+    """Combines the selects of the analyses of each part of speech with UNION ALL
+
+    :param session: The session to query
+    :param condition: The condition the stems and records of the analyses meet
+    :param leading_columns: Columns to select before those of analysis_query
+    :param forms_only: Whether to select only the analyses with a row in lookup_form, rather than all
+    :return: The query
+    """
+
+    queries = []
+    for part_of_speech_code, (entry_class, record_class, rules) in RULES.items():
+        description_columns = [type_coerce(getattr(entry_class if column in ENTRY_DESCRIPTION_COLUMNS
+                                                   else record_class, column, null()),
+                                           _description_types[column])
+                               .label(column) for column in DESCRIPTION_COLUMNS]
+
+        query = session.query(*leading_columns, Stem.stem_word, Record.ending, Entry.id, Record.id,
+                              Record.part_of_speech_code, Entry.translation, Form.score,
+                              *description_columns) \
+            .select_from(Stem) \
+            .join(Entry, Entry.id == Stem.entry_id) \
+            .join(entry_class, entry_class.entry_id == Entry.id) \
+            .join(Compatibility, Compatibility.inflection_class_id == Entry.inflection_class_id) \
+            .join(Record, and_(Record.id == Compatibility.record_id,
+                               Record.stem_key == Stem.stem_number)) \
+            .join(record_class, record_class.record_id == Record.id)
+
+        form_condition = and_(Form.entry_id == Entry.id, Form.record_id == Record.id, Form.stem_id == Stem.id)
+        query = query.join(Form, form_condition) if forms_only else query.outerjoin(Form, form_condition)
+
+        queries.append(query.filter(condition))
+
+    return queries[0].union_all(*queries[1:])
+
+
+def _analysis(row, session) -> Analysis:
+    """Makes an analysis of a row of analysis_query
+
+    :param row: The row
+    :param session: The session to load the names of codes with
+    :return: The Analysis
+    """
+
+    stem_word, ending, entry_id, record_id, part_of_speech_code, translation, score, *codes = row
+
+    return Analysis(stem_word + '.' + ending, entry_id, record_id, part_of_speech_code,
+                    _description(part_of_speech_code, dict(zip(DESCRIPTION_COLUMNS, codes)), session),
+                    translation, score)
+
+
+def analyse_forms(forms: list, session=None) -> dict:
+    """Finds the analyses of many forms of the lookup_form table in a single query
+
+    :param forms: The forms, as many as sqlite allows parameters in a query
+    :param session: The session to query, by default the shared Connection session
+    :return: A dictionary of each form with analyses to its list of Analysis tuples, the most likely first,
+             as analyse_word finds them without variants
+    """
+
+    session = session or Connection.session
+
+    analyses = {}
+    for form, *row in _analysis_union(session, Form.form.in_(forms), (Form.form,), forms_only=True) \
+            .order_by(Form.form, Form.score.desc(), Entry.id, Record.id):
+        analyses.setdefault(form, []).append(_analysis(row, session))
+
+    return analyses
+
+
+def analyse_word(word: str, current_mode: ParseOption = current_mode, session=None, variants: bool = True,
+                 limit: int = None, cache=None) -> list:
+    """Finds the analyses of a word, the most likely first
+
+    :param word: The word to analyse
+    :param current_mode: Whether to match strictly
+    :param session: The session to query, by default the shared Connection session
+    :param variants: Whether to analyse the orthographic variants of a word that has no analyses itself
+    :param limit: The most analyses to return, such as 1 for only the best, or None for all
+    :param cache: An AnalysisCache to keep the analyses in, by default that of analysis_cache if
+                  analysis_cache is set in the config
+    :return: A list of Analysis tuples
+    """
+
+    # Most tokens which are not Latin are ruled out without a query
+    if not might_be_form(word, strict=current_mode == ParseOption.strict):
+        return []
+
+    session = session or Connection.session
+
+    # Analyses found by earlier processes, keyed by the word as it is matched
+    if cache is None and config['analysis_cache']:
+        cache = analysis_cache(session)
+    if cache is not None:
+        key = '{0}:{1}:{2}'.format(current_mode.name, 'variants' if variants else 'exact',
+                                   remove_accents(word) if current_mode == ParseOption.strict else word)
+        cached = cache.get(key)
+        if cached is not None:
+            return [Analysis(**analysis) for analysis in cached][:limit]
+
+    analyses = [_analysis(row, session)
+                for row in analysis_query(word, current_mode, session=session, limit=None if cache else limit)]
+
+    # Try the dictionary spellings of the word, such as iustitia for justicia
+    if not analyses and variants:
+        for form in variant_forms(word, session=session):
+            if form != word:
+                analyses.extend(analyse_word(form, current_mode, session=session, variants=False,
+                                             limit=None if cache else limit, cache=cache))
+
+        analyses.sort(key=lambda analysis: -analysis.score if analysis.score is not None else math.inf)
+
+    if cache is not None:
+        cache.put(key, [analysis._asdict() for analysis in analyses])
+
+    return analyses[:limit]
+
+
+def parse_word(word: str, current_mode: ParseOption = current_mode):
+    """Prints the analyses of a word, or suggestions if it has none
+
+    :param word: The word to parse
+    :param current_mode: Whether to match strictly
+    """
+
+    analyses = analyse_word(word, current_mode)
+
+    for analysis in analyses:
+        print('{0} - {1} - {2}'.format(analysis.word, analysis.description, analysis.translation))
+
+    # Rather than print nothing, suggest forms close to the word
+    if not analyses:
+        suggestions = suggest(word)
+        if suggestions:
+            print('No analyses found, did you mean: {0}?'.format(', '.join(s.form for s in suggestions[:5])))
+        else:
+            print('No analyses found')
 
 
 if __name__ == '__main__':
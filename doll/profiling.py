@@ -0,0 +1,134 @@
+"""Profiling of doll's actions.
+
+   Wraps an action, such as building the database or parsing words, in
+   cProfile, tracemalloc, or both. cProfile's statistics, of every
+   thread the action starts as well as its own, such as the database
+   writer of a build or the workers of the lookup service, are written
+   to a .pstats file, for pstats or snakeviz; tracemalloc's largest
+   allocation sites are written to a text report. For long builds the
+   report can also take a snapshot every few seconds, each listing the
+   sites which grew most since the one before.
+
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from doll.config import config
+
+# cProfile sees every thread from Python 3.12, and before then only the thread that enabled it
+_profiles_every_thread = sys.version_info >= (3, 12)
+
+
+def _write_snapshot(report, snapshot, previous, top: int, elapsed: float):
+    """Writes the largest allocation sites of a snapshot to the report
+
+    :param report: The open report file
+    :param snapshot: The tracemalloc snapshot
+    :param previous: The snapshot before, to list growth since, or None
+    :param top: The number of sites to list
+    :param elapsed: Seconds since profiling started
+    """
+
+    current, peak = tracemalloc.get_traced_memory()
+
+    if previous is None:
+        report.write('After {0:.1f}s, {1:,} bytes allocated, peak {2:,} bytes, largest sites:\n'
+                     .format(elapsed, current, peak))
+        statistics = snapshot.statistics('lineno')
+    else:
+        report.write('After {0:.1f}s, {1:,} bytes allocated, peak {2:,} bytes, most growth:\n'
+                     .format(elapsed, current, peak))
+        statistics = snapshot.compare_to(previous, 'lineno')
+
+    for statistic in statistics[:top]:
+        report.write('    {0}\n'.format(statistic))
+
+    report.write('\n')
+    report.flush()
+
+
+@contextmanager
+def profiled(name: str, cpu: bool = True, memory: bool = True, directory: str = None, top: int = None,
+             interval: float = None):
+    """Profiles the code run within it
+
+    :param name: The name of the action, which the files are named after
+    :param cpu: Whether to profile time spent in each function with cProfile
+    :param memory: Whether to trace allocations with tracemalloc
+    :param directory: Directory to write the files to, defaults to profile_dir in the config
+    :param top: Allocation sites listed in each report, defaults to profile_top in the config
+    :param interval: Seconds between allocation snapshots, or None for a single one at the end
+    """
+
+    directory = directory or config['profile_dir']
+    top = top or int(config['profile_top'])
+    os.makedirs(directory, exist_ok=True)
+
+    path = os.path.join(directory, '{0}-{1}'.format(name, time.strftime('%Y%m%d-%H%M%S')))
+
+    profiler = cProfile.Profile() if cpu else None
+    thread_profilers = []
+    thread_lock = threading.Lock()
+    report = open(path + '-memory.txt', 'w') if memory else None
+    stop = threading.Event()
+    start = time.perf_counter()
+
+    # Takes a snapshot every interval, until the action finishes
+    def sample():
+        previous = None
+        while not stop.wait(interval):
+            snapshot = tracemalloc.take_snapshot()
+            _write_snapshot(report, snapshot, previous, top, time.perf_counter() - start)
+            previous = snapshot
+
+    sampler = threading.Thread(target=sample, daemon=True) if memory and interval else None
+
+    # Gives each thread started during the action a profiler of its own, merged with the rest at the end
+    def profile_thread(frame, event, arg):
+        thread_profiler = cProfile.Profile()
+        with thread_lock:
+            thread_profilers.append(thread_profiler)
+        thread_profiler.enable()
+
+    if memory:
+        tracemalloc.start()
+    if sampler is not None:
+        sampler.start()
+    if profiler is not None:
+        if not _profiles_every_thread:
+            threading.setprofile(profile_thread)
+        profiler.enable()
+
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            if not _profiles_every_thread:
+                threading.setprofile(None)
+            profiler.disable()
+
+            statistics = pstats.Stats()
+            with thread_lock:
+                for each_profiler in [profiler] + thread_profilers:
+                    each_profiler.create_stats()
+                    if each_profiler.stats:
+                        statistics.add(each_profiler)
+
+            statistics.dump_stats(path + '.pstats')
+            print('CPU profile written to {0}.pstats'.format(path))
+
+        if memory:
+            stop.set()
+            if sampler is not None:
+                sampler.join()
+
+            _write_snapshot(report, tracemalloc.take_snapshot(), None, top, time.perf_counter() - start)
+            tracemalloc.stop()
+            report.close()
+            print('Memory report written to {0}-memory.txt'.format(path))
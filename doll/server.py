@@ -0,0 +1,239 @@
+"""Lookup service.
+
+   Serves word analyses over TCP or a Unix socket, so that consumers
+   need not pay for starting sqlalchemy and setting up a session for
+   each lookup. Requests and responses are JSON objects, one per line:
+
+       => {"id": 1, "word": "puella"}
+       <= {"id": 1, "analyses": [{"word": "puell.a", ...}]}
+       => {"id": 2, "words": ["puella", "amat"], "mode": "strict"}
+       <= {"id": 2, "analyses": [[...], [...]]}
+       => {"id": 3, "complete": "pue", "limit": 5}
+       <= {"id": 3, "completions": [{"form": "puella", ...}, ...]}
+
+   Lookups run on a pool of worker threads, each with its own
+   read-only session, so clients may pipeline requests: send many
+   without waiting, and read the responses back in the same order.
+
+   A request may be as long as serve_line_limit; a longer one is
+   skipped, and answered with an error in its place. A client that
+   goes away stops its connection's reading as well as its writing.
+
+"""
+
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from doll.config import config
+from doll.db import Connection
+from doll.lookup.autocomplete import complete
+from doll.parse_test import ParseOption, analyse_word
+
+
+def respond(line: bytes) -> dict:
+    """Answers a single request, on a worker thread
+
+    :param line: The request, a JSON object
+    :return: The response
+    """
+
+    request_id = None
+
+    try:
+        request = json.loads(line)
+        request_id = request.get('id')
+        mode = ParseOption[request.get('mode', 'non_strict')]
+        session = Connection.thread_session()
+
+        if 'complete' in request:
+            completions = complete(request['complete'], limit=request.get('limit'), session=session)
+            return {'id': request_id, 'completions': [c._asdict() for c in completions]}
+
+        if 'words' in request:
+            analyses = [[a._asdict() for a in analyse_word(word, mode, session=session)]
+                        for word in request['words']]
+        else:
+            analyses = [a._asdict() for a in analyse_word(request['word'], mode, session=session)]
+
+        return {'id': request_id, 'analyses': analyses}
+    except Exception as e:
+        return {'id': request_id, 'error': '{0}: {1}'.format(type(e).__name__, e)}
+    finally:
+        # The session is not kept between requests, so it holds no snapshot of the database while idle
+        Connection.thread_session.remove()
+
+
+async def _skip_line(reader):
+    """Reads past the rest of a line longer than the stream's limit
+
+    :param reader: The stream
+    """
+
+    while True:
+        try:
+            await reader.readuntil(b'\n')
+            return
+        except asyncio.LimitOverrunError as e:
+            await reader.readexactly(e.consumed)
+        except asyncio.IncompleteReadError:
+            return
+
+
+async def _handle(reader, writer, executor, pipeline_depth: int):
+    """Handles one client connection, answering its requests in order
+
+    :param reader: The stream of requests
+    :param writer: The stream for responses
+    :param executor: The pool of worker threads
+    :param pipeline_depth: Requests a client may have in flight before we stop reading
+    """
+
+    loop = asyncio.get_running_loop()
+    pending = asyncio.Queue(maxsize=pipeline_depth)
+
+    async def read_requests():
+        while True:
+            try:
+                line = await reader.readuntil(b'\n')
+            except asyncio.IncompleteReadError as e:
+                line = e.partial
+                if not line.strip():
+                    break
+            except asyncio.LimitOverrunError:
+                await _skip_line(reader)
+
+                # Answered in its place, so the responses still line up with the requests
+                future = loop.create_future()
+                future.set_result({'id': None, 'error': 'ValueError: The request is longer than the line limit'})
+                await pending.put(future)
+                continue
+
+            if line.strip():
+                await pending.put(loop.run_in_executor(executor, respond, line))
+
+        await pending.put(None)
+
+    async def send_responses():
+        while True:
+            future = await pending.get()
+            if future is None:
+                break
+            writer.write(json.dumps(await future).encode() + b'\n')
+            await writer.drain()
+
+    reading = asyncio.ensure_future(read_requests())
+    sender = asyncio.ensure_future(send_responses())
+
+    try:
+        # Once the client has gone the sender fails, and reading would wait for ever on a full queue
+        await asyncio.wait([reading, sender], return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in (reading, sender):
+            task.cancel()
+        await asyncio.gather(reading, sender, return_exceptions=True)
+
+        # Nobody is waiting for the requests not yet started
+        while not pending.empty():
+            future = pending.get_nowait()
+            if future is not None:
+                future.cancel()
+
+        writer.close()
+
+
+async def _serve(host: str, port: int, path: str, workers: int, pipeline_depth: int, line_limit: int):
+    executor = ThreadPoolExecutor(max_workers=workers)
+
+    def handle(reader, writer):
+        return _handle(reader, writer, executor, pipeline_depth)
+
+    if path is not None:
+        server = await asyncio.start_unix_server(handle, path=path, limit=line_limit)
+        print('Serving doll on {0}'.format(path))
+    else:
+        server = await asyncio.start_server(handle, host=host, port=port, limit=line_limit)
+        print('Serving doll on {0}:{1}'.format(host, port))
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        executor.shutdown()
+
+
+def serve(host: str = None, port: int = None, path: str = None, workers: int = None, pipeline_depth: int = None,
+          line_limit: int = None):
+    """Runs the lookup service until interrupted
+
+    :param host: Host to listen on, defaults to serve_host in the config
+    :param port: Port to listen on, defaults to serve_port in the config
+    :param path: Path of a Unix socket to listen on instead of TCP
+    :param workers: Number of worker threads, defaults to serve_workers in the config
+    :param pipeline_depth: Requests a client may have in flight, defaults to serve_pipeline_depth in the config
+    :param line_limit: The longest request in bytes, defaults to serve_line_limit in the config
+    :return: None
+    """
+
+    try:
+        asyncio.run(_serve(host or config['serve_host'],
+                           port or int(config['serve_port']),
+                           path,
+                           workers or int(config['serve_workers']),
+                           pipeline_depth or int(config['serve_pipeline_depth']),
+                           line_limit or int(config['serve_line_limit'])))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _load_client(words: list, requests: int, host: str, port: int, path: str):
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+
+    async def send():
+        for i in range(requests):
+            writer.write(json.dumps({'id': i, 'word': words[i % len(words)]}).encode() + b'\n')
+            await writer.drain()
+
+    sender = asyncio.ensure_future(send())
+    errors = 0
+    for i in range(requests):
+        errors += 'error' in json.loads(await reader.readline())
+    await sender
+    writer.close()
+
+    return errors
+
+
+async def _load_test(words, connections, requests, host, port, path):
+    return await asyncio.gather(*[_load_client(words, requests, host, port, path) for i in range(connections)])
+
+
+def load_test(words: list, connections: int = 8, requests: int = 1000,
+              host: str = None, port: int = None, path: str = None) -> float:
+    """Measures the throughput of a running lookup service
+
+    Each connection pipelines its requests, cycling through the
+    given words, while reading back the responses.
+
+    :param words: Words to look up
+    :param connections: Number of concurrent connections
+    :param requests: Number of requests on each connection
+    :param host: Host of the service, defaults to serve_host in the config
+    :param port: Port of the service, defaults to serve_port in the config
+    :param path: Path of the service's Unix socket, if it has one
+    :return: Requests answered per second
+    """
+
+    start = time.perf_counter()
+    errors = asyncio.run(_load_test(words, connections, requests,
+                                    host or config['serve_host'], port or int(config['serve_port']), path))
+    elapsed = time.perf_counter() - start
+
+    rate = connections * requests / elapsed
+    print('{0:,} requests in {1:.2f}s ({2:,.0f}/s), {3:,} errors'.format(connections * requests, elapsed,
+                                                                      rate, sum(errors)))
+
+    return rate
@@ -13,5 +13,8 @@ setup(name='doll',
           'console_scripts': [
               'doll = doll.__main__:main'
           ]},
+      extras_require={
+          'batch': ['numpy']
+      },
       packages=find_packages()
       )
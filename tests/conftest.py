@@ -0,0 +1,86 @@
+"""Fixtures of the tests.
+
+   doll keeps its database in ~/.doll, and connects to it as soon as
+   doll.db is imported, so HOME is pointed at a temporary directory
+   before anything from doll is imported. The database is then built
+   once, from the small DICTLINE.GEN and INFLECTS.LAT in tests/data,
+   for the tests which look words up.
+
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+HOME = tempfile.mkdtemp(prefix='doll-tests-')
+os.environ['HOME'] = HOME
+os.makedirs(os.path.join(HOME, '.doll'))
+
+import pytest
+
+# The Words input files the database is built from
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# The directory of the doll package, for subprocesses
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(HOME, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def database():
+    """Builds the database from tests/data, once
+
+    :return: The shared Connection session
+    """
+
+    from doll.db import Connection
+    from doll.input_parser import parse_all_inputs
+
+    parse_all_inputs(DATA_DIR, commit_changes=True)
+
+    return Connection.session
+
+
+@pytest.fixture
+def empty_session(tmp_path):
+    """Creates the tables in a database of their own, with nothing in them
+
+    :return: A session of the database, which a RowWriter's thread may use
+    """
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from doll.db.model import Base
+
+    engine = create_engine('sqlite:///' + str(tmp_path / 'empty.db'), connect_args={'check_same_thread': False})
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    yield session
+
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def run_python():
+    """Runs Python code in a process of its own, such as one with another database or config
+
+    :return: A function taking the code and the HOME of the process, by default the tests',
+             and returning what it printed
+    """
+
+    def run(code: str, home: str = HOME) -> str:
+        environment = dict(os.environ, HOME=home, PYTHONPATH=ROOT)
+        result = subprocess.run([sys.executable, '-c', code], env=environment, cwd=ROOT,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        assert result.returncode == 0, result.stderr
+
+        return result.stdout
+
+    return run
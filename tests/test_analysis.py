@@ -0,0 +1,50 @@
+import doll.parse_test
+from concurrent.futures import ThreadPoolExecutor
+from doll.db import Connection
+from doll.db.model import *
+from doll.parse_test import ParseOption, analyse_word, analysis_query
+
+
+def test_every_part_of_speech_is_analysed_in_one_query(database):
+    rows = analysis_query('amatus').all() + analysis_query('amat').all()
+
+    assert {(stem + '.' + ending, part_of_speech_code) for stem, ending, entry_id, record_id, part_of_speech_code,
+            *columns in rows} == {('amat.us', 'VPAR'), ('am.at', 'V')}
+
+
+def test_descriptions(database):
+    analysis, = analyse_word('amat')
+
+    assert analysis.description == 'First Conjugation, Third Person Singular'
+    assert analysis.translation == 'love, like; fall in love with; be fond of;'
+
+
+def test_perfect_records_of_every_conjugation(database):
+    record_ids = {record_id for (record_id,) in database.query(VerbRecord.record_id)
+                  .filter(VerbRecord.conjugation_code == '0', VerbRecord.tense_code == 'PERF')}
+
+    for word in ('amavi', 'laudavi'):
+        analyses = analyse_word(word)
+
+        assert [a.word for a in analyses] == [word[:-1] + '.i']
+        assert {a.record_id for a in analyses} == record_ids
+        assert analyses[0].description == 'First Conjugation, First Person Singular'
+
+
+def test_strict_mode_ignores_case_and_accents(database):
+    assert [a.word for a in analyse_word('PUELLĀM', ParseOption.strict)] == ['puell.am']
+    assert analyse_word('PUELLAM', ParseOption.non_strict, variants=False) == []
+
+
+def test_descriptions_are_loaded_once_across_threads(database, monkeypatch):
+    expected = [a.description for a in analyse_word('puellae')]
+    monkeypatch.setattr(doll.parse_test, '_names', {})
+
+    def describe(i):
+        try:
+            return [a.description for a in analyse_word('puellae', session=Connection.thread_session())]
+        finally:
+            Connection.thread_session.remove()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert list(executor.map(describe, range(32))) == [expected] * 32
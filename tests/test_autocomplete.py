@@ -0,0 +1,28 @@
+from doll.lookup.autocomplete import Completer, complete
+
+
+def test_completions_start_with_the_prefix(database):
+    completions = complete('puell')
+
+    assert completions
+    assert all(c.form.startswith('puell') for c in completions)
+    assert complete('qqq') == []
+    assert complete('') == []
+
+
+def test_lemmas_come_first_among_equals(database):
+    completions = Completer(session=database).complete('puell')
+
+    assert completions[0] == ('puella', True, completions[0].score)
+    assert not any(c.is_lemma for c in completions[1:])
+
+
+def test_indexed_and_ranged_prefixes_agree(database):
+    indexed = Completer(session=database, limit=5, index_length=4)
+    ranged = Completer(session=database, limit=5, index_length=0)
+
+    for prefix in ('a', 'am', 'pu', 'laud', 'qu', 'cu', 'x'):
+        assert indexed.complete(prefix) == ranged.complete(prefix)
+
+    assert len(indexed.complete('a', limit=2)) == 2
+    assert indexed.complete('a', limit=20) == ranged.complete('a', limit=20)
@@ -0,0 +1,69 @@
+import doll.lookup.batch
+import pytest
+from sqlalchemy import event
+from doll.db.model import *
+from doll.lookup.batch import FormIndex
+from doll.parse_test import ParseOption, analyse_word
+
+np = pytest.importorskip('numpy')
+
+
+def test_resolve_finds_the_analyses_of_every_token(database):
+    index = FormIndex(session=database)
+    tokens = ['puellae', 'xyz', 'amat', 'puellae', '']
+
+    token_indices, entry_ids, record_ids = index.resolve(tokens)
+
+    found = [set() for token in tokens]
+    for token_index, entry_id, record_id in zip(token_indices, entry_ids, record_ids):
+        found[token_index].add((int(entry_id), int(record_id)))
+
+    assert list(token_indices) == sorted(token_indices)
+    assert found == [set(database.query(Form.entry_id, Form.record_id).filter(Form.form == token))
+                     for token in tokens]
+    assert found[0] and not found[1] and found[0] == found[3]
+
+
+def test_analyses_of_a_batch(database):
+    index = FormIndex(session=database)
+    amat = analyse_word('amat', ParseOption.non_strict, variants=False)
+
+    assert amat
+    assert index.analyses(['amat', 'xyz', 'amat']) == [amat, [], amat]
+    assert len(index) == database.query(Form.form).distinct().count()
+
+
+def test_empty_index(empty_session):
+    index = FormIndex(session=empty_session)
+
+    assert len(index) == 0
+    assert list(index.positions(['puella'])) == [-1]
+    assert [list(array) for array in index.resolve(['puella', 'amat'])] == [[], [], []]
+    assert index.analyses(['puella']) == [[]]
+
+
+def test_analyses_expand_the_forms_of_a_batch_in_one_query(database, monkeypatch):
+    index = FormIndex(session=database)
+    forms = [form for form, in database.query(Form.form).distinct().order_by(Form.form)]
+    expected = [analyse_word(form, ParseOption.non_strict, session=database, variants=False) for form in forms]
+
+    statements = []
+
+    def record(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    monkeypatch.setattr(doll.lookup.batch, '_forms_per_query', len(forms))
+    event.listen(database.get_bind(), 'before_cursor_execute', record)
+    try:
+        analyses = index.analyses(forms + ['xyz'], session=database)
+    finally:
+        event.remove(database.get_bind(), 'before_cursor_execute', record)
+
+    assert analyses == expected + [[]]
+    assert len([statement for statement in statements if 'lookup_form' in statement]) == 1
+
+
+def test_hashes_are_the_same_in_every_process(run_python):
+    printed = run_python("from doll.lookup.batch import _hash; print(_hash('puellae'))")
+
+    assert int(printed) == doll.lookup.batch._hash('puellae')
@@ -0,0 +1,40 @@
+import pytest
+from doll.lookup.bloom import BloomFilter, might_be_form
+from doll.parse_test import ParseOption, analyse_word, analysis_query
+
+
+def test_filter_has_no_false_negatives():
+    bloom = BloomFilter.for_capacity(1000, 0.01)
+    words = ['word{0}'.format(i) for i in range(1000)]
+    for word in words:
+        bloom.add(word)
+
+    assert all(word in bloom for word in words)
+    assert sum('other{0}'.format(i) in bloom for i in range(10000)) < 300
+
+
+def test_filter_round_trips_through_a_file(tmp_path):
+    bloom = BloomFilter.for_capacity(10, 0.01)
+    bloom.add('puella')
+    bloom.save(str(tmp_path / 'test.bloom'))
+
+    loaded = BloomFilter.load(str(tmp_path / 'test.bloom'))
+
+    assert (loaded.bit_count, loaded.hash_count, loaded.bits) == (bloom.bit_count, bloom.hash_count, bloom.bits)
+    assert 'puella' in loaded
+
+
+def test_filter_rules_out_tokens_which_are_not_forms(database):
+    assert might_be_form('puella')
+    assert not might_be_form('1066')
+    assert not might_be_form('puella,')
+
+
+@pytest.mark.parametrize('word', ['puella,', 'puel-la', 'Puella1', 'PUELLAM', '(Amat)', 'amāvī'])
+def test_strict_words_with_punctuation_and_capitals(database, word):
+    expected = {(entry_id, record_id) for stem, ending, entry_id, record_id, *columns
+                in analysis_query(word, ParseOption.strict)}
+
+    assert expected
+    assert might_be_form(word, strict=True)
+    assert {(a.entry_id, a.record_id) for a in analyse_word(word, ParseOption.strict)} == expected
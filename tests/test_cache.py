@@ -0,0 +1,89 @@
+import doll.lookup.autocomplete
+import doll.lookup.cache
+import doll.lookup.paradigm
+import doll.parse_test
+import pytest
+import sqlite3
+from doll.config import config
+from doll.db.model import *
+from doll.lookup.autocomplete import complete
+from doll.lookup.cache import AnalysisCache, analysis_cache, build_stamp, reset_caches
+from doll.lookup.paradigm import generate_paradigm
+from doll.lookup.ranking import build_ranking
+from doll.parse_test import analyse_word
+
+
+@pytest.fixture
+def cached(database, monkeypatch):
+    """Turns the analysis cache on, starting it empty"""
+
+    monkeypatch.setitem(config, 'analysis_cache', True)
+    reset_caches()
+    analysis_cache(database)._connection.execute('DELETE FROM analysis')
+
+    yield
+
+    reset_caches()
+
+
+def test_cache_of_another_build_is_emptied(tmp_path):
+    path = str(tmp_path / 'test.cache')
+
+    cache = AnalysisCache('first', path=path)
+    cache.put('non_strict:puella', [{'word': 'puell.a'}])
+    cache.close()
+
+    cache = AnalysisCache('first', path=path)
+    assert cache.get('non_strict:puella') == [{'word': 'puell.a'}]
+    cache.close()
+
+    cache = AnalysisCache('second', path=path)
+    assert cache.get('non_strict:puella') is None
+    cache.close()
+
+
+def test_analyses_are_served_from_the_cache(cached, monkeypatch):
+    analyses = analyse_word('puellae')
+
+    def no_query(*args, **kwargs):
+        raise AssertionError('The analyses should have been cached')
+
+    monkeypatch.setattr(doll.parse_test, 'analysis_query', no_query)
+
+    assert analyse_word('puellae') == analyses
+    assert analyse_word('puellae', limit=1) == analyses[:1]
+
+
+def test_ranking_stamps_a_new_build_and_empties_caches(cached, database):
+    analyse_word('puellae')
+    complete('pu')
+    generate_paradigm(1)
+
+    stamp = build_stamp(database)
+    builds = database.query(Build).count()
+
+    build_ranking(session=database, commit_changes=True)
+
+    assert database.query(Build).count() == builds + 1
+    assert build_stamp(database) != stamp
+    assert doll.lookup.cache._cache is None
+    assert doll.lookup.autocomplete._completer is None
+    assert doll.lookup.paradigm._templates == {}
+
+    # The cache is opened again for the new build, empty
+    assert analysis_cache(database).stamp == build_stamp(database)
+    assert analysis_cache(database).get('non_strict:variants:puellae') is None
+
+
+def test_resetting_closes_the_old_cache(cached, database):
+    cache = analysis_cache(database)
+    cache.put('non_strict:variants:puellae', [{'word': 'puell.ae'}])
+
+    reset_caches()
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        cache._connection.execute('SELECT 1')
+
+    # A thread still holding the old cache finds nothing in it, rather than failing
+    assert cache.get('non_strict:variants:puellae') is None
+    cache.put('non_strict:variants:puellae', [])
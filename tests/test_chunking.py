@@ -0,0 +1,49 @@
+import os
+from conftest import DATA_DIR
+from doll.db.model import *
+from doll.input_parser.parse_dictionary import parse_dict_file
+from doll.input_parser.parse_inflections import parse_inflect_file
+from doll.input_parser.pipeline import RowWriter
+
+
+# A writer counting the chunks it is given
+class CountingWriter(RowWriter):
+    chunks = 0
+
+    def put(self, write, rows):
+        self.chunks += 1
+        super().put(write, rows)
+
+
+def _lines(name: str) -> int:
+    with open(os.path.join(DATA_DIR, name), 'rb') as f:
+        return sum(1 for line in f)
+
+
+def test_inflections_are_written_in_chunks(empty_session):
+    with CountingWriter(empty_session) as writer:
+        parse_inflect_file(os.path.join(DATA_DIR, 'INFLECTS.LAT'), chunk_size=4, writer=writer)
+
+    assert writer.chunks == _lines('INFLECTS.LAT') // 4 + 1
+    assert empty_session.query(Record).count() == sum(
+        1 for line in open(os.path.join(DATA_DIR, 'INFLECTS.LAT')) if line.strip() and not line.startswith('-'))
+
+
+def test_chunk_size_does_not_change_the_rows(empty_session):
+    empty_session.add(Language(code='E', name='English', description=''))
+    empty_session.flush()
+
+    counts = []
+    for chunk_size in (1, 1000):
+        with CountingWriter(empty_session) as writer:
+            parse_dict_file(os.path.join(DATA_DIR, 'DICTLINE.GEN'), chunk_size=chunk_size, writer=writer)
+
+        counts.append((writer.chunks, empty_session.query(Entry).count(), empty_session.query(Stem).count(),
+                       empty_session.query(Translation).count()))
+
+    lines = _lines('DICTLINE.GEN')
+    assert counts[0][0] == lines + 1 and counts[1][0] == 1
+
+    # The second parse adds the same rows again, under new ids
+    assert counts[1][1:] == tuple(2 * count for count in counts[0][1:])
+    assert counts[0][1] == lines
@@ -0,0 +1,38 @@
+from doll.db.model import *
+from doll.lookup.compatibility import RULES, conjugation, entry_any, equal, gender, variant
+
+
+def test_matchers():
+    assert equal('1', '1') and not equal('1', '2')
+    assert variant(0, 3) and variant(3, 3) and not variant(2, 3)
+    assert conjugation('0', '3') and conjugation('3', '3') and not conjugation('1', '3')
+    assert gender('C', 'F') and gender('C', 'M') and not gender('C', 'N')
+    assert gender('X', 'N') and gender('N', 'N') and not gender('M', 'F')
+    assert entry_any('CARD', 'X') and entry_any('CARD', 'CARD') and not entry_any('X', 'CARD')
+
+
+def test_compatibility_follows_the_rules(database):
+    compatible = set(database.query(Compatibility.inflection_class_id, Compatibility.record_id))
+
+    for part_of_speech_code, (entry_class, record_class, rules) in RULES.items():
+        entries = database.query(entry_class.entry_id, Entry.inflection_class_id,
+                                 *[getattr(entry_class, c) for c in rules]) \
+            .join(Entry, Entry.id == entry_class.entry_id).all()
+        records = database.query(record_class.record_id, *[getattr(record_class, c) for c in rules]).all()
+
+        assert entries and records
+        for entry_id, inflection_class_id, *entry_values in entries:
+            assert inflection_class_id is not None
+            for record_id, *record_values in records:
+                expected = all(match(record_value, entry_value) for match, record_value, entry_value
+                               in zip(rules.values(), record_values, entry_values))
+                assert ((inflection_class_id, record_id) in compatible) == expected
+
+
+def test_entries_share_classes(database):
+    # The first and second declension nouns differ in their declension, the two verbs in nothing
+    classes = dict(database.query(Stem.stem_word, Entry.inflection_class_id)
+                   .join(Entry, Entry.id == Stem.entry_id).filter(Stem.stem_number == 1))
+
+    assert classes['am'] == classes['laud']
+    assert classes['puell'] != classes['domin']
@@ -0,0 +1,68 @@
+import pickle
+from doll.db.model import *
+from doll.lookup.corpus import CorpusStatistics, CountMinSketch, FrequencyCounter
+
+
+def test_sketch_never_underestimates():
+    sketch = CountMinSketch(64, 4)
+    for i in range(1000):
+        sketch.add(i % 100, i % 7)
+
+    counts = {key: sum(i % 7 for i in range(1000) if i % 100 == key) for key in range(100)}
+
+    assert all(sketch.estimate(key) >= count for key, count in counts.items())
+    assert sketch.total == sum(counts.values())
+
+
+def test_counter_is_exact_up_to_its_limit():
+    counter = FrequencyCounter(limit=3, width=256, depth=4, heavy_hitters=2)
+    for key in 'aaaabbbcc' + 'dddddd' + 'e':
+        counter.add(key)
+
+    assert [counter.count(key) for key in 'abc'] == [(4, True), (3, True), (2, True)]
+    assert counter.count('d') == (6, False)
+    assert counter.most_common(2) == [('d', 6, False), ('a', 4, True)]
+    assert counter.total == 16
+
+
+def test_merged_counters_count_every_key():
+    first, second = FrequencyCounter(limit=2, width=256), FrequencyCounter(limit=2, width=256)
+    for key in 'aabbc':
+        first.add(key)
+    for key in 'cccaa':
+        second.add(key)
+
+    first.merge(second)
+
+    assert first.count('a') == (4, True)
+    assert first.count('c')[0] >= 4
+    assert first.total == 10
+
+
+def test_collect_counts_words_and_entries(database):
+    statistics = CorpusStatistics(limit=100)
+    statistics.collect(['puella', 'amat', 'puella', 'xyz', 'amavi'])
+
+    amo = database.query(Stem.entry_id).filter(Stem.stem_word == 'amav').scalar()
+
+    assert statistics.forms.count('puella') == (2, True)
+    assert statistics.forms.count('xyz') == (1, True)
+    assert statistics.entries.count(amo) == (2, True)
+    assert statistics.forms.total == 5
+
+    # The entries of each word are not pickled along with the counts
+    assert pickle.loads(pickle.dumps(statistics)).forms.count('puella') == (2, True)
+
+
+def test_save_adds_to_the_counts(database):
+    statistics = CorpusStatistics(limit=100)
+    statistics.add('amat', [1])
+
+    try:
+        statistics.save(session=database)
+        statistics.save(session=database)
+
+        assert database.query(FormCount.count, FormCount.is_exact).filter(FormCount.form == 'amat').one() == (2, True)
+        assert database.query(EntryCount.count).filter(EntryCount.entry_id == 1).scalar() == 2
+    finally:
+        database.rollback()
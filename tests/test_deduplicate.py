@@ -0,0 +1,83 @@
+from doll.db.model import *
+from doll.input_parser.deduplicate import _duplicates, deduplicate_entries, deduplicate_records
+from doll.parse_test import analyse_word
+
+
+def test_duplicates_keep_the_first_of_each_key():
+    assert _duplicates([(('a',), 1), (('b',), 2), (('a',), 3), (('a',), 4)]) == [3, 4]
+
+
+def test_entries_differing_only_in_their_kind_are_merged(database):
+    entries = database.query(PronounEntry.entry_id, PronounEntry.pronoun_kind_code).all()
+
+    # Two identical relative pronouns and an interrogative one in DICTLINE.GEN
+    assert [kind for entry_id, kind in entries] == ['REL']
+    assert database.query(Stem).filter(Stem.stem_word == 'qu').count() == 1
+    assert database.query(TranslationSet).filter(TranslationSet.entry_id == entries[0][0]).count() == 3
+
+
+def test_identical_records_are_removed(database):
+    assert database.query(Record).filter(Record.part_of_speech_code == 'PRON', Record.ending == 'ui').count() == 1
+    assert [a.word for a in analyse_word('cuui')] == ['cu.ui']
+
+
+def test_deduplication_leaves_nothing_to_remove(database):
+    try:
+        assert deduplicate_entries(session=database) == 0
+        assert deduplicate_records(session=database) == 0
+    finally:
+        database.rollback()
+
+
+def _copy(session, model, column, row_id, **changes) -> int:
+    """Inserts a copy of the rows of a table whose column is row_id, with some values changed
+
+    :return: The id of the last row inserted
+    """
+
+    table = model.__table__
+    result = None
+    for row in session.execute(table.select().where(table.c[column] == row_id)).mappings().all():
+        values = {key: value for key, value in row.items() if key != 'id'}
+        values.update(changes)
+        result = session.execute(table.insert().values(**values))
+
+    return result.inserted_primary_key[0]
+
+
+def _copy_entry(session, entry_class, entry_id, **changes) -> int:
+    """Copies an entry, with its stems, and changes to its part of speech columns"""
+
+    copy_id = _copy(session, Entry, 'id', entry_id)
+    _copy(session, entry_class, 'entry_id', entry_id, entry_id=copy_id, **changes)
+    _copy(session, Stem, 'entry_id', entry_id, entry_id=copy_id)
+
+    return copy_id
+
+
+def test_only_the_pronoun_kind_is_ignored(database):
+    puella = database.query(Stem.entry_id).filter(Stem.stem_word == 'puell').distinct().scalar()
+    qui = database.query(Stem.entry_id).filter(Stem.stem_word == 'qu').distinct().scalar()
+
+    try:
+        _copy_entry(database, NounEntry, puella, noun_kind_code='P')
+        _copy_entry(database, PronounEntry, qui, pronoun_kind_code='INTERR')
+
+        assert deduplicate_entries(session=database) == 1
+        assert database.query(Stem.entry_id).filter(Stem.stem_word == 'puell').distinct().count() == 2
+    finally:
+        database.rollback()
+
+
+def test_records_of_different_ages_are_kept(database):
+    record_id, = database.query(Record.id).filter(Record.part_of_speech_code == 'N', Record.ending == 'am').one()
+
+    try:
+        copy_id = _copy(database, Record, 'id', record_id, age_code='B')
+        _copy(database, NounRecord, 'record_id', record_id, record_id=copy_id)
+
+        assert deduplicate_records(session=database) == 0
+        assert database.query(Record.age_code).filter(Record.ending == 'am').order_by(Record.age_code).all() == \
+            [('B',), ('X',)]
+    finally:
+        database.rollback()
@@ -0,0 +1,24 @@
+from doll.db.model import *
+from doll.lookup.endings import forms_ending_with, reverse, rhymes
+
+
+def test_reverse():
+    assert reverse('amabamus') == 'sumabama'
+
+
+def test_forms_ending_with_a_suffix(database):
+    endings = forms_ending_with('at')
+
+    assert [e.form for e in endings] == ['laudat', 'amat']
+    assert sorted(endings) == sorted(database.query(Form.form, Form.entry_id, Form.record_id)
+                                     .filter(Form.form.like('%at')))
+    assert forms_ending_with('at', limit=1) == endings[:1]
+    assert forms_ending_with('xyz') == []
+
+
+def test_rhymes_leave_out_the_word_before_the_limit(database):
+    assert [e.form for e in rhymes('amat', length=2)] == ['laudat']
+
+    # laudat comes first in the order of reversed forms
+    assert [e.form for e in rhymes('laudat', length=2, limit=1)] == ['amat']
+    assert rhymes('amat') == []
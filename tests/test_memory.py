@@ -0,0 +1,64 @@
+import hashlib
+import os
+from conftest import HOME
+from doll.parse_test import analyse_word
+
+# Words whose analyses are compared between the file and the copy in memory
+WORDS = ['puella', 'puellae', 'amat', 'laudavi', 'cuius']
+
+# Copies the database into memory, and prints what sessions of the copy see and may do
+IN_MEMORY = '''
+import threading
+from doll.db import Connection
+from doll.parse_test import analyse_word
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+print(Connection.load_into_memory(pages=0))
+print(Connection.session.get_bind().url.database)
+print([analyse_word(word) for word in {words!r}])
+
+try:
+    Connection.session.execute(text('DELETE FROM lookup_form'))
+    print('written')
+except OperationalError:
+    print('refused')
+
+found = []
+def lookup():
+    session = Connection.thread_session()
+    found.append((session.get_bind().url.database, [analyse_word(word, session=session) for word in {words!r}]))
+    Connection.thread_session.remove()
+
+thread = threading.Thread(target=lookup)
+thread.start()
+thread.join()
+print(found[0][0])
+print(found[0][1])
+'''
+
+
+def test_sessions_read_the_copy_in_memory(database, run_python):
+    loaded, url, analyses, written, thread_url, thread_analyses = \
+        run_python(IN_MEMORY.format(words=WORDS)).splitlines()[-6:]
+
+    expected = repr([analyse_word(word) for word in WORDS])
+    name = hashlib.sha1(os.path.realpath(database.get_bind().url.database).encode()).hexdigest()[:16]
+
+    assert loaded == 'True'
+    assert url == thread_url
+    assert url == 'file:doll-memory-' + name
+    assert analyses == expected and thread_analyses == expected
+    assert written == 'refused'
+
+
+def test_no_bytes_are_too_many(database, run_python):
+    printed = run_python('from doll.db import Connection\n'
+                         'print(Connection.load_into_memory(max_bytes=0))\n'
+                         'print(Connection.session.get_bind().url.database)')
+
+    loaded, url = printed.splitlines()[-2:]
+
+    assert loaded == 'False'
+    assert url == database.get_bind().url.database
+    assert url.startswith(os.path.join(HOME, '.doll'))
@@ -0,0 +1,23 @@
+from doll.lookup.orthography import canonical, variant_forms
+from doll.parse_test import ParseOption, analyse_word
+
+
+def test_canonical_spelling():
+    assert canonical('Justitiae') == 'iusticie'
+    assert canonical('iusticie') == 'iusticie'
+    assert canonical('vox') == 'uox'
+    assert canonical('puēllā') == 'puella'
+
+
+def test_variant_forms(database):
+    assert variant_forms('puelle') == ['puellae']
+    assert variant_forms('xyz') == []
+
+
+def test_variants_are_analysed(database):
+    analyses = analyse_word('puelle')
+
+    assert {a.word for a in analyses} == {'puell.ae'}
+    assert analyses == analyse_word('puellae')
+    assert analyse_word('puelle', variants=False) == []
+    assert analyse_word('puelle', ParseOption.strict, variants=False) == []
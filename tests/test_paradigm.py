@@ -0,0 +1,26 @@
+from doll.db.model import *
+from doll.lookup.paradigm import generate_paradigm, generate_paradigms
+
+
+def _entry_id(session, stem_word: str) -> int:
+    return session.query(Stem.entry_id).filter(Stem.stem_word == stem_word, Stem.stem_number == 1).scalar()
+
+
+def test_paradigm_of_a_noun(database):
+    paradigm = generate_paradigm(_entry_id(database, 'puell'))
+
+    assert sorted(form.form for form in paradigm) == ['puella', 'puellae', 'puellae', 'puellam', 'puellas']
+    assert {(form.form, form.inflection['case_code'], form.inflection['number_code']) for form in paradigm} >= \
+        {('puella', 'NOM', 'S'), ('puellae', 'GEN', 'S'), ('puellae', 'NOM', 'P'), ('puellas', 'ACC', 'P')}
+
+
+def test_paradigm_matches_the_forms(database):
+    entry_ids = [entry_id for (entry_id,) in database.query(Entry.id).order_by(Entry.id)]
+
+    for entry_id, paradigm in generate_paradigms(entry_ids):
+        assert sorted((form.form, form.record_id) for form in paradigm) == \
+            sorted(database.query(Form.form, Form.record_id).filter(Form.entry_id == entry_id))
+
+
+def test_paradigm_of_an_unknown_entry(database):
+    assert generate_paradigm(10 ** 9) == []
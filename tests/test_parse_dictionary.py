@@ -0,0 +1,67 @@
+import os
+from conftest import DATA_DIR
+from doll.db.model import *
+from doll.input_parser.parse_dictionary import DICTLINE_LAYOUT, TRANSLATION_START, Parser, compile_layout
+
+
+def _line(stems: str) -> bytes:
+    with open(os.path.join(DATA_DIR, 'DICTLINE.GEN'), 'rb') as f:
+        return next(line for line in f if line.startswith(stems.encode()))
+
+
+def test_layout_unpacks_every_field():
+    dictline = compile_layout(DICTLINE_LAYOUT)
+    line = _line('am ')
+
+    fields = dict(zip((name for name, start, end in DICTLINE_LAYOUT),
+                      (field.strip().decode() for field in dictline.unpack_from(line))))
+
+    assert dictline.size == DICTLINE_LAYOUT[-1][2]
+    assert fields == {'stem_1': 'am', 'stem_2': 'am', 'stem_3': 'amav', 'stem_4': 'amat',
+                      'part_of_speech_code': 'V', 'part_of_speech_data': '1 1 TRANS',
+                      'age_code': 'X', 'area_code': 'X', 'location_code': 'X', 'frequency_code': 'A',
+                      'source_code': 'O'}
+    assert line[TRANSLATION_START:].strip() == b'love, like; fall in love with; be fond of;'
+
+
+def test_layout_skips_the_gaps_between_fields():
+    assert compile_layout((('a', 0, 2), ('b', 3, 4))).unpack(b'ab-c') == (b'ab', b'c')
+
+
+def test_entries_are_built_for_their_part_of_speech(database):
+    verb = database.query(VerbEntry).join(Stem, Stem.entry_id == VerbEntry.entry_id) \
+        .filter(Stem.stem_word == 'amav').one()
+    assert (verb.conjugation_code, verb.variant, verb.verb_kind_code) == ('1', 1, 'TRANS')
+
+    stems = [s for (s,) in database.query(Stem.stem_word).filter(Stem.entry_id == verb.entry_id)
+             .order_by(Stem.stem_number)]
+    assert stems == ['am', 'am', 'amav', 'amat']
+
+    # Stems of zzz are placeholders
+    participle = database.query(Entry.id).filter(Entry.part_of_speech_code == 'VPAR').scalar()
+    assert [s for (s,) in database.query(Stem.stem_word).filter(Stem.entry_id == participle)] == ['amat']
+
+
+def test_translations_are_split_into_sets_and_tokens(database):
+    rows = list(Parser(database).parse_translation(1, 1, 'X', 'girl, maiden; L:(female) slave;'))
+    tables = [table for table, row in rows]
+
+    assert tables == [TranslationSet.__table__, Translation.__table__, TranslationToken.__table__,
+                      Translation.__table__, TranslationToken.__table__,
+                      TranslationSet.__table__, Translation.__table__,
+                      TranslationToken.__table__, TranslationToken.__table__]
+    assert [row['area_code'] for table, row in rows if table is TranslationSet.__table__] == ['X', 'L']
+    assert [row['translation'] for table, row in rows if table is Translation.__table__] == \
+        ['girl', 'maiden', '(female) slave']
+    assert [row['token'] for table, row in rows if table is TranslationToken.__table__] == \
+        ['girl', 'maiden', 'female', 'slave']
+
+
+def test_entries_are_found_by_translation_token(database):
+    entry_ids = {entry_id for (entry_id,) in database.query(TranslationSet.entry_id)
+                 .join(Translation, Translation.translation_set_id == TranslationSet.id)
+                 .join(TranslationToken, TranslationToken.translation_id == Translation.id)
+                 .filter(TranslationToken.token == 'king')}
+
+    assert [stem for (stem,) in database.query(Stem.stem_word).filter(Stem.entry_id.in_(entry_ids),
+                                                                      Stem.stem_number == 1)] == ['rex']
@@ -0,0 +1,33 @@
+from doll.db.model import *
+from doll.input_parser.parse_inflections import INFLECTION_SCHEMA, compile_schema
+
+
+def test_decoder_reads_the_part_of_speech_columns():
+    decode = compile_schema(*INFLECTION_SCHEMA['N'])
+
+    record, noun_record = decode('N 1 1 GEN S C  1 2 ae        X A'.split(), 7)
+
+    assert record == (7, 'N', 1, 'ae', 'X', 'A', '')
+    assert noun_record == (7, '1', 1, 'GEN', 'S', 'C')
+
+
+def test_decoder_reads_empty_endings_and_notes():
+    decode = compile_schema(*INFLECTION_SCHEMA['N'])
+
+    assert decode('N 3 1 NOM S X  1 0           X A'.split(), 1)[0] == (1, 'N', 1, '', 'X', 'A', '')
+    assert decode('N 3 1 NOM P C  2 2 es        X A  -- plural'.split(), 2)[0] == (2, 'N', 2, 'es', 'X', 'A',
+                                                                                   'plural')
+
+
+def test_decoder_of_a_part_of_speech_without_columns():
+    decode = compile_schema(*INFLECTION_SCHEMA['CONJ'])
+
+    assert decode('CONJ 1 0 X A'.split(), 3) == ((3, 'CONJ', 1, '', 'X', 'A', ''), (3,))
+
+
+def test_records_are_loaded(database):
+    verb_record = database.query(VerbRecord).join(Record, Record.id == VerbRecord.record_id) \
+        .filter(Record.ending == 'at').one()
+
+    assert (verb_record.conjugation_code, verb_record.variant, verb_record.tense_code,
+            verb_record.person_code, verb_record.number_code) == ('1', 1, 'PRES', '3', 'S')
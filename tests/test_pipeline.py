@@ -0,0 +1,63 @@
+import logging
+import pytest
+import threading
+from doll.input_parser.pipeline import RowWriter
+
+
+def _append(session, rows):
+    session.append((threading.current_thread().name, rows))
+
+
+def test_rows_are_written_in_order_on_the_writer_thread():
+    written = []
+    with RowWriter(written, depth=2) as writer:
+        for i in range(20):
+            writer.put(_append, [i])
+
+    assert [rows for thread, rows in written] == [[i] for i in range(20)]
+    assert {thread for thread, rows in written} == {'doll-writer'}
+
+
+def test_calls_run_after_the_rows_already_put():
+    written = []
+    with RowWriter(written) as writer:
+        writer.put(_append, [1])
+        writer.put(_append, [2])
+
+        assert writer.call(len) == 2
+        assert writer.call(lambda session, extra: len(session) + extra, 10) == 12
+
+
+def _fail(session, rows):
+    raise ValueError('cannot write {0}'.format(rows))
+
+
+def test_a_failed_write_is_raised_to_the_parser():
+    writer = RowWriter([])
+    writer.put(_fail, [1])
+
+    with pytest.raises(ValueError, match=r'cannot write \[1\]'):
+        writer.call(len)
+
+    with pytest.raises(ValueError, match=r'cannot write \[1\]'):
+        writer.put(_append, [2])
+
+    with pytest.raises(ValueError, match=r'cannot write \[1\]'):
+        writer.close()
+
+
+def test_a_failed_write_is_raised_on_leaving_the_block():
+    with pytest.raises(ValueError, match=r'cannot write \[1\]'):
+        with RowWriter([]) as writer:
+            writer.put(_fail, [1])
+
+
+def test_the_parser_error_is_not_replaced_by_the_writer_error(caplog):
+    with caplog.at_level(logging.ERROR, logger='doll.input_parser.pipeline'):
+        with pytest.raises(KeyError, match='parser'):
+            with RowWriter([]) as writer:
+                writer.put(_fail, [1])
+                raise KeyError('parser')
+
+    assert 'Writing rows failed as well' in caplog.text
+    assert 'cannot write [1]' in caplog.text
@@ -0,0 +1,69 @@
+import os
+import pstats
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from doll.profiling import profiled
+
+
+def _busy():
+    return sorted(str(i) for i in range(20000))
+
+
+def test_cpu_and_memory_profiles_are_written(tmp_path):
+    with profiled('test', directory=str(tmp_path), top=5):
+        _busy()
+
+    names = sorted(os.listdir(str(tmp_path)))
+    assert len(names) == 2 and names[0].endswith('-memory.txt') and names[1].endswith('.pstats')
+
+    statistics = pstats.Stats(str(tmp_path / names[1]))
+    assert any(function == '_busy' for filename, line, function in statistics.stats)
+
+    report = (tmp_path / names[0]).read_text()
+    assert report.startswith('After ') and 'largest sites' in report
+
+
+def _statistics(directory) -> set:
+    """Finds the functions in the CPU profile written to a directory"""
+
+    name, = [name for name in os.listdir(str(directory)) if name.endswith('.pstats')]
+
+    return {function for filename, line, function in pstats.Stats(str(directory / name)).stats}
+
+
+def _sort_on_a_thread():
+    return sorted(str(i) for i in range(1000))
+
+
+def _sort_on_a_worker():
+    return sorted(str(i) for i in range(1000))
+
+
+def test_threads_started_within_are_profiled(tmp_path):
+    with profiled('test', memory=False, directory=str(tmp_path)):
+        thread = threading.Thread(target=_sort_on_a_thread)
+        thread.start()
+        thread.join()
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            executor.submit(_sort_on_a_worker).result()
+
+    functions = _statistics(tmp_path)
+    assert {'_sort_on_a_thread', '_sort_on_a_worker'} <= functions
+
+
+def test_memory_snapshots_are_taken_at_intervals(tmp_path):
+    with profiled('test', cpu=False, directory=str(tmp_path), interval=0.05):
+        data = [_busy() for i in range(3)]
+        time.sleep(0.3)
+
+    name, = os.listdir(str(tmp_path))
+    assert 'most growth' in (tmp_path / name).read_text()
+
+
+def test_nothing_is_written_without_profiles(tmp_path):
+    with profiled('test', cpu=False, memory=False, directory=str(tmp_path)):
+        _busy()
+
+    assert os.listdir(str(tmp_path)) == []
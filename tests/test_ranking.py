@@ -0,0 +1,30 @@
+import pytest
+from doll.db.model import *
+from doll.lookup.ranking import score
+from doll.parse_test import analyse_word
+
+
+def test_score_prefers_frequent_entries():
+    assert score(1, 1, 1) > score(2, 1, 1)
+    assert score(1, 1, 1) > score(1, 2, 1) > score(1, 2, 2)
+    assert score(2, 1, 1, corpus_count=100) > score(1, 1, 1)
+
+
+def test_every_form_is_scored(database):
+    assert database.query(Form).filter(Form.score.is_(None)).count() == 0
+
+
+def test_analyses_come_highest_score_first(database):
+    analyses = analyse_word('puellae')
+
+    assert len(analyses) == 2
+    assert [a.score for a in analyses] == sorted((a.score for a in analyses), reverse=True)
+    assert analyse_word('puellae', limit=1) == analyses[:1]
+
+
+def test_less_frequent_entries_score_lower(database):
+    amat, = analyse_word('amat')
+    laudat, = analyse_word('laudat')
+
+    # laudo is frequency B in the test dictionary, amo A
+    assert laudat.score == pytest.approx(amat.score - 1)
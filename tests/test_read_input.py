@@ -0,0 +1,35 @@
+import io
+import sys
+from doll.input_parser.read_input import input_size, read_input
+
+
+def test_read_input_decodes_lines(tmp_path):
+    path = tmp_path / 'input.txt'
+    path.write_bytes('caf\xe9\nsecond line\n'.encode('windows_1252'))
+
+    assert list(read_input(str(path))) == ['caf\xe9\n', 'second line\n']
+
+
+def test_read_input_leaves_bytes_undecoded(tmp_path):
+    path = tmp_path / 'input.txt'
+    path.write_bytes(b'caf\xe9\n')
+
+    assert list(read_input(str(path), encoding=None)) == [b'caf\xe9\n']
+
+
+def test_read_input_reads_stdin(monkeypatch):
+    stdin = io.TextIOWrapper(io.BytesIO(b'from\nstdin'))
+    monkeypatch.setattr(sys, 'stdin', stdin)
+
+    assert list(read_input('-')) == ['from\n', 'stdin']
+    assert not stdin.buffer.closed
+
+
+def test_input_size(tmp_path):
+    path = tmp_path / 'input.txt'
+    path.write_bytes(b'12345')
+
+    with open(str(path), 'rb') as f:
+        assert input_size(f) == 5
+
+    assert input_size(io.BytesIO(b'12345')) is None
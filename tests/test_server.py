@@ -0,0 +1,120 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from doll.config import config
+from doll.server import _handle, respond
+
+
+def test_respond_to_a_word(database):
+    response = respond(b'{"id": 1, "word": "puellam"}')
+
+    assert response['id'] == 1
+    assert [a['word'] for a in response['analyses']] == ['puell.am']
+
+
+def test_respond_to_words(database):
+    response = respond(json.dumps({'id': 2, 'words': ['puellam', 'Puellam'], 'mode': 'strict'}).encode())
+
+    assert [[a['word'] for a in analyses] for analyses in response['analyses']] == [['puell.am'], ['puell.am']]
+
+
+def test_respond_to_a_prefix(database):
+    response = respond(b'{"id": 3, "complete": "puell", "limit": 2}')
+
+    assert len(response['completions']) == 2
+    assert all(c['form'].startswith('puell') for c in response['completions'])
+
+
+def test_respond_to_a_bad_request(database):
+    assert respond(b'{"id": 4, "word": "puella", "mode": "loose"}') == {'id': 4, 'error': "KeyError: 'loose'"}
+    assert 'error' in respond(b'not json')
+
+
+async def _exchange(requests: list, responses: int, pipeline_depth: int = 8, limit: int = None) -> list:
+    """Sends requests to a server of their own, pipelined, and reads back responses
+
+    :param requests: The request lines
+    :param responses: The number of responses to read
+    :param pipeline_depth: Requests the server lets the client have in flight
+    :param limit: The longest request, by default serve_line_limit in the config
+    :return: The responses
+    """
+
+    executor = ThreadPoolExecutor(max_workers=4)
+    server = await asyncio.start_server(lambda reader, writer: _handle(reader, writer, executor, pipeline_depth),
+                                        host='127.0.0.1', port=0, limit=limit or config['serve_line_limit'])
+    try:
+        reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+        for request in requests:
+            writer.write(request + b'\n')
+        await writer.drain()
+
+        answers = [json.loads(await reader.readline()) for i in range(responses)]
+        writer.close()
+        return answers
+    finally:
+        server.close()
+        await server.wait_closed()
+        executor.shutdown()
+
+
+def test_pipelined_responses_come_back_in_order(database):
+    requests = [json.dumps({'id': i, 'word': word}).encode() for i, word in enumerate(['puellam', 'xyz', 'amat'] * 5)]
+
+    responses = asyncio.run(_exchange(requests, 15))
+
+    assert [response['id'] for response in responses] == list(range(15))
+    assert [len(response['analyses']) > 0 for response in responses[:3]] == [True, False, True]
+
+
+def test_a_large_batch_is_answered(database):
+    words = ['xyzq{0}'.format(i) for i in range(12000)] + ['puellam']
+    request = json.dumps({'id': 1, 'words': words}).encode()
+    assert len(request) > 2 ** 16
+
+    response, = asyncio.run(_exchange([request], 1))
+
+    assert response['id'] == 1
+    assert len(response['analyses']) == len(words)
+    assert [a['word'] for a in response['analyses'][-1]] == ['puell.am']
+
+
+def test_a_request_over_the_limit_is_answered_with_an_error(database):
+    too_long = json.dumps({'id': 1, 'words': ['puellam'] * 1000}).encode()
+    requests = [too_long, b'{"id": 2, "word": "amat"}', too_long, b'{"id": 3, "word": "xyz"}']
+
+    responses = asyncio.run(_exchange(requests, 4, limit=1024))
+
+    assert [response['id'] for response in responses] == [None, 2, None, 3]
+    assert responses[0]['error'] == 'ValueError: The request is longer than the line limit'
+    assert responses[1]['analyses']
+
+
+def test_a_client_that_goes_away_ends_its_handler(database):
+    async def abandon():
+        executor = ThreadPoolExecutor(max_workers=1)
+        finished = asyncio.Event()
+
+        async def handle(reader, writer):
+            try:
+                await _handle(reader, writer, executor, 1)
+            finally:
+                finished.set()
+
+        server = await asyncio.start_server(handle, host='127.0.0.1', port=0)
+        try:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            request = json.dumps({'id': 1, 'words': ['puellam'] * 50}).encode() + b'\n'
+            for i in range(200):
+                writer.write(request)
+            await writer.drain()
+
+            # Gone without reading a thing
+            writer.transport.abort()
+
+            await asyncio.wait_for(finished.wait(), timeout=20)
+        finally:
+            server.close()
+            executor.shutdown(cancel_futures=True)
+
+    asyncio.run(abandon())
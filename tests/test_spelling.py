@@ -0,0 +1,30 @@
+from doll.lookup.spelling import deletes, edit_distance, suggest
+from doll.parse_test import parse_word
+
+
+def test_deletes():
+    assert deletes('abc', 1) == {'abc', 'bc', 'ac', 'ab'}
+    assert deletes('ab', 2) == {'ab', 'a', 'b', ''}
+
+
+def test_edit_distance():
+    assert edit_distance('puella', 'puella', 2) == 0
+    assert edit_distance('puela', 'puella', 2) == 1
+    assert edit_distance('puelal', 'puella', 2) == 1
+    assert edit_distance('pella', 'puellam', 2) == 2
+    assert edit_distance('pa', 'puellam', 2) == 3
+
+
+def test_suggest_finds_near_forms(database):
+    suggestions = suggest('puela')
+
+    assert suggestions[0] == ('puella', 1)
+    assert {s.form for s in suggestions if s.distance == 1} == {'puella'}
+    assert all(s.distance <= 2 for s in suggestions)
+    assert suggest('qqqqqqqq') == []
+
+
+def test_parse_word_suggests_forms(database, capsys):
+    parse_word('puela')
+
+    assert capsys.readouterr().out.startswith('No analyses found, did you mean: puella')
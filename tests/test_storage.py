@@ -0,0 +1,87 @@
+import pytest
+import shutil
+from doll.db.model import *
+from doll.lookup.storage import COVERING_INDEXES, benchmark, optimise_storage, restore_storage
+from doll.lookup.verify import generated_forms, unmatched_words
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.orm import sessionmaker
+
+
+@pytest.fixture
+def copy(database, tmp_path):
+    """Copies the database, for changing its storage
+
+    :return: A session of the copy
+    """
+
+    path = str(tmp_path / 'copy.db')
+    shutil.copyfile(database.get_bind().url.database, path)
+
+    engine = create_engine('sqlite:///' + path)
+    session = sessionmaker(bind=engine)()
+
+    yield session
+
+    session.close()
+    engine.dispose()
+
+
+def _schema(session, table: str) -> tuple:
+    """Finds the sql of a table, and the names of its indexes"""
+
+    sql = session.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                          {'name': table}).scalar()
+    indexes = {name for (name,) in session.execute(
+        text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :name"), {'name': table})}
+
+    return sql, indexes
+
+
+def test_storage_is_restored_and_optimised_again(copy):
+    copy.add_all([FormCount(form='puella', count=3, is_exact=True), FormCount(form='amat', count=1, is_exact=False)])
+    copy.commit()
+
+    compatibility = sorted(copy.query(Compatibility.inflection_class_id, Compatibility.record_id))
+    counts = sorted(copy.query(FormCount.form, FormCount.count, FormCount.is_exact))
+
+    restore_storage(session=copy, commit_changes=True)
+
+    sql, indexes = _schema(copy, Compatibility.__tablename__)
+    assert not sql.rstrip().endswith('WITHOUT ROWID')
+    assert not any(name in indexes for name, table, columns in COVERING_INDEXES)
+    assert sorted(copy.query(Compatibility.inflection_class_id, Compatibility.record_id)) == compatibility
+    assert sorted(copy.query(FormCount.form, FormCount.count, FormCount.is_exact)) == counts
+
+    optimise_storage(session=copy, commit_changes=True)
+
+    for table in (Compatibility.__tablename__, FormCount.__tablename__):
+        assert _schema(copy, table)[0].rstrip().endswith('WITHOUT ROWID')
+    assert {name for name, table, columns in COVERING_INDEXES if name in _schema(copy, table)[1]} == \
+        {name for name, table, columns in COVERING_INDEXES}
+    assert sorted(copy.query(Compatibility.inflection_class_id, Compatibility.record_id)) == compatibility
+    assert sorted(copy.query(FormCount.form, FormCount.count, FormCount.is_exact)) == counts
+
+    # Optimising storage that is already optimised changes nothing
+    optimise_storage(session=copy, commit_changes=True)
+    assert sorted(copy.query(FormCount.form, FormCount.count, FormCount.is_exact)) == counts
+
+
+def test_prefixes_find_the_stems_substr_did(database):
+    forms = generated_forms(database)
+
+    for word in forms + unmatched_words(forms) + ['', 'a']:
+        prefixes = {stem_id for (stem_id,) in database.query(Stem.id).filter(
+            Stem.stem_word.in_([word[:length] for length in range(len(word) + 1)]))}
+        substr = {stem_id for (stem_id,) in database.query(Stem.id).filter(
+            func.substr(word, 1, func.length(Stem.stem_word)) == Stem.stem_word)}
+
+        assert prefixes == substr, word
+
+
+def test_benchmark_reads_both_copies(database):
+    results = benchmark(['puella', 'amat', 'xyzzy'], session=database)
+
+    assert set(results) == {'loaded', 'optimised'}
+    for pages, seconds in results.values():
+        assert pages is None or pages >= 0
+        assert seconds >= 0
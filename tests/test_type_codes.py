@@ -0,0 +1,76 @@
+import pytest
+from conftest import DATA_DIR
+from doll.db.model import TypeCode
+from doll.parse_test import analyse_word
+
+# Words whose analyses are compared between the builds
+WORDS = ['puella', 'puellae', 'amat', 'amavi', 'laudavi', 'cuius']
+
+# Builds a database with integer type keys, and prints the analyses of WORDS, from the file and then
+# from memory alone
+INTEGER_BUILD = '''
+import os
+from doll.config import config
+config['integer_type_keys'] = True
+
+from doll.db import Connection
+from doll.input_parser import parse_all_inputs
+from doll.parse_test import analyse_word
+
+parse_all_inputs({data!r}, commit_changes=True)
+print([analyse_word(word) for word in {words!r}])
+
+Connection.load_into_memory()
+
+# Nothing more is read from the file
+Connection._Connection__engine.dispose()
+os.rename(Connection.config['sqlalchemy.url'][len('sqlite:///'):], os.path.join({home!r}, 'moved.db'))
+print([analyse_word(word) for word in {words!r}])
+'''
+
+
+@pytest.fixture
+def type_codes(monkeypatch):
+    """Gives TypeCode the ids of two cases, as if loaded"""
+
+    monkeypatch.setattr(TypeCode, 'loader', None)
+    monkeypatch.setattr(TypeCode, 'ids', {'type_case': {'NOM': 1, 'GEN': 2}})
+    monkeypatch.setattr(TypeCode, 'codes', {'type_case': {1: 'NOM', 2: 'GEN'}})
+
+
+def test_codes_are_stored_as_ids(type_codes):
+    column = TypeCode('type_case')
+
+    assert column.process_bind_param('GEN', None) == 2
+    assert column.process_result_value(2, None) == 'GEN'
+    assert column.process_bind_param(None, None) is None
+    assert column.process_result_value(None, None) is None
+
+
+def test_unknown_codes_and_ids_are_refused(type_codes):
+    column = TypeCode('type_case')
+
+    with pytest.raises(ValueError, match="'ABL' is not a code of type_case"):
+        column.process_bind_param('ABL', None)
+
+    with pytest.raises(ValueError, match='7 is not an id of type_case'):
+        column.process_result_value(7, None)
+
+
+def test_clear_forgets_the_ids(type_codes):
+    TypeCode.clear()
+
+    assert TypeCode.ids == {} and TypeCode.codes == {}
+
+
+def test_integer_keys_find_the_same_analyses(database, run_python, tmp_path):
+    home = tmp_path / 'home'
+    (home / '.doll').mkdir(parents=True)
+
+    printed = run_python(INTEGER_BUILD.format(data=DATA_DIR, words=WORDS, home=str(home)), home=str(home))
+    from_file, from_memory = [line for line in printed.splitlines() if line.startswith('[')]
+
+    expected = repr([analyse_word(word) for word in WORDS])
+
+    assert from_file == expected
+    assert from_memory == expected
@@ -0,0 +1,113 @@
+import doll.parse_test
+import pytest
+from doll.config import config
+from doll.db.model import *
+from doll.lookup.cache import AnalysisCache
+from doll.lookup.compatibility import CLAUSES, conjugation, entry_any, equal, gender, variant
+from doll.lookup.orthography import remove_accents
+from doll.lookup.verify import _reference, generated_forms, strict_spellings, unmatched_words, verify
+from doll.parse_test import ParseOption
+from sqlalchemy import literal, select
+
+# Values to match each rule on, as they are in the inflection records and dictionary entries
+VALUES = {
+    equal: ['1', '2', '0'],
+    variant: [0, 1, 2],
+    conjugation: ['0', '1', '3'],
+    gender: ['C', 'F', 'M', 'N', 'X'],
+    entry_any: ['POS', 'COMP', 'X']
+}
+
+
+@pytest.mark.parametrize('match', list(CLAUSES), ids=lambda match: match.__name__)
+def test_clauses_match_as_the_rules_do(database, match):
+    for record_value in VALUES[match]:
+        for entry_value in VALUES[match]:
+            clause = CLAUSES[match](literal(record_value), literal(entry_value))
+
+            assert bool(database.scalar(select(clause))) == match(record_value, entry_value)
+
+
+def test_words_are_generated_from_the_rules(database):
+    forms = generated_forms(database)
+
+    assert {'puella', 'puellae', 'amat', 'amavi', 'laudavi'} <= set(forms)
+    assert 'puelle' not in forms
+    assert generated_forms(database, sample=3) == sorted(generated_forms(database, sample=3))
+    assert len(generated_forms(database, sample=3)) == 3
+
+    assert 'xyzzy' in unmatched_words(forms)
+    spelling, = strict_spellings(['puella'])
+    assert spelling != 'puella' and remove_accents(spelling) == 'puella'
+
+
+def test_reference_matches_strictly_and_not(database):
+    reference = _reference(database)
+    words = ['puellam', 'PUELLAM', 'puēllam', '(puellam),', 'puellamq']
+
+    non_strict = reference(words, ParseOption.non_strict)
+    strict = reference(words, ParseOption.strict)
+
+    assert non_strict[0] and not any(non_strict[1:])
+    assert strict[:4] == [non_strict[0]] * 4 and not strict[4]
+
+
+def test_engines_agree_with_the_rules(database):
+    mismatches, timings = verify(session=database)
+
+    assert mismatches == []
+    assert {(timing.engine, timing.mode) for timing in timings} >= {
+        ('reference', ParseOption.strict), ('analyse_word', ParseOption.strict), ('cache', ParseOption.strict),
+        ('forms', ParseOption.non_strict)}
+
+
+def test_a_missing_compatibility_is_found(database):
+    laudo, record_id = database.query(Form.entry_id, Form.record_id).filter(Form.form == 'laudat').one()
+    class_id = database.query(Entry.inflection_class_id).filter(Entry.id == laudo).scalar()
+
+    database.query(Compatibility).filter(Compatibility.inflection_class_id == class_id,
+                                         Compatibility.record_id == record_id).delete()
+    try:
+        mismatches, timings = verify(engines=['analyse_word', 'forms'], session=database,
+                                     modes=[ParseOption.non_strict])
+    finally:
+        database.rollback()
+
+    assert [(m.engine, m.word, m.missing, m.extra) for m in mismatches if m.word == 'laudat'] == [
+        ('analyse_word', 'laudat', [(laudo, record_id)], [])]
+    assert all(m.engine == 'analyse_word' for m in mismatches)
+
+
+def test_a_cache_that_loses_analyses_is_found(database, monkeypatch):
+    get = AnalysisCache.get
+
+    def lose_puella(cache, key):
+        return [] if key.endswith(':puella') else get(cache, key)
+
+    monkeypatch.setattr(AnalysisCache, 'get', lose_puella)
+
+    mismatches, timings = verify(engines=['cache'], words=['puella'], sample=0, session=database)
+
+    assert [(m.engine, m.mode, m.word, m.extra) for m in mismatches] == [
+        ('cache', ParseOption.non_strict, 'puella', []), ('cache', ParseOption.strict, 'puella', [])]
+    assert mismatches[0].missing
+
+
+def test_the_cache_engine_leaves_the_analysis_cache_alone(database, monkeypatch):
+    def no_cache(session=None):
+        raise AssertionError('The analysis cache should not be opened')
+
+    monkeypatch.setattr(doll.parse_test, 'analysis_cache', no_cache)
+    monkeypatch.setitem(config, 'analysis_cache', False)
+
+    mismatches, timings = verify(engines=['cache'], words=['puella'], sample=2, session=database)
+
+    assert mismatches == []
+    assert config['analysis_cache'] is False
+
+
+def test_strict_matching_is_checked_on_a_sample(database):
+    mismatches, timings = verify(engines=['analyse_word'], sample=10, strict_sample=2, session=database)
+
+    words = {timing.mode: timing.words for timing in timings if timing.engine == 'reference'}
+    assert words[ParseOption.strict] < words[ParseOption.non_strict]